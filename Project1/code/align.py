@@ -1,4 +1,3 @@
-
 """
 This file is Nick Allen's implementation of the alignment algorithm.
 ALign supports both global and local alignment.
@@ -13,6 +12,17 @@ Last Updated: 10/07/2025
 """
 import sys
 import os
+import time
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+from io import StringIO
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
 
 # Here is my traceback pointer approach
 class pointer(object):
@@ -36,6 +46,15 @@ class pointer(object):
         return isinstance(other, pointer) and self.row == other.row and self.col == other.col and self.name == other.name
 
 
+# Here is my compact traceback store
+# a cell's predecessor is fully determined by the matrix it came from, so pointers are stored as one bit per
+# source matrix, packed into a uint8 per cell
+POINTER_BITS = {"M": 1, "Ix": 2, "Iy": 4}
+
+# (row, col) step back to the predecessor cell for entries in each matrix: M is diagonal, Ix vertical, Iy horizontal
+PREDECESSOR_OFFSETS = {"M": (1, 1), "Ix": (1, 0), "Iy": (0, 1)}
+
+
 class ScoreEntry(object):
     """
     Object to store a score entry in the score matrix.
@@ -85,13 +104,91 @@ def get_maxes(score_entry_list : list[ScoreEntry]):
             max_pointers.append(pointer(score_entry.row, score_entry.col, score_entry.matrix_name))
     return max_score, max_pointers
 
+def vector_maxes(candidates, bits, local):
+    """
+    Vectorized get_maxes for the fill engines: the max of each column of candidates and the pointer bits of every
+    candidate tied with it, with the local alignment zero floor applied to each candidate first
+    """
+    epsilon = 10**(-6)
+    if local:
+        candidates = [np.maximum(0.0, cand) for cand in candidates]
+    best = candidates[0]
+    for cand in candidates[1:]:
+        best = np.maximum(best, cand)
+    ptr_bits = np.zeros(best.shape, dtype=np.uint8)
+    # cells next to the band can have every candidate at -inf, which like fuzzy_equals ties with nothing
+    with np.errstate(invalid="ignore"):
+        for cand, bit in zip(candidates, bits):
+            ptr_bits[np.abs(cand - best) < epsilon] |= bit
+    return best, ptr_bits
+
+def fill_cells(params, m, ix, iy, rows, cols):
+    """
+    Computes M, Ix and Iy at a set of cells that don't depend on each other, eg. the cells of one anti-diagonal,
+    from the already filled cells above and to the left of them. Used by the wavefront and tiled engines.
+
+    Inputs:
+       params = AlignmentParameters with the encoded sequences
+       m, ix, iy = the score matrices to read and write
+       rows, cols = index arrays of the cells to compute
+    """
+    local = params.local_alignment
+    bit_m, bit_ix, bit_iy = POINTER_BITS["M"], POINTER_BITS["Ix"], POINTER_BITS["Iy"]
+
+    # the encoded sequences let us gather all the match scores at once
+    s_ij = params.match_matrix.scores[params.seq_a_codes[rows - 1], params.seq_b_codes[cols - 1]]
+
+    # M: diagonal step from all three matrices plus the match score
+    m.scatter(rows, cols, *vector_maxes(
+        [m.gather(rows - 1, cols - 1) + s_ij, ix.gather(rows - 1, cols - 1) + s_ij, iy.gather(rows - 1, cols - 1) + s_ij],
+        [bit_m, bit_ix, bit_iy], local))
+
+    # Ix: vertical step, gap in B
+    ix.scatter(rows, cols, *vector_maxes(
+        [m.gather(rows - 1, cols) - params.dy, ix.gather(rows - 1, cols) - params.ey], [bit_m, bit_ix], local))
+
+    # Iy: horizontal step, gap in A
+    iy.scatter(rows, cols, *vector_maxes(
+        [m.gather(rows, cols - 1) - params.dx, iy.gather(rows, cols - 1) - params.ex], [bit_m, bit_iy], local))
+
+
 class MatchMatrix(object):
     """
-    Match matrix class stores the scores of matches in a data structure
+    Match matrix class stores the scores of matches in a data structure.
+    Scores live in a dense 2-D array indexed by letter codes (the position of the letter in its alphabet), so
+    sequences encoded with encode_a / encode_b can gather a whole row or diagonal of scores in one step.
     """
-    def __init__(self):
-        # Init as dict mapping tuples of characters to scores
-        self.match_matrix_scores = {}
+    def __init__(self, alphabet_a="", alphabet_b=""):
+        # letter -> code, ie. the row (sequence A) or column (sequence B) of the letter in the score array
+        self.index_a = {}
+        self.index_b = {}
+
+        for a in alphabet_a:
+            self.index_a.setdefault(a, len(self.index_a))
+        for b in alphabet_b:
+            self.index_b.setdefault(b, len(self.index_b))
+
+        # unset matches are NaN so we can tell them apart from a score of 0, the array is allocated once
+        # for the alphabets and only grows for letters added later
+        self.scores = np.full((len(self.index_a), len(self.index_b)), np.nan)
+
+    def add_letter_a(self, a):
+        """
+        Adds a letter to alphabet A if it isn't there yet, growing the score array by a row
+        """
+        if a not in self.index_a:
+            self.index_a[a] = len(self.index_a)
+            self.scores = np.pad(self.scores, ((0, 1), (0, 0)), constant_values=np.nan)
+        return self.index_a[a]
+
+    def add_letter_b(self, b):
+        """
+        Adds a letter to alphabet B if it isn't there yet, growing the score array by a column
+        """
+        if b not in self.index_b:
+            self.index_b[b] = len(self.index_b)
+            self.scores = np.pad(self.scores, ((0, 0), (0, 1)), constant_values=np.nan)
+        return self.index_b[b]
 
     def set_score(self, a, b, score):
         """
@@ -102,8 +199,10 @@ class MatchMatrix(object):
            b = the character from sequence B
            score = the score to set it for
         """
-        # key will be a tuple of the two characters
-        self.match_matrix_scores[(a, b)] = score
+        # index by the codes of the two characters
+        code_a = self.add_letter_a(a)
+        code_b = self.add_letter_b(b)
+        self.scores[code_a, code_b] = score
 
     def get_score(self, a, b):
         """
@@ -116,17 +215,72 @@ class MatchMatrix(object):
         Returns:
            the score of that match
         """
-        # return value form the hash table
-        return self.match_matrix_scores[(a, b)]
+        # return value from the dense array, missing matches raise a KeyError like a dict lookup would
+        if a not in self.index_a or b not in self.index_b:
+            raise KeyError((a, b))
+        score = self.scores[self.index_a[a], self.index_b[b]]
+        if np.isnan(score):
+            raise KeyError((a, b))
+        return float(score)
+
+    def encode_a(self, seq):
+        """
+        Returns sequence A as an array of letter codes
+        """
+        return self.encode(seq, self.index_a, "A")
+
+    def encode_b(self, seq):
+        """
+        Returns sequence B as an array of letter codes
+        """
+        return self.encode(seq, self.index_b, "B")
+
+    def encode(self, seq, index, which):
+        """
+        Maps each letter of seq through index, complaining about letters that aren't in the alphabet
+        """
+        try:
+            return np.fromiter((index[ch] for ch in seq), dtype=np.intp, count=len(seq))
+        except KeyError as err:
+            raise ValueError(f"Letter {err} in sequence {which} is not in alphabet {which}") from None
+
+
+def allocate_array(shape, dtype, fill=0, scratch_dir=None):
+    """
+    Allocates an array for a score matrix, in memory or backed by a memory-mapped file in scratch_dir.
+    A mapped array lives in the page cache, so the OS writes it out to disk when memory runs short instead of
+    the process being killed. The file is unlinked as soon as it is mapped, the space is freed with the array.
+
+    Inputs:
+       shape, dtype = shape and dtype of the array
+       fill = initial value of every entry
+       scratch_dir = directory for the backing file, None to allocate in memory
+    """
+    if scratch_dir is None:
+        return np.full(shape, fill, dtype=dtype)
+
+    with tempfile.NamedTemporaryFile(dir=scratch_dir, prefix="align_", suffix=".dat", delete=False) as f:
+        path = f.name
+    try:
+        # a new file reads back as zeros without being written, so only other fills touch every page
+        array = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+    finally:
+        os.unlink(path)
+    if fill != 0:
+        array[:] = fill
+    return array
 
 
 class ScoreMatrix(object):
     """
-    Object to store a score matrix, which generated during the alignment process. The score matrix consists of a 2-D array of
-    ScoreEntries that are updated during alignment and used to output the maximum alignment.
+    Object to store a score matrix, which generated during the alignment process. Scores live in a contiguous
+    NumPy float array (one float64 per cell) instead of a grid of ScoreEntry objects, so a 5k x 5k matrix costs
+    ~200MB rather than tens of millions of Python objects. ScoreEntry objects are only built on request.
+    Traceback pointers are a uint8 bitmask per cell (see POINTER_BITS), decoded back into pointer objects on request.
+    With a scratch_dir both arrays are memory-mapped files there (see allocate_array).
     """
 
-    def __init__(self, name, nrow, ncol):
+    def __init__(self, name, nrow, ncol, scratch_dir=None):
         self.name = name # identifier for the score matrix - Ix, Iy, or M
         self.nrow = nrow
         self.ncol = ncol
@@ -134,25 +288,33 @@ class ScoreMatrix(object):
         # initialize the score matrix at zeroes for all entries, we don't penalize the end/start gaps
         # down the line, we won't recompute these boundaries, first entry we compute is (1,1)
         # Here is where I could add end-gap penalties
-        self.score_matrix = [[ScoreEntry(row, col, float(0), self.name) for col in range(ncol)] for row in range(nrow)]
+        self.scores = allocate_array((nrow, ncol), np.float64, scratch_dir=scratch_dir)
+
+        # one bitmask per cell recording every tied predecessor matrix
+        self.pointer_bits = allocate_array((nrow, ncol), np.uint8, scratch_dir=scratch_dir)
+
+        # pointers that can't be expressed as a predecessor bit (eg. a hand built matrix in the tests) live here
+        self.extra_pointers = {}
     
     def get_score(self, row, col):
         """
         Returns the score for the given row and column
         """
-        return self.score_matrix[row][col].score
+        return float(self.scores[row, col])
 
     def get_score_obj(self, row, col):
         """
-        Returns the score entry object for the given row and column
+        Returns a score entry object for the given row and column, built from the score array
         """
-        return self.score_matrix[row][col]
+        score_obj = ScoreEntry(row, col, self.get_score(row, col), self.name)
+        score_obj.pointers = self.get_pointers(row, col)
+        return score_obj
 
     def set_score(self, row, col, score):
         """
         Sets the score for the given row and column
         """
-        self.score_matrix[row][col] = ScoreEntry(row, col, score, self.name)
+        self.scores[row, col] = score
 
     def get_pointers(self, row, col):
         """
@@ -160,13 +322,73 @@ class ScoreMatrix(object):
         This should be formatted as a list of tuples:
          ex. [(1,1, "M"), (1,0, "Ix")]
         """
-        return self.score_matrix[row][col].pointers
+        pointers = []
+        bits = self.get_pointer_bits(row, col)
+        if bits:
+            # decode the bits into pointers at the predecessor cell, in M, Ix, Iy order like get_maxes
+            d_row, d_col = PREDECESSOR_OFFSETS[self.name]
+            for name, bit in POINTER_BITS.items():
+                if bits & bit:
+                    pointers.append(pointer(row - d_row, col - d_col, name))
+        if self.extra_pointers:
+            pointers.extend(self.extra_pointers.get((row, col), []))
+        return pointers
 
     def set_pointers(self, row, col, pointers: list[pointer]):
         """
-        Sets the pointers for the given row and column for score entry object
+        Sets the pointers for the given row and column, packing them into the cell's bitmask
+        """
+        bits = 0
+        extra = []
+        offset = PREDECESSOR_OFFSETS.get(self.name)
+        for ptr in pointers:
+            # only pointers at our predecessor cell can be packed
+            if offset is not None and ptr.name in POINTER_BITS and (ptr.row, ptr.col) == (row - offset[0], col - offset[1]):
+                bits |= POINTER_BITS[ptr.name]
+            else:
+                extra.append(ptr)
+        self.set_pointer_bits(row, col, bits)
+        if extra:
+            self.extra_pointers[(row, col)] = extra
+        else:
+            self.extra_pointers.pop((row, col), None)
+
+    def get_pointer_bits(self, row, col):
+        """
+        Returns the raw pointer bitmask for the given row and column
         """
-        self.score_matrix[row][col].pointers = pointers
+        return int(self.pointer_bits[row, col])
+
+    def set_pointer_bits(self, row, col, bits):
+        """
+        Sets the raw pointer bitmask for the given row and column
+        """
+        self.pointer_bits[row, col] = bits
+
+    def row_scores(self, row):
+        """
+        Returns (cols, scores) for the computed cells of a row, ie. every column past the boundary
+        """
+        return np.arange(1, self.ncol), self.scores[row, 1:]
+
+    def col_scores(self, col):
+        """
+        Returns (rows, scores) for the computed cells of a column, ie. every row past the boundary
+        """
+        return np.arange(1, self.nrow), self.scores[1:, col]
+
+    def gather(self, rows, cols):
+        """
+        Returns the scores at the cells given by the rows and cols index arrays, used by the wavefront engine
+        """
+        return self.scores[rows, cols]
+
+    def scatter(self, rows, cols, scores, bits):
+        """
+        Sets the scores and pointer bits at the cells given by the rows and cols index arrays
+        """
+        self.scores[rows, cols] = scores
+        self.pointer_bits[rows, cols] = bits
 
 
     def print_scores(self):
@@ -184,7 +406,7 @@ class ScoreMatrix(object):
 
         """
         # format all cells to 2 decimals
-        cells = [[f"{self.score_matrix[r][c].score:.2f}" for c in range(self.ncol)] for r in range(self.nrow)]
+        cells = [[f"{self.get_score(r, c):.2f}" for c in range(self.ncol)] for r in range(self.nrow)]
         # column widths
         col_w = [max(len(cells[r][c]) for r in range(self.nrow)) for c in range(self.ncol)]
         # header
@@ -201,7 +423,7 @@ class ScoreMatrix(object):
         for r in range(self.nrow):
             row_cells = []
             for c in range(self.ncol):
-                pts = getattr(self.score_matrix[r][c], "pointers", [])
+                pts = self.get_pointers(r, c)
                 if not pts:
                     s = "∅"
                 else:
@@ -218,6 +440,120 @@ class ScoreMatrix(object):
             print("  " + line)
 
 
+class BandedScoreMatrix(ScoreMatrix):
+    """
+    Score matrix that only stores the cells within band diagonals of the main diagonal (|col - row| <= band).
+    Storage is nrow x (2 * band + 1), with cell (row, col) kept at column col - row + band, so memory and fill
+    work are O(n * band) rather than O(n * m). Cells outside the band score -inf, except the row 0 / column 0
+    boundary which scores 0 everywhere like the full matrix.
+    """
+
+    def __init__(self, name, nrow, ncol, band, scratch_dir=None):
+        self.name = name
+        self.nrow = nrow
+        self.ncol = ncol
+        self.band = band
+        width = 2 * band + 1
+
+        # cells past the matrix edges (and anything we never compute) stay at -inf
+        self.scores = allocate_array((nrow, width), np.float64, fill=float("-inf"), scratch_dir=scratch_dir)
+        self.pointer_bits = allocate_array((nrow, width), np.uint8, scratch_dir=scratch_dir)
+        self.extra_pointers = {}
+
+        # zero the boundary cells that fall inside the band
+        for col in range(min(ncol, band + 1)):
+            self.scores[0, col + band] = 0.0
+        for row in range(min(nrow, band + 1)):
+            self.scores[row, band - row] = 0.0
+
+    def in_band(self, row, col):
+        """
+        Returns whether the given row and column is stored
+        """
+        return abs(col - row) <= self.band
+
+    def get_score(self, row, col):
+        """
+        Returns the score for the given row and column, -inf outside the band
+        """
+        if row == 0 or col == 0:
+            return 0.0
+        if not self.in_band(row, col):
+            return float("-inf")
+        return float(self.scores[row, col - row + self.band])
+
+    def set_score(self, row, col, score):
+        """
+        Sets the score for the given row and column, which has to be in the band
+        """
+        if not self.in_band(row, col):
+            raise IndexError(f"({row},{col}) is outside the band of {self.name}")
+        self.scores[row, col - row + self.band] = score
+
+    def get_pointer_bits(self, row, col):
+        """
+        Returns the raw pointer bitmask for the given row and column, cells outside the band have none
+        """
+        if not self.in_band(row, col):
+            return 0
+        return int(self.pointer_bits[row, col - row + self.band])
+
+    def set_pointer_bits(self, row, col, bits):
+        """
+        Sets the raw pointer bitmask for the given row and column, which has to be in the band
+        """
+        if not self.in_band(row, col):
+            raise IndexError(f"({row},{col}) is outside the band of {self.name}")
+        self.pointer_bits[row, col - row + self.band] = bits
+
+    def row_scores(self, row):
+        """
+        Returns (cols, scores) for the computed cells of a row within the band
+        """
+        lo, hi = max(1, row - self.band), min(self.ncol - 1, row + self.band)
+        if hi < lo:
+            return np.arange(0), np.zeros(0)
+        return np.arange(lo, hi + 1), self.scores[row, lo - row + self.band:hi - row + self.band + 1]
+
+    def col_scores(self, col):
+        """
+        Returns (rows, scores) for the computed cells of a column within the band
+        """
+        rows = np.arange(max(1, col - self.band), min(self.nrow - 1, col + self.band) + 1)
+        return rows, self.scores[rows, col - rows + self.band]
+
+    def gather(self, rows, cols):
+        """
+        Returns the scores at the cells given by the rows and cols index arrays, -inf outside the band
+        """
+        band_cols = cols - rows + self.band
+        inside = (band_cols >= 0) & (band_cols <= 2 * self.band)
+        scores = np.full(rows.shape, float("-inf"))
+        scores[inside] = self.scores[rows[inside], band_cols[inside]]
+        scores[(rows == 0) | (cols == 0)] = 0.0
+        return scores
+
+    def scatter(self, rows, cols, scores, bits):
+        """
+        Sets the scores and pointer bits at the cells given by the rows and cols index arrays, all within the band
+        """
+        band_cols = cols - rows + self.band
+        self.scores[rows, band_cols] = scores
+        self.pointer_bits[rows, band_cols] = bits
+
+
+def is_gap_penalty_line(line):
+    """
+    Checks whether a line of an input file is the four gap penalties
+    """
+    fields = line.split()
+    try:
+        [float(x) for x in fields]
+    except ValueError:
+        return False
+    return len(fields) == 4
+
+
 class AlignmentParameters(object):
     """
     Object to hold a set of alignment parameters from an input file.
@@ -240,6 +576,10 @@ class AlignmentParameters(object):
         self.len_alphabet_b = 0
         self.match_matrix = MatchMatrix()
 
+        # sequences as integer codes into the match matrix, filled in by set_sequences
+        self.seq_a_codes = np.zeros(0, dtype=np.intp)
+        self.seq_b_codes = np.zeros(0, dtype=np.intp)
+
     def load_params_from_file(self, input_file): 
         """
         Reads the parameters from an input file and stores in the object
@@ -247,15 +587,46 @@ class AlignmentParameters(object):
         Input:
            input_file = specially formatted alignment input file
         """
+        seq_a, seq_b = self.load_scoring_from_file(input_file)
+        self.set_sequences(seq_a, seq_b)
+
+    def load_scoring_from_file(self, input_file):
+        """
+        Reads the mode, gap penalties, alphabets and match matrix from an input file and stores them in the object,
+        without setting the sequences. The file can be a full input file or the same format without the two
+        sequence lines, so one scoring file can be shared by many pairs (see fasta_align.py). The alphabets and
+        match score lines can be replaced by the name of a substitution matrix (see matrices.py).
+
+        Input:
+           input_file = specially formatted alignment input file
+        Returns:
+           (seq_a, seq_b) the sequences in the file, empty strings if it has none
+        """
         # load the alignment parameters into the align_params object
         with open(input_file, 'r') as f:
-            # keep blank-line tolerant; strip trailing newlines
-            lines = [ln.strip() for ln in f if ln.strip() != '']
-        it = iter(lines)
+            text = f.read()
+        return self.load_scoring_from_string(text, os.path.dirname(os.path.abspath(input_file)))
+
+    def load_scoring_from_string(self, text, base_dir="."):
+        """
+        Same as load_scoring_from_file, for the contents of an input file
+
+        Input:
+           text = contents of a specially formatted alignment input file, the sequence lines are optional
+           base_dir = directory a substitution matrix file named in the text is relative to
+        Returns:
+           (seq_a, seq_b) the sequences in the text, empty strings if it has none
+        """
+        # keep blank-line tolerant; strip trailing newlines
+        lines = [ln.strip() for ln in text.splitlines() if ln.strip() != '']
 
-        # sequences
-        self.seq_a = next(it)
-        self.seq_b = next(it)
+        # sequences, encoded once the alphabets are known; a scoring-only file has the gap penalties second
+        if len(lines) > 1 and is_gap_penalty_line(lines[1]):
+            seq_a = seq_b = ""
+        else:
+            seq_a, seq_b = lines[0], lines[1]
+            lines = lines[2:]
+        it = iter(lines)
 
         # global vs local
         self.global_alignment = (next(it) == '0')
@@ -264,11 +635,21 @@ class AlignmentParameters(object):
         # gap penalties
         self.dx, self.ex, self.dy, self.ey = map(float, next(it).split())
 
+        # a named substitution matrix (see matrices.py) stands in for the alphabets and match scores
+        line = next(it)
+        if not line.isdigit():
+            from matrices import load_matrix
+            alphabet, self.match_matrix = load_matrix(line, base_dir)
+            self.alphabet_a = self.alphabet_b = alphabet
+            self.len_alphabet_a = self.len_alphabet_b = len(alphabet)
+            return seq_a, seq_b
+
         # alphabets
-        self.len_alphabet_a = int(next(it)); self.alphabet_a = next(it)
+        self.len_alphabet_a = int(line); self.alphabet_a = next(it)
         self.len_alphabet_b = int(next(it)); self.alphabet_b = next(it)
 
-        # create match matrix
+        # create match matrix, letter codes follow the order of the alphabets
+        match_matrix = MatchMatrix(self.alphabet_a, self.alphabet_b)
         # Here is one of the bug fixes I mentioned in my quiz
         for row in range(1, self.len_alphabet_a + 1):
             for col in range(1, self.len_alphabet_b + 1):
@@ -278,7 +659,251 @@ class AlignmentParameters(object):
 
                 # checking to make sure the indices are correct for downstream interpretaton of the alignment
                 assert int(i)== row and int(j) == col
-                self.match_matrix.set_score(a, b, float(s))
+                match_matrix.set_score(a, b, float(s))
+        self.match_matrix = match_matrix
+        return seq_a, seq_b
+
+    def set_sequences(self, seq_a, seq_b):
+        """
+        Sets the two sequences to align and encodes them into integer codes for the match matrix
+
+        Inputs:
+           seq_a = sequence A (the rows)
+           seq_b = sequence B (the columns)
+        """
+        self.seq_a = seq_a
+        self.seq_b = seq_b
+        self.seq_a_codes = self.match_matrix.encode_a(seq_a)
+        self.seq_b_codes = self.match_matrix.encode_b(seq_b)
+
+    def digest(self, extra=""):
+        """
+        Returns a hex sha256 digest of everything that determines the alignment: the sequences, the mode,
+        the gap penalties, the alphabets and the match scores
+
+        Inputs:
+           extra = any other setting to fold into the digest (eg. the band width)
+        """
+        h = hashlib.sha256()
+        for field in (self.seq_a, self.seq_b, self.global_alignment, self.dx, self.ex, self.dy, self.ey,
+                      self.match_matrix.index_a, self.match_matrix.index_b, self.match_matrix.scores.shape, extra):
+            h.update(repr(field).encode() + b"\0")
+        h.update(np.ascontiguousarray(self.match_matrix.scores).tobytes())
+        return h.hexdigest()
+
+
+# fill engines for populate_score_matrices: "cell" calls update(row, col) for every cell,
+# "wavefront" computes each anti-diagonal of M, Ix and Iy as one NumPy operation,
+# "rows" computes a row at a time, which reads and writes memory-mapped matrices sequentially,
+# "tiled" computes tiles of the matrix in parallel on a pool of worker processes (see tiled_fill.py)
+ENGINES = ("cell", "wavefront", "rows", "tiled")
+
+# output formats for write_output: "alignment" writes the two gapped sequences, "cigar" one line of coordinates
+# and a run-length edit string per alignment
+OUTPUT_FORMATS = ("alignment", "cigar")
+
+# CIGAR operation for each matrix: M aligns a pair, I is a letter of A against a gap, D a letter of B against a gap
+CIGAR_OPS = {"M": "M", "Ix": "I", "Iy": "D"}
+
+
+def path_to_cigar(path):
+    """
+    Converts a traceback path into coordinates and a CIGAR string without building the aligned sequences
+
+    Inputs:
+       path = list of pointers from the end of the alignment back to the start, as from Align.iter_paths()
+    Returns:
+       ((a_start, a_end, b_start, b_end), cigar) with 1-based inclusive coordinates in sequence A and B
+    """
+    ops = []
+    first = last = None
+    for ptr in reversed(path):
+        # boundary cells aren't part of the alignment
+        if ptr.row == 0 or ptr.col == 0:
+            continue
+        if first is None:
+            first = ptr
+        last = ptr
+        op = CIGAR_OPS[ptr.name]
+        if ops and ops[-1][1] == op:
+            ops[-1][0] += 1
+        else:
+            ops.append([1, op])
+
+    # a cell (row, col) has used A up to row and B up to col, the first cell only uses A if it isn't in Iy
+    a_start = first.row if first.name != "Iy" else first.row + 1
+    b_start = first.col if first.name != "Ix" else first.col + 1
+    cigar = "".join(f"{count}{op}" for count, op in ops)
+    return (a_start, last.row, b_start, last.col), cigar
+
+
+def expand_cigar(seq_a, seq_b, a_start, b_start, cigar):
+    """
+    Rebuilds the two gapped sequence lines of an alignment from its start coordinates and CIGAR string
+
+    Returns:
+       (aligned_a, aligned_b) with "_" for gaps, as in the "alignment" output format
+    """
+    a, b = [], []
+    i, j = a_start - 1, b_start - 1
+    count = ""
+    for char in cigar:
+        if char.isdigit():
+            count += char
+            continue
+        n = int(count); count = ""
+        if char == "M":
+            a.append(seq_a[i:i + n]); b.append(seq_b[j:j + n]); i += n; j += n
+        elif char == "I":
+            a.append(seq_a[i:i + n]); b.append("_" * n); i += n
+        elif char == "D":
+            a.append("_" * n); b.append(seq_b[j:j + n]); j += n
+        else:
+            raise ValueError(f"Unknown CIGAR operation '{char}' in {cigar}")
+    return "".join(a), "".join(b)
+
+
+def path_stats(path, seq_a, seq_b):
+    """
+    Summarizes the alignment along a traceback path in one pass over its pointers, without building the aligned
+    sequences. A gap is a run of cells in Ix or in Iy, so a gap in A right after a gap in B counts as two gap
+    openings, as it is scored.
+
+    Inputs:
+       path = list of pointers from the end of the alignment back to the start, as from Align.iter_paths()
+       seq_a, seq_b = the aligned sequences
+    Returns:
+       dict with the 1-based inclusive coordinates in A and B (as in path_to_cigar), the alignment length in
+       columns, the matches, mismatches and identity (matches per column), the gap openings, the length of
+       each gap in order and the gap columns in total
+    """
+    (a_start, a_end, b_start, b_end), _ = path_to_cigar(path)
+    matches = mismatches = 0
+    gap_lengths = []
+    previous = None
+    for ptr in reversed(path):
+        if ptr.row == 0 or ptr.col == 0:
+            continue
+        if ptr.name == "M":
+            if seq_a[ptr.row - 1] == seq_b[ptr.col - 1]:
+                matches += 1
+            else:
+                mismatches += 1
+        elif ptr.name == previous:
+            gap_lengths[-1] += 1
+        else:
+            gap_lengths.append(1)
+        previous = ptr.name
+    length = matches + mismatches + sum(gap_lengths)
+    return {"a_start": a_start, "a_end": a_end, "b_start": b_start, "b_end": b_end, "length": length,
+            "matches": matches, "mismatches": mismatches, "identity": matches / length if length else 0.0,
+            "gap_opens": len(gap_lengths), "gap_lengths": gap_lengths, "gap_columns": sum(gap_lengths)}
+
+
+# extra diagonals on top of the length difference when the band width is derived automatically
+AUTO_BAND_MARGIN = 16
+
+# seconds between checkpoints of the fill when a checkpoint file is given
+CHECKPOINT_INTERVAL = 300
+
+
+# the phases of Align.align() in the order they run, linear-space mode runs "linear_space" in place of the fill,
+# the traceback start and the traceback; "result_cache" covers looking up and storing the result in a result cache
+PHASES = ("load_params", "result_cache", "populate", "traceback_start", "traceback", "linear_space", "write_output")
+
+
+class PhaseStats(object):
+    """
+    Object to hold the wall time, peak memory and cells handled by each phase of an alignment run.
+    Peak memory is the most tracemalloc saw allocated above the level at the start of the phase, which covers
+    the NumPy arrays and Python objects but not memory-mapped arrays. Tracing allocations slows the cell engine
+    down, so it is only done when track_memory is set, otherwise peak_memory stays None.
+    """
+
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.phases = {}
+        self.started_tracing = False
+
+    def entry(self, name):
+        """
+        Returns the dict of a phase, adding it if needed
+        """
+        return self.phases.setdefault(name, {"seconds": 0.0, "peak_memory": None, "cells": 0})
+
+    def start(self):
+        """
+        Starts tracing allocations if memory is tracked and nobody else already is
+        """
+        self.phases = {}
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self):
+        """
+        Stops tracing allocations if start() started it
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager timing one phase, yields the phase's dict so the caller can fill in the cells
+        """
+        entry = self.entry(name)
+        tracing = self.track_memory and tracemalloc.is_tracing()
+        if tracing:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] += time.perf_counter() - start
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                entry["peak_memory"] = max(peak, entry["peak_memory"] or 0)
+
+    def timed_iter(self, name, items, cells):
+        """
+        Generator passing items through while adding the time spent producing them to a phase, for work done
+        lazily inside another phase
+
+        Inputs:
+           name = the phase to add to
+           items = iterable doing the work as it is iterated
+           cells = function of an item returning the cells it accounts for
+        """
+        entry = self.entry(name)
+        items = iter(items)
+        while True:
+            start = time.perf_counter()
+            item = next(items, None)
+            entry["seconds"] += time.perf_counter() - start
+            if item is None:
+                return
+            entry["cells"] += cells(item)
+            yield item
+
+    def summary(self):
+        """
+        Returns a dict of the phases that ran, in order, each with cells_per_second added, the totals, and
+        whether allocations were traced (which slows the phases down)
+        """
+        phases = {}
+        for name in PHASES:
+            if name in self.phases:
+                entry = dict(self.phases[name])
+                entry["cells_per_second"] = entry["cells"] / entry["seconds"] if entry["seconds"] > 0 else None
+                phases[name] = entry
+        peaks = [entry["peak_memory"] for entry in phases.values() if entry["peak_memory"] is not None]
+        return {"phases": phases,
+                "total_seconds": sum(entry["seconds"] for entry in phases.values()),
+                "peak_memory": max(peaks) if peaks else None,
+                "track_memory": self.track_memory}
 
 
 class Align(object):
@@ -286,14 +911,79 @@ class Align(object):
     Object to hold and run an alignment; running is accomplished by using "align()"
     """
 
-    def __init__(self, input_file, output_file):
+    def __init__(self, input_file, output_file, engine="cell", linear_space=False, max_alignments=None, band=None,
+                 scratch_dir=None, checkpoint_file=None, checkpoint_interval=CHECKPOINT_INTERVAL, param_cache_dir=None,
+                 output_format="alignment", top_k=None, track_memory=False, workers=None, result_cache=None,
+                 alignment_stats_file=None):
         """
         Input:
-            input_file = file with the input for running an alignment
-            output_file = file to write the output alignments to
+            input_file = file with the input for running an alignment, or None if align_params is filled in
+                         directly (eg. with load_scoring_from_file and set_sequences)
+            output_file = file to write the output alignments to, or an open text stream (eg. io.StringIO)
+            engine = the fill engine to populate the score matrices with, one of ENGINES
+            linear_space = run a global alignment in linear memory (see linear_space.py), which writes
+                           one optimal alignment instead of all co-optimal ones
+            max_alignments = stop after writing this many distinct alignments, None writes them all
+            band = only compute cells with |col - row| <= band, "auto" for the length difference plus
+                   AUTO_BAND_MARGIN, or None for the full matrices
+            scratch_dir = directory to memory-map the score and pointer arrays in, for alignments bigger than
+                          memory (best with the "rows" engine), None keeps them in memory
+            checkpoint_file = file to save the completed rows of the fill to every checkpoint_interval seconds,
+                              and to resume the fill from if it already exists (see checkpoint.py)
+            param_cache_dir = directory of parsed input files keyed by their content (see param_cache.py),
+                              None parses the input file every time
+            output_format = how write_output writes each alignment, one of OUTPUT_FORMATS
+            top_k = for local alignment, write the top_k best alignments that don't share an aligned letter
+                    pair (Waterman-Eggert, see suboptimal.py) instead of the co-optimal ones, None for the usual
+            track_memory = trace allocations to record the peak memory of each phase in stats (slower)
+            workers = worker processes of the "tiled" engine, None for one per CPU
+            result_cache = ResultCache, or the directory of one, to return the stored score and output of an
+                           alignment run before with the same inputs and options (see result_cache.py), None
+                           always aligns
+            alignment_stats_file = file to write the path_stats of each alignment written to, as one JSON object
+                                   per line in the order of the output (with its index and score), None for no
+                                   statistics
         """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}', expected one of {OUTPUT_FORMATS}")
+        if band is not None and linear_space:
+            raise ValueError("Banded alignment can't be combined with linear-space alignment")
+        if top_k is not None and (linear_space or band is not None):
+            raise ValueError("Top-K alignments need the full matrices, they can't be combined with a band or linear space")
+        if checkpoint_file is not None and linear_space:
+            raise ValueError("Checkpoints are only supported for the full or banded matrices")
+        if alignment_stats_file is not None and result_cache is not None:
+            raise ValueError("Alignment statistics come from the traceback, which a result cache hit skips")
         self.input_file = input_file
         self.output_file = output_file
+        self.engine = engine
+        self.linear_space = linear_space
+        self.max_alignments = max_alignments
+        self.band = band
+        self.scratch_dir = scratch_dir
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = checkpoint_interval
+        self.param_cache_dir = param_cache_dir
+        self.output_format = output_format
+        self.top_k = top_k
+        self.workers = workers
+        # a cache opened here from its directory is closed again at the end of align()
+        self.owns_result_cache = isinstance(result_cache, str)
+        if self.owns_result_cache:
+            from result_cache import ResultCache
+            result_cache = ResultCache(result_cache)
+        self.result_cache = result_cache
+        self.alignment_stats_file = alignment_stats_file
+        self.checkpoint = None
+        self.last_checkpoint = 0.0
+
+        # time, peak memory and cells of each phase of the last align() run, see PhaseStats.summary()
+        self.stats = PhaseStats(track_memory)
+
+        # set after the traceback in banded mode, True if the optimum may have been cut off by the band
+        self.band_edge_hit = False
         self.align_params = AlignmentParameters() 
 
         # initialize the score matrices
@@ -308,30 +998,180 @@ class Align(object):
         self.max_loc = set()
         self.paths = []
 
+        # cells computed by the last populate_score_matrices() call
+        self.filled_cells = 0
+
+        # set by align() when the result came out of the result cache, the matrices are not filled then
+        self.cache_hit = False
+
+    @classmethod
+    def from_params(cls, align_params, output_file, **options):
+        """
+        Returns an Align object for alignment parameters that are already loaded (eg. with
+        load_scoring_from_file and set_sequences) instead of read from an input file
+
+        Inputs:
+           align_params = AlignmentParameters with the sequences set
+           output_file, options = as for Align()
+        """
+        align = cls(None, output_file, **options)
+        align.align_params = align_params
+        return align
+
     def align(self):
         """
         Main method for running alignment.
+        Each phase is timed into self.stats, see PhaseStats.
         """
-
-        # load the alignment parameters into the align_params object
-        self.align_params.load_params_from_file(self.input_file)
+        self.stats.start()
+        try:
+            self.run_phases()
+        finally:
+            self.stats.stop()
+            if self.owns_result_cache:
+                self.result_cache.close()
+
+    def run_phases(self):
+        """
+        Runs the phases of align() one after the other, recording each in self.stats
+        """
+        stats = self.stats
+
+        # load the alignment parameters into the align_params object, unless they were set up directly
+        with stats.phase("load_params") as entry:
+            if self.input_file is not None and self.param_cache_dir is not None:
+                from param_cache import load_params_cached
+                self.align_params, _ = load_params_cached(self.input_file, self.param_cache_dir)
+            elif self.input_file is not None:
+                self.align_params.load_params_from_file(self.input_file)
+            entry["cells"] = int(self.align_params.match_matrix.scores.size)
+
+        # a cached result is copied to the output as it is, without filling any matrices
+        self.cache_hit = False
+        if self.result_cache is None:
+            self.compute_alignment()
+            return
+        with stats.phase("result_cache"):
+            key = self.result_key()
+            self.cache_hit = self.read_cached_result(key)
+        if self.cache_hit:
+            return
+
+        # only the output written by this run goes into the cache
+        offset = self.output_file.tell() if isinstance(self.output_file, StringIO) else 0
+        self.compute_alignment()
+        with stats.phase("result_cache"):
+            self.store_result(key, offset)
+
+    def compute_alignment(self):
+        """
+        Runs the phases of align() after loading the parameters: the fill, the traceback and writing the output
+        """
+        stats = self.stats
+        len_a, len_b = len(self.align_params.seq_a), len(self.align_params.seq_b)
+
+        # linear-space global mode never builds the full matrices, it hands back one optimal path
+        if self.linear_space:
+            from linear_space import LinearSpaceAligner
+            with stats.phase("linear_space") as entry:
+                self.max_score, self.max_loc, path = LinearSpaceAligner(self.align_params).align()
+                entry["cells"] = len_a * len_b
+            self.paths = [] if path is None else [path]
+            with stats.phase("write_output") as entry:
+                entry["cells"] = self.write_output()
+            return
 
         # populate the score matrices based on the input parameters
-        self.populate_score_matrices()
-        
-        # find the traceback start and max score 
-        self.max_score, self.max_loc = self.find_traceback_start()
+        with stats.phase("populate") as entry:
+            self.populate_score_matrices()
+            entry["cells"] = self.filled_cells
+
+        # find the traceback start and max score, local looks at every cell and global at the last row and column
+        with stats.phase("traceback_start") as entry:
+            self.max_score, self.max_loc = self.find_traceback_start()
+            entry["cells"] = len_a * len_b if self.align_params.local_alignment else len_a + len_b
         
-        # perform the traceback
-        self.paths = self.traceback()
+        # a path along the edge of the band might have done better outside of it
+        if self.band is not None:
+            self.band_edge_hit = self.touches_band_edge()
+            if self.band_edge_hit:
+                self.warn_band_edge(self.m_matrix.band)
+
+        # perform the traceback lazily, write_output pulls paths until it has written enough alignments;
+        # the time spent pulling them goes to the traceback, with one cell per pointer stepped through
+        if self.top_k is not None:
+            from suboptimal import WatermanEggert
+            paths = WatermanEggert(self).alignments(self.top_k)
+            self.paths = stats.timed_iter("traceback", paths, lambda hit: len(hit[1]))
+        else:
+            self.paths = stats.timed_iter("traceback", self.iter_paths(), len)
     
-        # write the output to an output file
-        self.write_output()
+        # write the output to an output file, not counting the traceback time spent inside it
+        with stats.phase("write_output") as entry:
+            entry["cells"] = self.write_output()
+        entry["seconds"] = max(0.0, entry["seconds"] - stats.entry("traceback")["seconds"])
+
+        # the alignment is done, nothing left to resume
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+
+    def result_key(self):
+        """
+        Returns the result cache key of the loaded parameters and the options that change the output
+        """
+        from result_cache import result_key
+        options = {"band": self.band, "linear_space": self.linear_space, "max_alignments": self.max_alignments,
+                   "output_format": self.output_format, "top_k": self.top_k}
+        return result_key(self.align_params, options)
+
+    def warn_band_edge(self, band):
+        """
+        Warns that the optimal alignment touches the edge of a band of the given width
+        """
+        print(f"Warning: the optimal alignment touches the edge of the band (width {band}), "
+              "a wider band may score higher", file=sys.stderr)
+
+    def read_cached_result(self, key):
+        """
+        Copies a cached result to the output file and sets the max score from it, warning again if the run that
+        stored it hit the band edge
+
+        Returns:
+            True on a cache hit, False if the alignment has to be computed
+        """
+        found = self.result_cache.open(key)
+        if found is None:
+            return False
+        header, cached = found
+        with cached, self.open_output() as f:
+            shutil.copyfileobj(cached, f)
+        self.max_score = header["score"]
+        self.band_edge_hit = header.get("band_edge_hit", False)
+        if self.band_edge_hit:
+            self.warn_band_edge(header["band"])
+        return True
+
+    def store_result(self, key, offset=0):
+        """
+        Stores the score, the band edge check and the output just written in the result cache. Output files are
+        read back, of the open streams only io.StringIO can be, from offset on.
+        """
+        if isinstance(self.output_file, StringIO):
+            source = nullcontext(StringIO(self.output_file.getvalue()[offset:]))
+        elif hasattr(self.output_file, "write"):
+            return
+        else:
+            source = open(self.output_file, "r")
+        with source as f:
+            info = {"band_edge_hit": self.band_edge_hit}
+            if self.band_edge_hit:
+                info["band"] = int(self.m_matrix.band)
+            self.result_cache.put(key, self.max_score, f, info)
 
     def populate_score_matrices(self):
         """
         Method to populate the score matrices based on the data in align_params.
-        Should call update(i,j) for each entry in the score matrices
+        Should call update(i,j) for each entry in the score matrices, or hand the fill to the wavefront engine
         Note: You MUST initialize M, Ix, Iy in this function rather than elsewhere
         """
 
@@ -339,14 +1179,165 @@ class Align(object):
         # col / row 0 represents starting w a gap
         nrow = len(self.align_params.seq_a) + 1
         ncol = len(self.align_params.seq_b) + 1
-        self.m_matrix = ScoreMatrix("M", nrow, ncol)
-        self.ix_matrix = ScoreMatrix("Ix", nrow, ncol)
-        self.iy_matrix = ScoreMatrix("Iy", nrow, ncol)
+        if self.band is None:
+            self.m_matrix = ScoreMatrix("M", nrow, ncol, self.scratch_dir)
+            self.ix_matrix = ScoreMatrix("Ix", nrow, ncol, self.scratch_dir)
+            self.iy_matrix = ScoreMatrix("Iy", nrow, ncol, self.scratch_dir)
+            band = max(nrow, ncol)
+        else:
+            band = self.band_width()
+            self.m_matrix = BandedScoreMatrix("M", nrow, ncol, band, self.scratch_dir)
+            self.ix_matrix = BandedScoreMatrix("Ix", nrow, ncol, band, self.scratch_dir)
+            self.iy_matrix = BandedScoreMatrix("Iy", nrow, ncol, band, self.scratch_dir)
+
+        # pick up the rows a previous run already filled
+        start_row = self.start_checkpoint() + 1
+        self.filled_cells = self.count_fill_cells(start_row, band)
+
+        if self.engine == "wavefront":
+            self.populate_wavefront(start_row)
+        elif self.engine == "rows":
+            self.populate_rows(start_row)
+        elif self.engine == "tiled":
+            from tiled_fill import populate_tiled
+            populate_tiled(self, start_row, self.workers)
+        else:
+            # update the score matrices, only the cells within the band when banded
+            for row in range(start_row, nrow):
+                for col in range(max(1, row - band), min(ncol - 1, row + band) + 1):
+                    self.update(row, col)
+                self.save_checkpoint(row)
+        self.save_checkpoint(nrow - 1, force=True)
+
+    def count_fill_cells(self, start_row, band):
+        """
+        Returns the number of cells the fill computes from start_row down, those with |col - row| <= band
+        """
+        nrow, ncol = self.m_matrix.nrow, self.m_matrix.ncol
+        rows = np.arange(start_row, nrow)
+        widths = np.minimum(ncol - 1, rows + band) - np.maximum(1, rows - band) + 1
+        return int(np.maximum(widths, 0).sum())
 
-        # update the score matrices 
-        for row in range(1, nrow):
-            for col in range(1, ncol):
-                self.update(row, col)
+    def start_checkpoint(self):
+        """
+        Sets up the checkpoint of the fill if a checkpoint file was given, restoring any rows it already holds
+
+        Returns:
+            the last row already filled in, 0 if there is nothing to resume
+        """
+        if self.checkpoint_file is None:
+            return 0
+        from checkpoint import FillCheckpoint
+
+        # the storage layout depends on the band as well as the parameters
+        band = self.band_width() if self.band is not None else None
+        digest = self.align_params.digest(f"band={band}")
+        self.checkpoint = FillCheckpoint(self.checkpoint_file, digest, [self.m_matrix, self.ix_matrix, self.iy_matrix])
+        self.last_checkpoint = time.monotonic()
+        return self.checkpoint.restore()
+
+    def save_checkpoint(self, rows_done, force=False):
+        """
+        Saves the rows completed since the last checkpoint, if checkpoint_interval seconds have passed
+
+        Inputs:
+           rows_done = the last row whose cells are all filled in
+           force = save regardless of the time
+        """
+        if self.checkpoint is None:
+            return
+        if force or time.monotonic() - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint.save(rows_done)
+            self.last_checkpoint = time.monotonic()
+
+    def band_width(self):
+        """
+        Returns the number of diagonals either side of the main diagonal to compute in banded mode
+        """
+        len_a, len_b = len(self.align_params.seq_a), len(self.align_params.seq_b)
+        if self.band == "auto":
+            band = abs(len_a - len_b) + AUTO_BAND_MARGIN
+        elif int(self.band) < 0:
+            raise ValueError(f"Band width has to be non-negative, got {self.band}")
+        else:
+            band = int(self.band)
+
+        # no point storing diagonals past the corners of the matrix
+        return min(band, max(len_a, len_b))
+
+    def populate_wavefront(self, start_row=1):
+        """
+        Method to fill the already initialized score matrices one anti-diagonal at a time, from start_row down.
+        Every cell on anti-diagonal d = row + col only depends on diagonals d - 1 and d - 2, so each diagonal
+        of M, Ix and Iy is computed as a single NumPy operation. Uses the same recursion, local zero floor
+        and fuzzy tie rule as update(), so the scores and pointer bits come out identical.
+        """
+        params = self.align_params
+        nrow, ncol = self.m_matrix.nrow, self.m_matrix.ncol
+        m, ix, iy = self.m_matrix, self.ix_matrix, self.iy_matrix
+        band = getattr(m, "band", max(nrow, ncol))
+
+        # first computed cell is (start_row,1) on diagonal start_row + 1, last is (nrow-1, ncol-1)
+        for d in range(start_row + 1, nrow + ncol - 1):
+            # rows on this diagonal inside the matrix, and inside the band |d - 2 * row| <= band
+            row_lo = max(start_row, d - (ncol - 1), (d - band + 1) // 2)
+            row_hi = min(nrow - 1, d - 1, (d + band) // 2)
+            rows = np.arange(row_lo, row_hi + 1)
+            if rows.size == 0:
+                continue
+            fill_cells(params, m, ix, iy, rows, d - rows)
+
+            # a row is complete once the diagonal of its last cell, the last column or the band edge, is done
+            self.save_checkpoint(min(nrow - 1, max(d - (ncol - 1), (d - band) // 2)))
+
+    def populate_rows(self, start_row=1):
+        """
+        Method to fill the already initialized score matrices one row at a time, from start_row down.
+        M and Ix only depend on the row above, so they are computed for the whole row at once; Iy depends on the
+        cell to its left and is scanned along the row. Every matrix is read and written in row order, which streams
+        memory-mapped matrices through the page cache. Scores and pointer bits come out identical to update().
+        """
+        params = self.align_params
+        nrow, ncol = self.m_matrix.nrow, self.m_matrix.ncol
+        local = params.local_alignment
+        codes_a, codes_b = params.seq_a_codes, params.seq_b_codes
+        match_scores = params.match_matrix.scores
+
+        m, ix, iy = self.m_matrix, self.ix_matrix, self.iy_matrix
+        bit_m, bit_ix, bit_iy = POINTER_BITS["M"], POINTER_BITS["Ix"], POINTER_BITS["Iy"]
+        band = getattr(m, "band", max(nrow, ncol))
+
+        for row in range(start_row, nrow):
+            cols = np.arange(max(1, row - band), min(ncol - 1, row + band) + 1)
+            if cols.size == 0:
+                continue
+            rows = np.full(cols.size, row)
+
+            # M: diagonal step from all three matrices plus the match score
+            s_ij = match_scores[codes_a[row - 1], codes_b[cols - 1]]
+            m.scatter(rows, cols, *vector_maxes(
+                [m.gather(rows - 1, cols - 1) + s_ij, ix.gather(rows - 1, cols - 1) + s_ij, iy.gather(rows - 1, cols - 1) + s_ij],
+                [bit_m, bit_ix, bit_iy], local))
+
+            # Ix: vertical step, gap in B
+            ix.scatter(rows, cols, *vector_maxes(
+                [m.gather(rows - 1, cols) - params.dy, ix.gather(rows - 1, cols) - params.ey], [bit_m, bit_ix], local))
+
+            # Iy: horizontal step, gap in A, each cell needs the one to its left so the values are scanned
+            from_m = m.gather(rows, cols - 1) - params.dx
+            if local:
+                from_m = np.maximum(0.0, from_m)
+            iy_vals = []
+            prev = float(iy.gather(rows[:1], cols[:1] - 1)[0])
+            for cand in from_m.tolist():
+                extend = prev - params.ex
+                if local:
+                    extend = max(0.0, extend)
+                prev = max(cand, extend)
+                iy_vals.append(prev)
+            from_iy = np.concatenate([iy.gather(rows[:1], cols[:1] - 1), iy_vals[:-1]]) - params.ex
+            iy.scatter(rows, cols, *vector_maxes([from_m, from_iy], [bit_m, bit_iy], local))
+            self.save_checkpoint(row)
 
     def update(self, row, col):
         """
@@ -374,21 +1365,20 @@ class Align(object):
         candidate_score_entries = []
         prev = (row - 1, col - 1)
 
-        # get score for match from hash table
+        # get score for match from the dense match matrix with the encoded sequences
         # correct score lives at index - 1 because we are 1-indexed on the
-        S_ij = self.align_params.match_matrix.get_score(self.align_params.seq_a[row-1], self.align_params.seq_b[col-1])
+        S_ij = float(self.align_params.match_matrix.scores[self.align_params.seq_a_codes[row-1], self.align_params.seq_b_codes[col-1]])
             
         # loop through the three score matrices, create candidate score to represent score if we came from this potential space, and append to the list of score 
         for matrix in [self.m_matrix, self.ix_matrix, self.iy_matrix]:
-            prev_score_obj = matrix.get_score_obj(prev[0], prev[1])
-            update_score = prev_score_obj.score + S_ij
+            update_score = matrix.get_score(prev[0], prev[1]) + S_ij
 
             # zero out negative scores for local alignment
             if self.align_params.local_alignment:
                 update_score = max(float(0), update_score)
 
             # create score entry object and append to candidate list
-            cand = ScoreEntry(prev[0], prev[1], update_score, prev_score_obj.matrix_name)
+            cand = ScoreEntry(prev[0], prev[1], update_score, matrix.name)
             candidate_score_entries.append(cand)
 
         # get the max score and pointers from list of score entries
@@ -411,15 +1401,14 @@ class Align(object):
         prev = (row - 1, col)
         # loop through the two score matrices, adjust score to represent score if we came from this potential space, and append to the list of scores
         for matrix, penalty in zip([self.m_matrix, self.ix_matrix], [self.align_params.dy, self.align_params.ey]):
-            prev_score_obj = matrix.get_score_obj(prev[0], prev[1])
-            update_score = prev_score_obj.score - penalty
+            update_score = matrix.get_score(prev[0], prev[1]) - penalty
 
             # zero out negative scores for local alignment
             if self.align_params.local_alignment:
                 update_score = max(float(0), update_score)
 
             # create score entry object and append to candidate list
-            cand = ScoreEntry(prev[0], prev[1], update_score, prev_score_obj.matrix_name)
+            cand = ScoreEntry(prev[0], prev[1], update_score, matrix.name)
             candidate_score_entries.append(cand)
 
         # get the max score and pointers
@@ -444,15 +1433,14 @@ class Align(object):
 
         # loop through the two score matrices, adjust score to represent score if we came from this potential space, and append to the list of scores
         for matrix, penalty in zip([self.m_matrix, self.iy_matrix], [self.align_params.dx, self.align_params.ex]):
-            prev_score_obj = matrix.get_score_obj(prev[0], prev[1])
-            update_score = prev_score_obj.score - penalty
+            update_score = matrix.get_score(prev[0], prev[1]) - penalty
 
             # zero out negative scores for local alignment
             if self.align_params.local_alignment:
                 update_score = max(float(0), update_score)
 
             # create score entry object and append to candidate list
-            cand = ScoreEntry(prev[0], prev[1], update_score, prev_score_obj.matrix_name)
+            cand = ScoreEntry(prev[0], prev[1], update_score, matrix.name)
             candidate_score_entries.append(cand)
         
         # get the max score and pointers
@@ -473,46 +1461,38 @@ class Align(object):
              (ex. [(1,2), (3,4)])
         """
         nrow, ncol = self.m_matrix.nrow, self.m_matrix.ncol
-        max_score = float('-inf')
-        max_loc = set()
-        scores = set()
+        epsilon = 10**(-6)
 
         # When looking for best match: 
         # local looks for the best score anywhere in the matrix, 
         # while global looks only in last row and last column.
+        # Each row or column is compared at once, with the same fuzzy equality as fuzzy_equals
         if self.align_params.local_alignment:
             # best anywhere in the matrix
-            for row in range(1, nrow):
-                for col in range(1, ncol):
-                    score = self.m_matrix.get_score(row, col)
-                    scores.add(score)
-            max_score = max(scores)
+            max_score = max(float(scores.max()) for _, scores in map(self.m_matrix.row_scores, range(1, nrow)) if scores.size)
             max_loc = set()
             for row in range(1, nrow):
-                for col in range(1, ncol):
-                    if fuzzy_equals(self.m_matrix.get_score(row, col), max_score):
-                        max_loc.add((row, col))
+                cols, scores = self.m_matrix.row_scores(row)
+                for col in cols[np.abs(scores - max_score) < epsilon]:
+                    max_loc.add((row, int(col)))
 
             # round to the first decimal place
             return round(float(max_score), 1), max_loc
         else:
             # best in the last row or the last column 
-            for col in range(1, ncol):
-                score = self.m_matrix.get_score(nrow - 1, col)
-                scores.add(score)
-            for row in range(1, nrow):
-                score = self.m_matrix.get_score(row, ncol - 1)
-                scores.add(score)
-
-            max_score = max(scores)
+            last_row = self.m_matrix.row_scores(nrow - 1)
+            last_col = self.m_matrix.col_scores(ncol - 1)
+            if last_row[1].size + last_col[1].size == 0:
+                raise ValueError("The band doesn't reach the last row or column, use a wider band")
+            max_score = max(float(scores.max()) for scores in (last_row[1], last_col[1]) if scores.size)
             max_loc = set()
 
-            for col in range(1, ncol):
-                if fuzzy_equals(self.m_matrix.get_score(nrow - 1, col), max_score):
-                    max_loc.add((nrow - 1, col))
-            for row in range(1, nrow):
-                if fuzzy_equals(self.m_matrix.get_score(row, ncol - 1), max_score):
-                    max_loc.add((row, ncol - 1))
+            cols, scores = last_row
+            for col in cols[np.abs(scores - max_score) < epsilon]:
+                max_loc.add((nrow - 1, int(col)))
+            rows, scores = last_col
+            for row in rows[np.abs(scores - max_score) < epsilon]:
+                max_loc.add((int(row), ncol - 1))
 
             # round the max score to 1 decimal places
             return round(float(max_score), 1), max_loc
@@ -523,65 +1503,154 @@ class Align(object):
         Performs a traceback.
         Hint: include a way to printing the traceback path. This will be helpful for debugging!
            ex. M(5,4)->Iy(4,3)->M(4,2)->Ix(3,1)->Ix(2,1)->M(1,1)->M(0,0)
+
+        Returns:
+            a list of every co-optimal path, see iter_paths() to walk them lazily instead
         """
+        return list(self.iter_paths())
 
-        # initialize the name to matrix dictionary and paths
+    def iter_paths(self):
+        """
+        Generator over the traceback paths, walking the pointer DAG depth first with an explicit stack instead
+        of recursion, so long alignments don't hit the recursion limit and only one path is held at a time.
+        Paths come out in the same order the recursive traceback produced them.
+        Each path is a list of pointers from the max location back to the start, and starts and ends in M.
+        """
+        # initialize the name to matrix dictionary
         name_to_matrix = {"M": self.m_matrix, "Ix": self.ix_matrix, "Iy": self.iy_matrix}
-        paths = []
+        local = self.align_params.local_alignment
 
-        # Here is one of the bug fixes I mentioned in my quiz
-        def traceback_depth_first_search(ptr, path):
-            """
-            Helper function to perform a depth first search of the traceback use pointers as edges and score entry objects as nodes
-            """
-            name, row, col = ptr.name, ptr.row, ptr.col
-            matrix = name_to_matrix[name]
-            score_obj = matrix.get_score_obj(row, col)
-
-            # in local alignment if we find a zero, we terminate and return 
-            if self.align_params.local_alignment and fuzzy_equals(float(score_obj.score), 0.0):
-                # Here is one of the bug fixes I mentioned in my quiz
-                paths.append(path[:-1])
-                return
-            
-            # base case that we hit a boundary, add path to paths and return
-            if row == 0 or col == 0:
-                paths.append(path)
-                return
-
-            # get the pointers for the score entry object
-            pointers = score_obj.pointers
-          
-            # recuse down path with each pointer
-            for ptr in pointers:
-                traceback_depth_first_search(ptr, path + [ptr])
-        
         # for each max location, perform a depth first search
-        max_loc = self.max_loc
-        for loc in max_loc:
-            score_entry_loc = self.m_matrix.get_score_obj(loc[0], loc[1])
-            pointers = score_entry_loc.pointers
-            # init with a pointer to max loc 
+        for loc in self.max_loc:
+            # init with a pointer to max loc, the stack holds the pointers still to visit below each path entry
             path = [pointer(loc[0], loc[1], "M")]
-            for ptr in pointers:
+            stack = [iter(self.m_matrix.get_pointers(loc[0], loc[1]))]
+
+            while stack:
+                ptr = next(stack[-1], None)
+
+                # every pointer below the end of the path has been visited, step back up
+                if ptr is None:
+                    stack.pop()
+                    path.pop()
+                    continue
+
+                path.append(ptr)
+                matrix = name_to_matrix[ptr.name]
+
+                # in local alignment if we find a zero, we terminate without the zero entry
                 # Here is one of the bug fixes I mentioned in my quiz
-                traceback_depth_first_search(ptr, path + [ptr])
+                if local and fuzzy_equals(matrix.get_score(ptr.row, ptr.col), 0.0):
+                    done = path[:-1]
+
+                # base case that we hit a boundary
+                elif ptr.row == 0 or ptr.col == 0:
+                    done = list(path)
+
+                # otherwise keep going down with each pointer
+                else:
+                    stack.append(iter(matrix.get_pointers(ptr.row, ptr.col)))
+                    continue
+                path.pop()
 
+                # only keep paths that start and end in the M matrix
+                if done[-1].name == "M" and done[0].name == "M":
+                    yield done
 
-        # clean up paths to remove all right-sided substrings by removing all pointers that end in Ix and Iy matrices
-        # remove all paths that does not start and end in the M matrix (shouldnt be possible as we start by pointing to the M matrix)
-        # return paths
-        return_paths = []
-        for path in paths:
-            if path[-1].name == "M" and path[0].name == "M":
-                return_paths.append(path)
-        return return_paths
+    def count_paths(self):
+        """
+        Counts the co-optimal traceback paths without enumerating them, by counting the paths below each
+        pointer DAG node once (dynamic programming over the DAG with an explicit stack).
+        The count matches len(self.traceback()); write_output may write fewer alignments, since two paths can
+        spell the same alignment strings.
+
+        Returns:
+            the number of paths iter_paths() would yield
+        """
+        name_to_matrix = {"M": self.m_matrix, "Ix": self.ix_matrix, "Iy": self.iy_matrix}
+        local = self.align_params.local_alignment
+
+        # number of finished paths below an expanded node, keyed by (name, row, col)
+        counts = {}
+
+        def children(node):
+            """
+            Splits a node's pointers into the number of paths that finish right below it and the nodes to expand
+            """
+            name, row, col = node
+            finished = 0
+            expand = []
+            for ptr in name_to_matrix[name].get_pointers(row, col):
+                if local and fuzzy_equals(name_to_matrix[ptr.name].get_score(ptr.row, ptr.col), 0.0):
+                    # the path ends at this node, which has to be in M
+                    finished += name == "M"
+                elif ptr.row == 0 or ptr.col == 0:
+                    finished += ptr.name == "M"
+                else:
+                    expand.append((ptr.name, ptr.row, ptr.col))
+            return finished, expand
+
+        total = 0
+        for loc in self.max_loc:
+            root = ("M", loc[0], loc[1])
+            stack = [root]
+            while stack:
+                node = stack[-1]
+                if node in counts:
+                    stack.pop()
+                    continue
+                finished, expand = children(node)
+                pending = [child for child in expand if child not in counts]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                counts[node] = finished + sum(counts[child] for child in expand)
+                stack.pop()
+            total += counts[root]
+        return total
+
+    def touches_band_edge(self):
+        """
+        Checks whether any cell on a co-optimal path sits on the edge of the band, next to cells we never
+        computed, in which case a path leaving the band could have scored higher.
+        Visits each node reachable through the pointers once. This can't see a better path that stays well
+        away from the band altogether, so a False is only as good as the choice of band.
+
+        Returns:
+            True if the optimum may have touched the band edge
+        """
+        band = self.m_matrix.band
+        nrow, ncol = self.m_matrix.nrow, self.m_matrix.ncol
+        name_to_matrix = {"M": self.m_matrix, "Ix": self.ix_matrix, "Iy": self.iy_matrix}
+        local = self.align_params.local_alignment
+
+        stack = [("M", row, col) for row, col in self.max_loc]
+        seen = set()
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            name, row, col = node
+            if row == 0 or col == 0:
+                continue
+
+            # an edge cell only counts when the matrix carries on past the band there
+            if (col - row == band and col + 1 < ncol) or (row - col == band and row + 1 < nrow):
+                return True
+            for ptr in name_to_matrix[name].get_pointers(row, col):
+                if local and fuzzy_equals(name_to_matrix[ptr.name].get_score(ptr.row, ptr.col), 0.0):
+                    continue
+                stack.append((ptr.name, ptr.row, ptr.col))
+        return False
 
     def print_paths(self):
         """
         Method to print the paths.
         """
-        for i, path in enumerate(self.paths):
+        # self.paths is a lazy generator once write_output has run, so walk the matrices again when we have them
+        paths = self.iter_paths() if self.m_matrix is not None else self.paths
+        for i, path in enumerate(paths):
             print(f"Path {i+1}: ", end="")
             for pointer in path:
                 print(pointer, end=" -> ")
@@ -594,64 +1663,183 @@ class Align(object):
         Reverse the path to get the correct alignment.
         Also write the max score to the output file.
         Special formatting for the autograder.
+        Each alignment is written as soon as its path comes out of the traceback, in the format given by
+        output_format, and only a 16 byte hash of it is kept to spot repeats.
+
+        With an alignment_stats_file, the path_stats of each alignment written go to it as JSON lines.
+
+        Returns:
+            the number of path cells in the alignments written
         """
-        alignments = []
         seen = set()
+        written = 0
+        written_cells = 0
+        format_path = self.format_cigar if self.output_format == "cigar" else self.format_alignment
+
+        if self.alignment_stats_file is not None:
+            stats_output = open(self.alignment_stats_file, "w")
+        else:
+            stats_output = nullcontext()
+        with self.open_output() as f, stats_output as stats_f:
+            # top-K alignments each have their own score, written on the line before the alignment
+            if self.top_k is None:
+                f.write(str(self.max_score) + "\n\n")
+
+            # Will create an alignment for each path, paths are pulled lazily so we can stop at max_alignments
+            for path in self.paths:
+                if self.max_alignments is not None and written >= self.max_alignments:
+                    break
+                if self.top_k is not None:
+                    score, path = path
+                    record = str(score) + "\n" + format_path(path)
+                else:
+                    score = self.max_score
+                    record = format_path(path)
+
+                # never write the same alignment twice, comparing hashes rather than whole alignments
+                key = hashlib.blake2b(record.encode(), digest_size=16).digest()
+                if key not in seen:
+                    seen.add(key)
+                    f.write(record)
+                    if stats_f is not None:
+                        entry = {"index": written, "score": float(score)}
+                        entry.update(path_stats(path, self.align_params.seq_a, self.align_params.seq_b))
+                        stats_f.write(json.dumps(entry) + "\n")
+                    written += 1
+                    written_cells += len(path)
+        return written_cells
+
+    def open_output(self):
+        """
+        Returns a context manager for writing to the output file; an open stream is written to but left open
+        for the caller
+        """
+        if hasattr(self.output_file, "write"):
+            return nullcontext(self.output_file)
+        return open(self.output_file, "w")
 
-        # Will create an alignment for each path
-        for path in self.paths:
-            a = []; b = []
+    def format_alignment(self, path):
+        """
+        Returns the two gapped sequence lines of the alignment along a path, followed by a blank line
+        """
+        a = []; b = []
 
-            # pointers go from the end to the start, we want start to end
-            for ptr in reversed(path):
-                i, j, name = ptr.row, ptr.col, ptr.name
+        # pointers go from the end to the start, we want start to end
+        for ptr in reversed(path):
+            i, j, name = ptr.row, ptr.col, ptr.name
 
-                # skip if we hit a boundary
-                if i == 0 or j == 0: continue
+            # skip if we hit a boundary
+            if i == 0 or j == 0: continue
 
-                # if diagonal, emit one char from each sequence
-                if name == "M":
-                    a.append(self.align_params.seq_a[i-1]); b.append(self.align_params.seq_b[j-1])
+            # if diagonal, emit one char from each sequence
+            if name == "M":
+                a.append(self.align_params.seq_a[i-1]); b.append(self.align_params.seq_b[j-1])
 
-                # if horizontal, emit a gap for b and char for a
-                elif name == "Ix":
-                    a.append(self.align_params.seq_a[i-1]); b.append("_")
+            # if horizontal, emit a gap for b and char for a
+            elif name == "Ix":
+                a.append(self.align_params.seq_a[i-1]); b.append("_")
 
-                # if vertical, emit a gap for a and char for b
-                else:
-                    a.append("_"); b.append(self.align_params.seq_b[j-1])
+            # if vertical, emit a gap for a and char for b
+            else:
+                a.append("_"); b.append(self.align_params.seq_b[j-1])
 
-            # create the key for the alignment and add to seen if not already in seen, never append the same alignment twice
-            key = ("".join(a), "".join(b))
-            if key not in seen:
-                seen.add(key)
-                alignments.append({"a": key[0], "b": key[1]})
-            
-        # write the output to the output file
-        with open(self.output_file, "w") as f:
-            f.write(str(self.max_score) + "\n\n")
-            for al in alignments:
-                f.write(al["a"] + "\n")
-                f.write(al["b"] + "\n\n")
+        return "".join(a) + "\n" + "".join(b) + "\n\n"
+
+    def format_cigar(self, path):
+        """
+        Returns the alignment along a path as one tab separated line: the 1-based inclusive start and end in
+        sequence A, the start and end in sequence B, and the CIGAR string (see path_to_cigar)
+        """
+        (a_start, a_end, b_start, b_end), cigar = path_to_cigar(path)
+        return f"{a_start}\t{a_end}\t{b_start}\t{b_end}\t{cigar}\n"
 
 def main():
 
     # check that the file is being properly used
-    if (len(sys.argv) !=3):
-        print("Please specify an input file and an output file as args.")
-        return
-        
+    parser = argparse.ArgumentParser(description="Align the two sequences in an alignment input file.")
+    parser.add_argument("input_file", help="specially formatted alignment input file")
+    parser.add_argument("output_file", help="file to write the score and alignments to")
+    parser.add_argument("--engine", choices=ENGINES, default="cell",
+                        help="fill engine for the score matrices (default: cell)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for --engine tiled (default: one per CPU)")
+    parser.add_argument("--linear-space", action="store_true",
+                        help="global alignment in linear memory, writes one optimal alignment")
+    parser.add_argument("--band", default=None,
+                        help="only compute cells within this many diagonals of the main diagonal, or 'auto' "
+                             "for the length difference plus a margin")
+    parser.add_argument("--max-alignments", type=int, default=None,
+                        help="stop after writing this many distinct alignments")
+    parser.add_argument("--scratch-dir", default=None,
+                        help="memory-map the score matrices in this directory, for alignments bigger than memory "
+                             "(best with --engine rows)")
+    parser.add_argument("--checkpoint", default=None,
+                        help="save the fill to this file every --checkpoint-interval seconds, and resume from it "
+                             "if it exists")
+    parser.add_argument("--checkpoint-interval", type=float, default=CHECKPOINT_INTERVAL,
+                        help=f"seconds between checkpoints (default: {CHECKPOINT_INTERVAL})")
+    parser.add_argument("--param-cache", default=None,
+                        help="directory to cache parsed input files in, so repeated runs skip parsing")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="alignment",
+                        help="write the gapped sequences, or coordinates and a CIGAR string per alignment "
+                             "(default: alignment)")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="local alignment only: write the K best alignments that don't share an aligned pair, "
+                             "each after its score")
+    parser.add_argument("--stats-json", default=None,
+                        help="write the time, cells and cells per second of each phase as JSON to this file, "
+                             "'-' for stdout")
+    parser.add_argument("--track-memory", action="store_true",
+                        help="also record the peak memory of each phase in --stats-json; tracing allocations "
+                             "slows the fill down, so the timings of such a run are not representative")
+    parser.add_argument("--result-cache", default=None,
+                        help="directory of a result cache: reuse the output of an earlier run with the same "
+                             "sequences, scoring and options, and store this one")
+    parser.add_argument("--result-cache-size", type=float, default=1024,
+                        help="size budget of the result cache in MB, least recently used results are evicted "
+                             "beyond it (default: 1024)")
+    parser.add_argument("--alignment-stats", default=None,
+                        help="write the coordinates, identity, mismatches and gaps of each alignment written as "
+                             "JSON lines to this file")
+    parser.add_argument("--count-alignments", action="store_true",
+                        help="print the number of co-optimal traceback paths")
+    args = parser.parse_args()
+
     # input variables
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    input_file = args.input_file
+    output_file = args.output_file
 
     # if output file doesn't exist, create it
     if not os.path.exists(output_file):
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
     # create an align object and run
-    align = Align(input_file, output_file)
+    band = args.band if args.band in (None, "auto") else int(args.band)
+    result_cache = None
+    if args.result_cache is not None:
+        from result_cache import ResultCache
+        result_cache = ResultCache(args.result_cache, int(args.result_cache_size * 2**20))
+    align = Align(input_file, output_file, engine=args.engine, linear_space=args.linear_space,
+                  max_alignments=args.max_alignments, band=band, scratch_dir=args.scratch_dir,
+                  checkpoint_file=args.checkpoint, checkpoint_interval=args.checkpoint_interval,
+                  param_cache_dir=args.param_cache, output_format=args.output_format,
+                  top_k=args.top_k, track_memory=args.track_memory, workers=args.workers,
+                  result_cache=result_cache, alignment_stats_file=args.alignment_stats)
     align.align()
+    if result_cache is not None:
+        result_cache.close()
+
+    if args.stats_json == "-":
+        print(json.dumps(align.stats.summary(), indent=2))
+    elif args.stats_json is not None:
+        with open(args.stats_json, "w") as f:
+            json.dump(align.stats.summary(), f, indent=2)
+
+    # counting walks the pointer DAG once per node, so it is cheap even when enumerating would not be
+    if args.count_alignments and align.cache_hit:
+        print("Result came from the cache, no traceback paths to count", file=sys.stderr)
+    elif args.count_alignments and not args.linear_space and args.top_k is None:
+        print(f"{align.count_paths()} co-optimal traceback paths")
 
 if __name__=="__main__":
     main()
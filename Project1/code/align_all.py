@@ -1,14 +1,15 @@
 import os
-import sys
-import subprocess
 
-def run_all():
+from batch_align import run_batch
+
+def run_all(workers=None):
     base_dir = os.path.dirname(__file__)
     examples_dir = os.path.normpath(os.path.join(base_dir, "..", "examples"))
-    align_py = os.path.join(base_dir, "align.py")
 
     suffixes = [""] + [str(i) for i in range(1, 9)]
     results = []
+    jobs = []
+    tags = []
 
     for sfx in suffixes:
         in_name = f"alignment_example{sfx}.input" if sfx else "alignment_example.input"
@@ -17,23 +18,29 @@ def run_all():
         out_path = os.path.join(examples_dir, out_name)
 
         if not os.path.exists(in_path):
-            results.append((sfx or "0", False, f"missing input {in_path}"))
+            results.append((sfx or "0", "skip", f"missing input {in_path}"))
             continue
 
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        subprocess.run([sys.executable, align_py, in_path, out_path], check=True)
-        results.append((sfx or "0", True, out_path))
+        jobs.append((in_path, out_path))
+        tags.append(sfx or "0")
+
+    # run the examples in a pool of workers instead of a new interpreter per example
+    for tag, job in zip(tags, run_batch(jobs, workers=workers)):
+        if job["ok"]:
+            results.append((tag, "ok", f"{job['output']} ({job['seconds']:.2f}s)"))
+        else:
+            results.append((tag, "fail", f"{job['input']}: {job['error']}"))
 
     return results
 
 def main():
     runs = run_all()
-    for tag, ok, msg in runs:
-        print(f"[{tag}] {'ok' if ok else 'skip'}: {msg}")
+    for tag, status, msg in runs:
+        print(f"[{tag}] {status}: {msg}")
 
     # Run the comparer
     from check_output import main as check_main
-    check_main()
+    check_main([])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -4,6 +4,8 @@ These are applied to output alignments (and in one case also the input alignment
 
 To run, write code that calls each function with the appropriate input/output files.
 """
+import json
+
 
 def is_number(s):
     """
@@ -175,7 +177,8 @@ def count_gaps(fname):
                     gap_list.append(gap_len)
                     curr_gap = False
         num_gaps.append(len(gap_list))
-        avg_gap_length = float(sum(gap_list))/len(gap_list)
+        # a gapless alignment has no gap length to average, count it as 0
+        avg_gap_length = float(sum(gap_list))/len(gap_list) if gap_list else 0.0
         gap_length.append(avg_gap_length) # avg gap length for each
 
     # calculate the averages
@@ -186,4 +189,30 @@ def count_gaps(fname):
     return (avg_num_gaps, avg_length_all)
 
 
+def average_alignment_stats(stats_file):
+    """
+    Same averages as count_mismatches and count_gaps, read from the statistics align.py writes with
+    --alignment-stats instead of re-parsing the output. A gap in A right after a gap in B counts as two gaps
+    there, since they are scored as two.
 
+    Inputs:
+       stats_file = the JSON lines file from align.py --alignment-stats
+
+    Returns:
+       a tuple of the average number of mismatches, the average number of gaps and the average gap length
+    Raises:
+       ValueError if the file holds no alignments
+    """
+    with open(stats_file, 'r') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    n = len(entries)
+    if n == 0:
+        raise ValueError(f"No alignment statistics in {stats_file}, nothing to average")
+    avg_mismatches = sum(entry["mismatches"] for entry in entries) / n
+    avg_num_gaps = sum(entry["gap_opens"] for entry in entries) / n
+    avg_length_all = sum(entry["gap_columns"] / entry["gap_opens"] if entry["gap_opens"] else 0.0
+                         for entry in entries) / n
+    print("Average number of mismatches per alignment: %.2f" %avg_mismatches)
+    print("Average number of gaps per alignment: %.2f" %avg_num_gaps)
+    print("Average length of gaps (this is the average of all averages): %.2f" %avg_length_all)
+    return (avg_mismatches, avg_num_gaps, avg_length_all)
@@ -0,0 +1,461 @@
+"""
+Long-running alignment server: keeps parsed scoring and warm worker processes around between requests.
+
+Running python align.py per pair pays for starting the interpreter, importing NumPy, parsing the input file and
+writing the output file every time. This server listens on a localhost TCP port or a Unix socket, built on
+asyncio. Clients send sequence pairs with a scoring (the text of an align.py input file, with or without the
+sequence lines) or the id of a scoring sent before. Requests are gathered into batches, by count, by total
+matrix cells or after a short wait, and each batch runs on a pool of worker processes. Results are streamed back
+as each batch finishes, so they can come back in a different order than the requests went out.
+
+Protocol: one JSON object per line in each direction. Every request can carry an "id", which is echoed back in its
+response.
+
+  {"op": "register", "scoring": "<input file text>"}
+      -> {"ok": true, "param_id": "<hex digest>"}
+  {"op": "align", "param_id": "<hex>" or "scoring": "<text>", "seq_a": "...", "seq_b": "...", <options>}
+      -> {"ok": true, "param_id": "<hex>", "score": 7.1, "output": "<align.py output file contents>"}
+  {"op": "ping"}
+      -> {"ok": true, "requests": <aligned so far>, "batches": <batches run>, "scorings": <scorings held>}
+
+The align options are the Align keyword arguments in ALIGN_OPTIONS, and "score_only": true skips the traceback and
+returns just the score (with "linear_space" the score still comes from the linear-space fill). A failed request
+gets {"ok": false, "error": "..."}. Scorings are kept by the digest of their parsed values (see
+AlignmentParameters.digest), so the same scoring gets the same id however its text is laid out. Only the
+MAX_SCORINGS most recently used are kept. Each scoring is also saved once to a scoring directory in the
+param_cache.py format; batches only carry the ids, and each worker loads a scoring from there the first time it
+sees it and keeps it.
+
+To run:
+  python align_server.py --port 8765 --workers 4
+  python align_server.py --unix /tmp/align.sock
+AlignClient is a small blocking client for scripts and pipelines.
+"""
+import io
+import os
+import sys
+import copy
+import json
+import shutil
+import socket
+import tempfile
+import asyncio
+import argparse
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from align import Align, AlignmentParameters
+from batch_align import future_result
+from param_cache import save_params, read_params
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# a batch goes to the workers once it holds BATCH_SIZE requests or BATCH_CELLS matrix cells, or BATCH_WINDOW
+# seconds after its first request came in
+BATCH_SIZE = 32
+BATCH_CELLS = 1_000_000
+BATCH_WINDOW = 0.005
+
+# parsed scorings kept, least recently used dropped first
+MAX_SCORINGS = 256
+
+# Align keyword arguments a request may set, and the defaults of the server: co-optimal alignments can run into
+# the millions, so by default only the first DEFAULT_MAX_ALIGNMENTS are sent back
+ALIGN_OPTIONS = ("engine", "band", "max_alignments", "output_format", "top_k", "linear_space")
+DEFAULT_MAX_ALIGNMENTS = 100
+
+# longest request line the server reads
+MAX_LINE = 64 * 2**20
+
+
+# per worker process: the scoring directory and the scorings loaded from it, set up by init_worker
+worker_state = {}
+
+
+def scoring_path(scoring_dir, param_id):
+    """
+    Returns the file a scoring is saved to in the scoring directory
+    """
+    return os.path.join(scoring_dir, f"{param_id}.bin")
+
+
+def init_worker(scoring_dir):
+    """
+    Pool initializer: points the worker at the scoring directory, so batches only carry scoring ids
+    """
+    worker_state.update(scoring_dir=scoring_dir, scorings=OrderedDict())
+
+
+def worker_scoring(param_id):
+    """
+    Returns a scoring in a worker, loading it from the scoring directory the first time
+    """
+    scorings = worker_state["scorings"]
+    if param_id not in scorings:
+        scorings[param_id] = read_params(scoring_path(worker_state["scoring_dir"], param_id))
+        while len(scorings) > MAX_SCORINGS:
+            scorings.popitem(last=False)
+    scorings.move_to_end(param_id)
+    return scorings[param_id]
+
+
+def align_batch(batch):
+    """
+    Runs a batch of alignments in a worker process
+
+    Inputs:
+       batch = list of (request id, scoring id, seq_a, seq_b, options)
+    Returns:
+       list of response dicts, in the order of the batch
+    """
+    responses = []
+    for request_id, param_id, seq_a, seq_b, options in batch:
+        try:
+            options = dict(options)
+            score_only = options.pop("score_only", False)
+            params = copy.copy(worker_scoring(param_id))
+            params.set_sequences(seq_a, seq_b)
+            output = io.StringIO()
+            align = Align.from_params(params, output, **options)
+            if score_only and align.linear_space:
+                # the score without the full matrices
+                from linear_space import LinearSpaceAligner
+                align.max_score, align.max_loc = LinearSpaceAligner(params).score()
+            elif score_only:
+                align.populate_score_matrices()
+                align.max_score, align.max_loc = align.find_traceback_start()
+            else:
+                align.align()
+            response = {"id": request_id, "ok": True, "score": align.max_score}
+            if not score_only:
+                response["output"] = output.getvalue()
+        except Exception as err:
+            response = {"id": request_id, "ok": False, "error": f"{type(err).__name__}: {err}"}
+        responses.append(response)
+    return responses
+
+
+def failed_batch(batch, error):
+    """
+    Returns the responses of a batch whose worker died
+    """
+    return [{"id": item[0], "ok": False, "error": error} for item in batch]
+
+
+class AlignServer(object):
+    """
+    Object to hold the state of the server: the parsed scorings, the pending batch and the worker pool
+    """
+
+    def __init__(self, workers=None, batch_size=BATCH_SIZE, batch_cells=BATCH_CELLS, batch_window=BATCH_WINDOW):
+        """
+        Input:
+            workers = number of worker processes, None for one per CPU
+            batch_size, batch_cells, batch_window = when a batch is sent to the workers, see BATCH_SIZE
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_cells = batch_cells
+        self.batch_window = batch_window
+        self.scorings = OrderedDict()
+        self.scoring_dir = None
+
+        # queued or running requests per scoring id, an evicted scoring's file stays until they are done
+        self.in_flight = Counter()
+        self.pool = None
+
+        # requests waiting for the next batch: (request, scoring, writer), and their total cells
+        self.pending = []
+        self.pending_cells = 0
+        self.flush_handle = None
+        self.running = set()
+        self.loop = None
+        self.stopping = None
+        self.aligned = 0
+        self.batches = 0
+
+    def register(self, text):
+        """
+        Parses a scoring and keeps it, returning its id; a new scoring is saved for the workers to load
+        """
+        scoring = AlignmentParameters()
+        scoring.load_scoring_from_string(text)
+        param_id = scoring.digest()
+        path = scoring_path(self.scoring_dir, param_id)
+        if not os.path.exists(path):
+            save_params(scoring, path)
+        self.scorings[param_id] = scoring
+        self.scorings.move_to_end(param_id)
+        while len(self.scorings) > MAX_SCORINGS:
+            evicted, _ = self.scorings.popitem(last=False)
+            self.release_scoring(evicted)
+        return param_id
+
+    def release_scoring(self, param_id):
+        """
+        Deletes the saved file of a scoring that was evicted, once no queued or running request needs it
+        """
+        if param_id not in self.scorings and not self.in_flight[param_id]:
+            try:
+                os.remove(scoring_path(self.scoring_dir, param_id))
+            except FileNotFoundError:
+                pass
+
+    def scoring_for(self, request):
+        """
+        Returns (param_id, scoring) of a request, from its inline scoring or a registered id
+        """
+        if "scoring" in request:
+            param_id = self.register(request["scoring"])
+        else:
+            param_id = request.get("param_id")
+            if param_id not in self.scorings:
+                raise ValueError(f"Unknown param_id {param_id!r}, register the scoring again")
+            self.scorings.move_to_end(param_id)
+        return param_id, self.scorings[param_id]
+
+    async def handle_client(self, reader, writer):
+        """
+        Reads the requests of one connection, answering register and ping right away and queueing alignments
+        """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # the line is longer than MAX_LINE, there is no telling where the next request starts
+                    self.respond(writer, {"id": None, "ok": False,
+                                          "error": f"Request line longer than {MAX_LINE} bytes, closing"})
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                request = {}
+                try:
+                    request = json.loads(line)
+                    op = request.get("op", "align")
+                    if op == "align":
+                        self.enqueue(request, writer)
+                    elif op == "register":
+                        self.respond(writer, {"id": request.get("id"), "ok": True,
+                                              "param_id": self.register(request["scoring"])})
+                    elif op == "ping":
+                        self.respond(writer, {"id": request.get("id"), "ok": True, "requests": self.aligned,
+                                              "batches": self.batches, "scorings": len(self.scorings)})
+                    else:
+                        raise ValueError(f"Unknown op {op!r}")
+                except Exception as err:
+                    self.respond(writer, {"id": request.get("id") if isinstance(request, dict) else None,
+                                          "ok": False, "error": f"{type(err).__name__}: {err}"})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # the client went away
+            pass
+        finally:
+            # also when the server is shutting down, the cancellation carries on once the connection is closed
+            writer.close()
+
+    def respond(self, writer, response):
+        """
+        Writes one response line, unless the client has gone away
+        """
+        if not writer.is_closing():
+            writer.write(json.dumps(response).encode() + b"\n")
+
+    def enqueue(self, request, writer):
+        """
+        Adds an alignment request to the pending batch, sending the batch off once it is full
+        """
+        param_id, _ = self.scoring_for(request)
+        options = {key: request[key] for key in ALIGN_OPTIONS if key in request}
+        options.setdefault("max_alignments", DEFAULT_MAX_ALIGNMENTS)
+        options["score_only"] = bool(request.get("score_only", False))
+        seq_a, seq_b = request["seq_a"], request["seq_b"]
+
+        self.pending.append(((request.get("id"), param_id, seq_a, seq_b, options), param_id, writer))
+        self.in_flight[param_id] += 1
+        self.pending_cells += len(seq_a) * len(seq_b)
+        if len(self.pending) >= self.batch_size or self.pending_cells >= self.batch_cells:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self.flush)
+
+    def flush(self):
+        """
+        Sends the pending requests to the workers as one batch
+        """
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+        batch, self.pending, self.pending_cells = self.pending, [], 0
+        task = asyncio.ensure_future(self.run_batch(batch))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def run_batch(self, batch):
+        """
+        Runs a batch on the pool and streams each response back to the connection it came from
+        """
+        items = [item for item, _, _ in batch]
+        future = self.pool.submit(align_batch, items)
+        try:
+            await asyncio.wait([asyncio.wrap_future(future)])
+        finally:
+            for _, param_id, _ in batch:
+                self.in_flight[param_id] -= 1
+                if not self.in_flight[param_id]:
+                    del self.in_flight[param_id]
+                    self.release_scoring(param_id)
+        # a dead worker fails the whole batch
+        responses = future_result(future, items, failed_batch)
+        self.batches += 1
+        self.aligned += len(batch)
+
+        writers = set()
+        for (_, param_id, writer), response in zip(batch, responses):
+            response["param_id"] = param_id
+            self.respond(writer, response)
+            writers.add(writer)
+        for writer in writers:
+            if not writer.is_closing():
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    pass
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, ready=None):
+        """
+        Starts the worker pool and serves until stop() is called
+
+        Inputs:
+           host, port = address to listen on, used unless unix_path is given
+           unix_path = Unix socket to listen on instead
+           ready = function called with the listening server once it accepts connections
+        """
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        self.scoring_dir = tempfile.mkdtemp(prefix="align_server_")
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                        initargs=(self.scoring_dir,))
+        try:
+            if unix_path is not None:
+                server = await asyncio.start_unix_server(self.handle_client, path=unix_path, limit=MAX_LINE)
+            else:
+                server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+            if ready is not None:
+                ready(server)
+            async with server:
+                await self.stopping.wait()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+            shutil.rmtree(self.scoring_dir, ignore_errors=True)
+
+    def stop(self):
+        """
+        Makes serve() return, can be called from any thread
+        """
+        self.loop.call_soon_threadsafe(self.stopping.set)
+
+
+class AlignClient(object):
+    """
+    Object to talk to an alignment server over a blocking socket
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, timeout=None):
+        if unix_path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unix_path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.sock.settimeout(timeout)
+        self.lines = self.sock.makefile("rb")
+        self.next_id = 0
+
+    def send(self, request):
+        """
+        Sends one request, giving it an id if it has none, and returns the id
+        """
+        if "id" not in request:
+            request = dict(request, id=self.next_id)
+            self.next_id += 1
+        self.sock.sendall(json.dumps(request).encode() + b"\n")
+        return request["id"]
+
+    def receive(self):
+        """
+        Returns the next response from the server
+        """
+        line = self.lines.readline()
+        if not line:
+            raise ConnectionError("The alignment server closed the connection")
+        return json.loads(line)
+
+    def call(self, request):
+        """
+        Sends one request and waits for its response, only for use with no other requests outstanding
+        """
+        self.send(request)
+        return self.receive()
+
+    def register(self, scoring_text):
+        """
+        Registers a scoring (the text of an align.py input file) and returns its id
+        """
+        response = self.call({"op": "register", "scoring": scoring_text})
+        if not response["ok"]:
+            raise ValueError(response["error"])
+        return response["param_id"]
+
+    def align_pairs(self, pairs, param_id, **options):
+        """
+        Generator that sends every pair up front and yields the responses as the server streams them back
+
+        Inputs:
+           pairs = list of (seq_a, seq_b)
+           param_id = id from register
+           options = Align options (see ALIGN_OPTIONS) and score_only
+        Yields:
+           (index of the pair, response)
+        """
+        ids = {}
+        for k, (seq_a, seq_b) in enumerate(pairs):
+            ids[self.send(dict(options, op="align", param_id=param_id, seq_a=seq_a, seq_b=seq_b))] = k
+        for _ in range(len(ids)):
+            response = self.receive()
+            yield ids[response["id"]], response
+
+    def close(self):
+        self.lines.close()
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve alignments over a local socket.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket instead of a port")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"most requests per batch (default: {BATCH_SIZE})")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW,
+                        help=f"seconds to wait for a batch to fill (default: {BATCH_WINDOW})")
+    args = parser.parse_args()
+
+    server = AlignServer(workers=args.workers, batch_size=args.batch_size, batch_window=args.batch_window)
+    where = args.unix or f"{args.host}:{args.port}"
+    ready = lambda _: print(f"alignment server listening on {where}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
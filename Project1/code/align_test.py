@@ -19,6 +19,12 @@ To run:
 Make sure align.py is located in the same directory, and the test_example.input file is present!
 """
 
+import os
+import io
+import copy
+import glob
+import time
+import tempfile
 import unittest
 
 from align import *
@@ -26,6 +32,7 @@ TEST_INPUT_FILE="/Users/nickallen/Documents/GitHub/-CS274-Algorithms-in-Molecula
 TEST_INPUT_FILE_OUTPUT="/Users/nickallen/Documents/GitHub/-CS274-Algorithms-in-Molecular-Biology/Project1/code/test_example1.output"
 TEST_INPUT_FILE_LOC="/Users/nickallen/Documents/GitHub/-CS274-Algorithms-in-Molecular-Biology/Project1/code/test_example1.input"
 TEST_INPUT_FILE_OUTPUT_LOC="/Users/nickallen/Documents/GitHub/-CS274-Algorithms-in-Molecular-Biology/Project1/code/test_example1.output"
+EXAMPLES_DIR=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples")
 
 
 class TestAlignmentClasses(unittest.TestCase):
@@ -63,6 +70,17 @@ class TestAlignmentClasses(unittest.TestCase):
         # With __eq__ on pointer, this should pass
         self.assertEqual(got, expected)
 
+    def test_score_matrix_pointer_bits(self):
+        """
+        Tests that predecessor pointers are packed into the bitmask and decoded back in M, Ix, Iy order
+        """
+        score_matrix = ScoreMatrix("M", 5, 4)
+        score_matrix.set_pointers(2, 2, [pointer(1, 1, "Iy"), pointer(1, 1, "M")])
+
+        self.assertEqual(score_matrix.get_pointer_bits(2, 2), POINTER_BITS["M"] | POINTER_BITS["Iy"])
+        self.assertEqual(score_matrix.get_pointers(2, 2), [pointer(1, 1, "M"), pointer(1, 1, "Iy")])
+        self.assertEqual(score_matrix.extra_pointers, {})
+
     def test_param_loading(self):
         """
         Tests AlignmentParameters "load_params_from_file()" function
@@ -88,6 +106,22 @@ class TestAlignmentClasses(unittest.TestCase):
         self.assertEqual(match_mat.get_score("C", "G"), -0.3)
         self.assertEqual(match_mat.get_score("G", "C"), 0)
 
+    def test_sequence_encoding(self):
+        """
+        Tests that the sequences are encoded into alphabet codes and the dense match matrix agrees with get_score
+        """
+        align_params = AlignmentParameters()
+        align_params.load_params_from_file(os.path.join(EXAMPLES_DIR, "alignment_example2.input"))
+        match_mat = align_params.match_matrix
+
+        self.assertEqual(list(align_params.seq_a_codes), [align_params.alphabet_a.index(ch) for ch in align_params.seq_a])
+        self.assertEqual(list(align_params.seq_b_codes), [align_params.alphabet_b.index(ch) for ch in align_params.seq_b])
+        for a, code_a in match_mat.index_a.items():
+            for b, code_b in match_mat.index_b.items():
+                self.assertEqual(match_mat.scores[code_a, code_b], match_mat.get_score(a, b))
+
+        with self.assertRaises(ValueError):
+            align_params.set_sequences("A?", align_params.seq_b)
 
     def test_update_ix(self):
         """
@@ -207,6 +241,787 @@ class TestAlignmentClasses(unittest.TestCase):
         align.align()
         self.assertEqual(align.max_loc, {(5, 4)})
 
+    def test_wavefront_engine(self):
+        """
+        Tests that the wavefront fill gives the same scores and pointers as the cell by cell fill on the examples
+        """
+        for input_file in sorted(glob.glob(os.path.join(EXAMPLES_DIR, "*.input"))):
+            filled = []
+            for engine in ["cell", "wavefront"]:
+                align = Align(input_file, "", engine=engine)
+                align.align_params.load_params_from_file(input_file)
+                align.populate_score_matrices()
+                filled.append(align)
+            cell, wavefront = filled
+            for name in ["m_matrix", "ix_matrix", "iy_matrix"]:
+                expected, got = getattr(cell, name), getattr(wavefront, name)
+                self.assertTrue(np.array_equal(expected.scores, got.scores), f"{name} scores differ for {input_file}")
+                self.assertTrue(np.array_equal(expected.pointer_bits, got.pointer_bits), f"{name} pointers differ for {input_file}")
+
+    def test_linear_space(self):
+        """
+        Tests that linear-space global alignment reports the full matrix score and an alignment that is one of
+        the co-optimal alignments from the full traceback
+        """
+        from linear_space import LinearSpaceAligner
+
+        for input_file in sorted(glob.glob(os.path.join(EXAMPLES_DIR, "*.input"))):
+            align = Align(input_file, "", engine="wavefront")
+            align.align_params.load_params_from_file(input_file)
+            if not align.align_params.global_alignment:
+                continue
+            align.populate_score_matrices()
+            align.max_score, align.max_loc = align.find_traceback_start()
+            full_paths = [[(p.row, p.col, p.name) for p in path] for path in align.traceback()]
+
+            max_score, max_loc, path = LinearSpaceAligner(align.align_params).align()
+            self.assertEqual((max_score, max_loc), (align.max_score, align.max_loc))
+            self.assertIn([(p.row, p.col, p.name) for p in path], full_paths)
+
+    def test_linear_space_random(self):
+        """
+        Tests on random global DNA cases with random penalties that the linear-space alignment is one of the
+        full traceback's paths, and that there is none exactly when every optimal path starts in Ix or Iy
+        """
+        import random
+        from linear_space import LinearSpaceAligner
+
+        rng = random.Random(274)
+        for _ in range(300):
+            penalties = " ".join(str(rng.choice([0.5, 1, 1.5, 2, 3])) for _ in range(4))
+            scores = "\n".join(f"{i + 1} {j + 1} {a} {b} {3 if a == b else rng.choice([-2, -1, 0])}"
+                               for i, a in enumerate("ACGT") for j, b in enumerate("ACGT"))
+            seqs = ["".join(rng.choice("ACGT") for _ in range(rng.randint(1, 12))) for _ in range(2)]
+            text = "\n".join(seqs + ["0", penalties, "4", "ACGT", "4", "ACGT", scores])
+
+            align = Align(None, "", engine="wavefront")
+            align.align_params.set_sequences(*align.align_params.load_scoring_from_string(text))
+            align.populate_score_matrices()
+            align.max_score, align.max_loc = align.find_traceback_start()
+            full_paths = [[(p.row, p.col, p.name) for p in path] for path in align.traceback()]
+
+            max_score, max_loc, path = LinearSpaceAligner(align.align_params).align()
+            self.assertEqual((max_score, max_loc), (align.max_score, align.max_loc), text)
+            if path is None:
+                self.assertEqual(full_paths, [], text)
+            else:
+                self.assertIn([(p.row, p.col, p.name) for p in path], full_paths, text)
+
+    def test_count_paths(self):
+        """
+        Tests that counting the pointer DAG paths agrees with enumerating them
+        """
+        for input_file in sorted(glob.glob(os.path.join(EXAMPLES_DIR, "*.input"))):
+            align = Align(input_file, "", engine="wavefront")
+            align.align_params.load_params_from_file(input_file)
+            align.populate_score_matrices()
+            align.max_score, align.max_loc = align.find_traceback_start()
+            self.assertEqual(align.count_paths(), len(align.traceback()), input_file)
+
+    def test_max_alignments(self):
+        """
+        Tests that write_output stops after max_alignments distinct alignments
+        """
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example3.input")
+        output_file = os.path.join(tempfile.mkdtemp(), "capped.output")
+        align = Align(input_file, output_file, engine="wavefront", max_alignments=2)
+        align.align()
+        with open(output_file) as f:
+            lines = [line for line in f.read().split("\n") if line]
+        # score line plus two lines per alignment
+        self.assertEqual(len(lines), 1 + 2 * 2)
+
+    def test_banded(self):
+        """
+        Tests that a band covering the whole matrix gives the full matrix result, and that the cell and
+        wavefront engines agree on a narrow band
+        """
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example5.input")
+        filled = {}
+        for engine, band in [("wavefront", None), ("wavefront", 100), ("cell", 2), ("wavefront", 2)]:
+            align = Align(input_file, "", engine=engine, band=band)
+            align.align_params.load_params_from_file(input_file)
+            align.populate_score_matrices()
+            align.max_score, align.max_loc = align.find_traceback_start()
+            filled[(engine, band)] = align
+
+        full, wide = filled[("wavefront", None)], filled[("wavefront", 100)]
+        self.assertEqual((wide.max_score, wide.max_loc), (full.max_score, full.max_loc))
+        self.assertEqual(wide.traceback(), full.traceback())
+        self.assertFalse(wide.touches_band_edge())
+
+        cell, wavefront = filled[("cell", 2)], filled[("wavefront", 2)]
+        for name in ["m_matrix", "ix_matrix", "iy_matrix"]:
+            self.assertTrue(np.array_equal(getattr(cell, name).scores, getattr(wavefront, name).scores))
+            self.assertTrue(np.array_equal(getattr(cell, name).pointer_bits, getattr(wavefront, name).pointer_bits))
+        self.assertLessEqual(wavefront.max_score, full.max_score)
+
+    def test_batch_runner(self):
+        """
+        Tests that the batch runner writes the same output as a single run and keeps going past a bad job
+        """
+        from batch_align import run_batch
+
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example1.input")
+        out_dir = tempfile.mkdtemp()
+        jobs = [(input_file, os.path.join(out_dir, "pool.output")),
+                (os.path.join(out_dir, "missing.input"), os.path.join(out_dir, "missing.output"))]
+        results = run_batch(jobs, workers=2)
+        self.assertEqual([result["ok"] for result in results], [True, False])
+        self.assertIn("FileNotFoundError", results[1]["error"])
+
+        single_output = os.path.join(out_dir, "single.output")
+        Align(input_file, single_output).align()
+        with open(single_output) as f, open(jobs[0][1]) as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_striped_search(self):
+        """
+        Tests that the one-vs-many scorer reports the same score and an end cell of the full local alignment
+        """
+        from striped_search import StripedSearch
+
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example1.input")
+        params = AlignmentParameters()
+        params.load_params_from_file(input_file)
+        seq_b = params.seq_b
+        targets = [seq_b, seq_b[::-1], seq_b[len(seq_b) // 2:], seq_b[:3]]
+
+        search = StripedSearch(params, params.seq_a, batch_size=3)
+        scores, ends = search.score_targets(targets)
+        for target, score, end in zip(targets, scores, ends):
+            align = search.align_hit(target)
+            self.assertEqual(score, align.max_score)
+            self.assertIn(end, align.max_loc)
+
+    def test_seed_index(self):
+        """
+        Tests that a saved and reloaded seed index finds the target a query was planted in, and that the banded
+        alignment around the seeds never beats the full local alignment
+        """
+        from seed_index import SeedIndex, load_index
+        from striped_search import StripedSearch
+
+        params = AlignmentParameters()
+        params.load_params_from_file(os.path.join(EXAMPLES_DIR, "alignment_example4.input"))
+        query = params.seq_a
+        targets = ["ACGT" * 20, "TTGCA" * 10 + query[5:25] + "GATC" * 10, "CCGGA" * 12]
+
+        index_file = os.path.join(tempfile.mkdtemp(), "targets.npz")
+        SeedIndex(targets, k=6).save(index_file)
+        index = load_index(index_file)
+        self.assertEqual(index.targets, targets)
+
+        hits = index.search(params, query, band=4, margin=8)
+        self.assertEqual(hits[0].target, 1)
+        self.assertEqual(hits[0].diagonal, 50 - 5)
+        full_scores, _ = StripedSearch(params, query).score_targets(targets)
+        for hit in hits:
+            self.assertLessEqual(hit.score, full_scores[hit.target])
+
+        # a motif twice in the target ties the local maximum, the range must still be one alignment's
+        motif = "GATTACAG"
+        target = motif + "CC" + motif
+        hit = SeedIndex([target], k=4).align_window(params, motif, 0, 0, 0, len(motif), len(target), len(target),
+                                                    "wavefront")
+        self.assertGreater(len(hit.align.max_loc), 1)
+        self.assertLessEqual(hit.query_range[0], hit.query_range[1])
+        self.assertLessEqual(hit.target_range[0], hit.target_range[1])
+        self.assertEqual(target[hit.target_range[0] - 1:hit.target_range[1]], motif)
+
+    def test_scratch_dir(self):
+        """
+        Tests that the rows engine matches the cell engine exactly, with and without memory-mapped matrices,
+        and that the mapped files don't outlive the alignment in the scratch directory
+        """
+        scratch_dir = tempfile.mkdtemp()
+        for input_file in sorted(glob.glob(os.path.join(EXAMPLES_DIR, "*.input"))):
+            filled = []
+            for engine, scratch in [("cell", None), ("rows", None), ("rows", scratch_dir)]:
+                align = Align(input_file, "", engine=engine, scratch_dir=scratch)
+                align.align_params.load_params_from_file(input_file)
+                align.populate_score_matrices()
+                filled.append(align)
+            self.assertIsInstance(filled[2].m_matrix.scores, np.memmap)
+            for align in filled[1:]:
+                for name in ["m_matrix", "ix_matrix", "iy_matrix"]:
+                    self.assertTrue(np.array_equal(getattr(filled[0], name).scores, getattr(align, name).scores))
+                    self.assertTrue(np.array_equal(getattr(filled[0], name).pointer_bits, getattr(align, name).pointer_bits))
+        self.assertEqual(os.listdir(scratch_dir), [])
+
+    def test_checkpoint_resume(self):
+        """
+        Tests that a fill resumed from a checkpoint cut short mid-way matches an uninterrupted fill, and that a
+        checkpoint from different parameters is refused
+        """
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example5.input")
+        checkpoint_file = os.path.join(tempfile.mkdtemp(), "fill.ckpt")
+
+        def fill(engine, checkpoint=None):
+            align = Align(input_file, "", engine=engine, checkpoint_file=checkpoint, checkpoint_interval=0)
+            align.align_params.load_params_from_file(input_file)
+            align.populate_score_matrices()
+            return align
+
+        expected = fill("cell")
+        fill("rows", checkpoint_file)
+        size = os.path.getsize(checkpoint_file)
+        with open(checkpoint_file, "r+b") as f:
+            f.truncate(size // 2)
+
+        resumed = fill("wavefront", checkpoint_file)
+        for name in ["m_matrix", "ix_matrix", "iy_matrix"]:
+            self.assertTrue(np.array_equal(getattr(expected, name).scores, getattr(resumed, name).scores))
+            self.assertTrue(np.array_equal(getattr(expected, name).pointer_bits, getattr(resumed, name).pointer_bits))
+        self.assertEqual(os.path.getsize(checkpoint_file), size)
+
+        other = Align(input_file, "", checkpoint_file=checkpoint_file)
+        other.align_params.load_params_from_file(input_file)
+        other.align_params.dx += 1
+        with self.assertRaises(ValueError):
+            other.populate_score_matrices()
+
+    def test_tiled_engine(self):
+        """
+        Tests that filling small tiles in worker processes gives exactly the wavefront engine's matrices, also
+        when there are too few tiles for the workers and the fill falls back to the wavefront engine
+        """
+        from tiled_fill import populate_tiled
+
+        for name in ["alignment_example1.input", "alignment_example5.input"]:
+            input_file = os.path.join(EXAMPLES_DIR, name)
+            expected = Align(input_file, "", engine="wavefront")
+            expected.align_params.load_params_from_file(input_file)
+            expected.populate_score_matrices()
+
+            for workers in [1, 2]:
+                tiled = Align(input_file, "", engine="tiled")
+                tiled.align_params = expected.align_params
+                nrow, ncol = expected.m_matrix.nrow, expected.m_matrix.ncol
+                tiled.m_matrix, tiled.ix_matrix, tiled.iy_matrix = [ScoreMatrix(n, nrow, ncol) for n in ["M", "Ix", "Iy"]]
+                populate_tiled(tiled, workers=workers, tile_size=5)
+                for matrix in ["m_matrix", "ix_matrix", "iy_matrix"]:
+                    self.assertTrue(np.array_equal(getattr(expected, matrix).scores, getattr(tiled, matrix).scores))
+                    self.assertTrue(np.array_equal(getattr(expected, matrix).pointer_bits,
+                                                   getattr(tiled, matrix).pointer_bits))
+
+    def test_fasta_records(self):
+        """
+        Tests that aligning FASTA records with a shared scoring file gives the same output as the input file,
+        with and without the sequence lines in the scoring file
+        """
+        from fasta_align import align_records
+
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example1.input")
+        work_dir = tempfile.mkdtemp()
+        expected_output = os.path.join(work_dir, "expected.output")
+        Align(input_file, expected_output).align()
+        with open(expected_output) as f:
+            expected = f.read()
+
+        with open(input_file) as f:
+            lines = [line for line in f if line.strip()]
+        seq_a, seq_b = lines[0].strip(), lines[1].strip()
+        scoring_file = os.path.join(work_dir, "scoring.input")
+        with open(scoring_file, "w") as f:
+            f.writelines(lines[2:])
+        with open(os.path.join(work_dir, "queries.fa"), "w") as f:
+            f.write(f">q1 first query\n{seq_a[:5]}\n{seq_a[5:]}\n>q2\n{seq_b}\n")
+        with open(os.path.join(work_dir, "targets.fa"), "w") as f:
+            f.write(f">t1\n{seq_b}\n")
+
+        for k, scoring in enumerate([input_file, scoring_file]):
+            out_dir = os.path.join(work_dir, f"out{k}")
+            results = list(align_records(scoring, os.path.join(work_dir, "queries.fa"),
+                                         os.path.join(work_dir, "targets.fa"), out_dir, pairing="cross"))
+            self.assertEqual([(q, t) for q, t, _, _ in results], [("q1", "t1"), ("q2", "t1")])
+            with open(results[0][3]) as f:
+                self.assertEqual(f.read(), expected)
+
+        # a repeated query name would overwrite the first pair's output, it fails before aligning anything
+        with open(os.path.join(work_dir, "repeated.fa"), "w") as f:
+            f.write(f">q1\n{seq_a}\n>q1\n{seq_b}\n")
+        out_dir = os.path.join(work_dir, "repeated")
+        with self.assertRaises(ValueError):
+            next(align_records(input_file, os.path.join(work_dir, "repeated.fa"),
+                               os.path.join(work_dir, "targets.fa"), out_dir))
+        self.assertFalse(os.path.exists(out_dir))
+
+        # names that used to run together at the separator get separate output files
+        from fasta_align import output_name
+        self.assertNotEqual(output_name("a__b", "c"), output_name("a", "b__c"))
+        with open(os.path.join(work_dir, "joined_q.fa"), "w") as f:
+            f.write(f">a__b\n{seq_a}\n>a\n{seq_a}\n")
+        with open(os.path.join(work_dir, "joined_t.fa"), "w") as f:
+            f.write(f">c\n{seq_b}\n>b__c\n{seq_b}\n")
+        results = list(align_records(input_file, os.path.join(work_dir, "joined_q.fa"),
+                                     os.path.join(work_dir, "joined_t.fa"), os.path.join(work_dir, "joined")))
+        self.assertEqual(len({output for _, _, _, output in results}), 4)
+
+    def test_all_vs_all(self):
+        """
+        Tests that the all-vs-all scores match aligning each pair on its own, and the distances are normalized
+        """
+        from all_vs_all import all_vs_all, unique_pairs
+
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example4.input")
+        scoring = AlignmentParameters()
+        scoring.load_params_from_file(input_file)
+        records = [("a", scoring.seq_a), ("b", scoring.seq_b), ("c", scoring.seq_a[::-1])]
+        self.assertEqual(len(unique_pairs(3)), 6)
+
+        # the example's gap extension penalties differ between A and B, so the order of a pair matters
+        with self.assertRaises(ValueError):
+            all_vs_all(scoring, records, workers=1)
+        scoring.ey = scoring.ex
+
+        # names that only differ in characters safe_name replaces would share an alignment file
+        with self.assertRaises(ValueError):
+            all_vs_all(scoring, [("sp|P1", "ACGT"), ("sp_P1", "ACGA")], workers=1, alignments_dir=tempfile.mkdtemp())
+
+        scores, distances = all_vs_all(scoring, records, workers=2)
+        for i, (_, seq_a) in enumerate(records):
+            for j, (_, seq_b) in enumerate(records):
+                align = Align(None, "")
+                align.align_params = copy.copy(scoring)
+                align.align_params.set_sequences(seq_a, seq_b)
+                align.populate_score_matrices()
+                self.assertEqual(scores[i, j], align.find_traceback_start()[0])
+        self.assertTrue(np.allclose(np.diag(distances), 0.0))
+        self.assertTrue(np.allclose(distances, distances.T))
+
+    def test_align_server(self):
+        """
+        Tests that the server returns the same output as align.py for batched requests, and reports bad ones
+        """
+        import asyncio
+        import threading
+        from align_server import AlignServer, AlignClient
+
+        ports = []
+        server = AlignServer(workers=2)
+        thread = threading.Thread(target=asyncio.run, args=(server.serve(port=0, ready=lambda s: ports.append(
+            s.sockets[0].getsockname()[1])),))
+        thread.start()
+        try:
+            while not ports:
+                time.sleep(0.01)
+            client = AlignClient(port=ports[0], timeout=60)
+            requests, expected = [], []
+            for k in [1, 3, 5]:
+                input_file = os.path.join(EXAMPLES_DIR, f"alignment_example{k}.input")
+                output_file = os.path.join(tempfile.mkdtemp(), "out")
+                Align(input_file, output_file).align()
+                with open(input_file) as f:
+                    text = f.read()
+                with open(output_file) as f:
+                    expected.append(f.read())
+                requests.append({"op": "align", "param_id": client.register(text), "seq_a": text.split()[0],
+                                 "seq_b": text.split()[1], "max_alignments": None})
+
+            # every request goes out before any response is read, so they can share batches
+            pairs = [client.send(request) for request in requests]
+            responses = {}
+            for _ in pairs:
+                response = client.receive()
+                responses[response["id"]] = response
+            self.assertEqual([responses[request_id]["output"] for request_id in pairs], expected)
+
+            # a score-only request keeps to linear space when asked to, and gives the same score
+            response = client.call(dict(requests[0], score_only=True, linear_space=True))
+            self.assertTrue(response["ok"])
+            self.assertNotIn("output", response)
+            self.assertEqual(float(response["score"]), float(expected[0].split()[0]))
+
+            response = client.call({"op": "align", "param_id": "unknown", "seq_a": "A", "seq_b": "A"})
+            self.assertFalse(response["ok"])
+            client.close()
+        finally:
+            server.stop()
+            thread.join()
+        self.assertFalse(os.path.exists(server.scoring_dir))
+
+    def test_align_server_long_line(self):
+        """
+        Tests that the server answers a request line longer than MAX_LINE with an error and closes the connection
+        """
+        import json
+        import socket
+        import asyncio
+        import threading
+        import align_server
+        from align_server import AlignServer
+
+        max_line = align_server.MAX_LINE
+        align_server.MAX_LINE = 1024
+        ports = []
+        server = AlignServer(workers=1)
+        thread = threading.Thread(target=asyncio.run, args=(server.serve(port=0, ready=lambda s: ports.append(
+            s.sockets[0].getsockname()[1])),))
+        thread.start()
+        try:
+            while not ports:
+                time.sleep(0.01)
+            with socket.create_connection(("127.0.0.1", ports[0]), timeout=60) as sock:
+                sock.sendall(json.dumps({"op": "ping", "pad": "x" * 4096}).encode() + b"\n")
+                received = b""
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    received += chunk
+            response = json.loads(received.splitlines()[0])
+            self.assertFalse(response["ok"])
+            self.assertIn("longer than 1024 bytes", response["error"])
+        finally:
+            server.stop()
+            thread.join()
+            align_server.MAX_LINE = max_line
+
+    def test_align_server_eviction(self):
+        """
+        Tests that an evicted scoring's file is deleted, once no queued request needs it any more
+        """
+        import align_server
+        from align_server import AlignServer, scoring_path
+
+        with open(os.path.join(EXAMPLES_DIR, "alignment_example1.input")) as f:
+            text = f.read()
+        other = text.replace("\n0\n", "\n1\n", 1)
+
+        server = AlignServer(workers=1)
+        server.scoring_dir = tempfile.mkdtemp()
+        max_scorings = align_server.MAX_SCORINGS
+        align_server.MAX_SCORINGS = 1
+        try:
+            first = server.register(text)
+            server.in_flight[first] += 1
+            second = server.register(other)
+            self.assertTrue(os.path.exists(scoring_path(server.scoring_dir, first)))
+
+            server.in_flight[first] -= 1
+            server.release_scoring(first)
+            self.assertFalse(os.path.exists(scoring_path(server.scoring_dir, first)))
+            self.assertTrue(os.path.exists(scoring_path(server.scoring_dir, second)))
+        finally:
+            align_server.MAX_SCORINGS = max_scorings
+
+    def test_named_matrix_and_param_cache(self):
+        """
+        Tests that naming a substitution matrix gives the same parameters as spelling it out, and that cached
+        parameters come back identical
+        """
+        from param_cache import load_params_cached
+
+        quiz_file = os.path.join(EXAMPLES_DIR, "..", "quiz_input", "quiz5_pam40_human_mouse.input")
+        spelled = AlignmentParameters()
+        spelled.load_params_from_file(quiz_file)
+
+        work_dir = tempfile.mkdtemp()
+        named_file = os.path.join(work_dir, "named.input")
+        with open(quiz_file) as f:
+            lines = [line for line in f if line.strip()]
+        with open(named_file, "w") as f:
+            f.writelines(lines[:4] + ["PAM40\n"])
+        named = AlignmentParameters()
+        named.load_params_from_file(named_file)
+        self.assertEqual(named.digest(), spelled.digest())
+
+        cache_dir = os.path.join(work_dir, "cache")
+        for input_file in [quiz_file, named_file]:
+            first, hit = load_params_cached(input_file, cache_dir)
+            self.assertFalse(hit)
+            cached, hit = load_params_cached(input_file, cache_dir)
+            self.assertTrue(hit)
+            self.assertEqual(cached.digest(), spelled.digest())
+            self.assertTrue(np.array_equal(cached.seq_b_codes, spelled.seq_b_codes))
+
+        # editing a matrix file the input names gives a new cache key
+        from matrices import NAMED_MATRICES
+        file_input = os.path.join(work_dir, "matrix_file.input")
+        with open(file_input, "w") as f:
+            f.writelines(lines[:4] + ["custom.matrix\n"])
+        for name in ["PAM40", "BLOSUM62"]:
+            with open(os.path.join(work_dir, "custom.matrix"), "w") as f:
+                f.write(NAMED_MATRICES[name])
+            cached, hit = load_params_cached(file_input, cache_dir)
+            self.assertFalse(hit)
+            self.assertEqual(cached.match_matrix.get_score("W", "W"), 13 if name == "PAM40" else 11)
+
+    def test_named_matrices(self):
+        """
+        Tests that every named matrix is symmetric and scores every pair of its full alphabet
+        """
+        from matrices import NAMED_MATRICES, load_matrix
+
+        for name in NAMED_MATRICES:
+            alphabet, match_matrix = load_matrix(name.lower())
+            self.assertEqual(alphabet, "ARNDCQEGHILKMFPSTWYVBZX", name)
+            order_b = [match_matrix.index_b[a] for a in match_matrix.index_a]
+            scores = match_matrix.scores[:, order_b]
+            self.assertEqual(scores.shape, (len(alphabet), len(alphabet)), name)
+            self.assertFalse(np.isnan(scores).any(), name)
+            self.assertTrue(np.array_equal(scores, scores.T), name)
+
+    def test_cigar_output(self):
+        """
+        Tests that the CIGAR output expands back into exactly the alignments of the default output
+        """
+        work_dir = tempfile.mkdtemp()
+        for input_file in sorted(glob.glob(os.path.join(EXAMPLES_DIR, "*.input"))):
+            outputs = {}
+            for output_format in OUTPUT_FORMATS:
+                output_file = os.path.join(work_dir, output_format)
+                Align(input_file, output_file, engine="wavefront", output_format=output_format).align()
+                with open(output_file) as f:
+                    outputs[output_format] = f.read().split("\n")
+
+            params = AlignmentParameters()
+            params.load_params_from_file(input_file)
+            expected = [tuple(block.split("\n")) for block in "\n".join(outputs["alignment"][2:]).split("\n\n") if block.strip()]
+            got = []
+            for line in outputs["cigar"][2:]:
+                if line:
+                    a_start, a_end, b_start, b_end, cigar = line.split("\t")
+                    got.append(expand_cigar(params.seq_a, params.seq_b, int(a_start), int(b_start), cigar))
+            self.assertEqual(outputs["cigar"][0], outputs["alignment"][0])
+            self.assertEqual(got, expected, input_file)
+
+    def test_top_k(self):
+        """
+        Tests that the top-K local alignments start with the best one, get worse and never share an aligned pair
+        """
+        from suboptimal import WatermanEggert
+
+        for name in ["alignment_example3.input", "alignment_example5.input"]:
+            input_file = os.path.join(EXAMPLES_DIR, name)
+            best = Align(input_file, os.path.join(tempfile.mkdtemp(), "out"), engine="wavefront")
+            best.align()
+
+            align = Align(input_file, os.path.join(tempfile.mkdtemp(), "out"), engine="wavefront", top_k=5)
+            align.align_params.load_params_from_file(input_file)
+            align.populate_score_matrices()
+            hits = list(WatermanEggert(align).alignments(5))
+            scores = [score for score, _ in hits]
+            self.assertTrue(fuzzy_equals(scores[0], best.max_score))
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+            aligned = [set((p.row, p.col) for p in path if p.name == "M") for _, path in hits]
+            for i in range(len(aligned)):
+                for j in range(i):
+                    self.assertFalse(aligned[i] & aligned[j])
+
+    def test_phase_stats(self):
+        """
+        Tests that align() times every phase and counts the cells each fill computes
+        """
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example1.input")
+        output_file = os.path.join(tempfile.mkdtemp(), "out")
+        for band in [None, 2]:
+            align = Align(input_file, output_file, engine="wavefront", band=band, track_memory=True)
+            align.align()
+            summary = align.stats.summary()
+            self.assertEqual(list(summary["phases"]), ["load_params", "populate", "traceback_start", "traceback",
+                                                       "write_output"])
+            for entry in summary["phases"].values():
+                self.assertGreaterEqual(entry["seconds"], 0.0)
+                self.assertIsNotNone(entry["cells_per_second"])
+            self.assertIsNotNone(summary["peak_memory"])
+            self.assertTrue(summary["track_memory"])
+
+            nrow, ncol = align.m_matrix.nrow, align.m_matrix.ncol
+            width = max(nrow, ncol) if band is None else band
+            expected = sum(1 for row in range(1, nrow) for col in range(1, ncol) if abs(col - row) <= width)
+            self.assertEqual(summary["phases"]["populate"]["cells"], expected)
+
+        # timings are taken without tracing unless asked for
+        align = Align(input_file, output_file, engine="wavefront")
+        align.align()
+        summary = align.stats.summary()
+        self.assertEqual((summary["track_memory"], summary["peak_memory"]), (False, None))
+
+    def test_benchmark(self):
+        """
+        Tests that the benchmark cases are reproducible and that a slower or different run gets flagged
+        """
+        from benchmark import build_cases, case_params, run_case, compare
+
+        cases = build_cases(sizes=[60], alphabets=["dna"], kinds=["ties"], modes=["global"])
+        self.assertEqual(case_params(cases[0], 1).seq_a, case_params(cases[0], 1).seq_a)
+        self.assertNotEqual(case_params(cases[0], 1).seq_a, case_params(cases[0], 2).seq_a)
+
+        result = run_case(cases[0], repeat=1)
+        self.assertGreater(result["paths"], 1)
+        baseline = {"cases": {result["name"]: result}}
+        self.assertEqual(compare({"cases": {result["name"]: dict(result)}}, baseline), [])
+        slower = dict(result, cells_per_second=result["cells_per_second"] / 2, paths=result["paths"] + 1)
+        self.assertEqual(len(compare({"cases": {result["name"]: slower}}, baseline)), 2)
+
+    def test_result_cache(self):
+        """
+        Tests that a repeated alignment comes out of the result cache unchanged, and that the cache evicts the
+        least recently used results when it outgrows its budget
+        """
+        from result_cache import ResultCache
+
+        cache_dir = tempfile.mkdtemp()
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example1.input")
+        output_file = os.path.join(tempfile.mkdtemp(), "out")
+        outputs = []
+        for expect_hit in [False, True]:
+            align = Align(input_file, output_file, engine="wavefront", result_cache=cache_dir)
+            align.align()
+            self.assertEqual(align.cache_hit, expect_hit)
+            self.assertEqual(align.m_matrix is None, expect_hit)
+            with open(output_file) as f:
+                outputs.append((float(align.max_score), f.read()))
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(ResultCache(cache_dir).stats()["total"], {"hits": 1, "misses": 1, "stores": 1, "evictions": 0})
+
+        # a different option is a different result
+        align = Align(input_file, output_file, engine="wavefront", max_alignments=1, result_cache=cache_dir)
+        align.align()
+        self.assertFalse(align.cache_hit)
+
+        # a hit of a banded run warns about the band edge like the run that stored it
+        import contextlib
+        for expect_hit in [False, True]:
+            stderr = io.StringIO()
+            align = Align(input_file, io.StringIO(), engine="wavefront", band=1, result_cache=cache_dir)
+            with contextlib.redirect_stderr(stderr):
+                align.align()
+            self.assertEqual((align.cache_hit, align.band_edge_hit), (expect_hit, True))
+            self.assertIn("touches the edge of the band (width 1)", stderr.getvalue())
+
+        # room for two results: after reading the first, storing a third evicts the second
+        cache = ResultCache(tempfile.mkdtemp(), max_bytes=300)
+        keys = [f"{i:064x}" for i in range(3)]
+        for i, key in enumerate(keys):
+            if i == 2:
+                cache.open(keys[0])[1].close()
+            cache.put(key, i, io.StringIO("x" * 100))
+            time.sleep(0.01)
+        self.assertEqual(cache.counts["evictions"], 1)
+        self.assertIsNone(cache.open(keys[1]))
+        header, cached = cache.open(keys[0])
+        cached.close()
+        self.assertEqual(header["score"], 0)
+        self.assertLessEqual(cache.stats()["bytes"], cache.max_bytes)
+
+        # storing a key again doesn't grow the size estimate
+        estimated = cache.estimated_bytes
+        cache.put(keys[0], 0, io.StringIO("x" * 100))
+        self.assertEqual(cache.estimated_bytes, estimated)
+
+        # lookups only count in memory until the next flush
+        cache.open(keys[0])[1].close()
+        self.assertEqual(ResultCache(cache.cache_dir).stats()["total"]["hits"], 2)
+        cache.close()
+        self.assertEqual(ResultCache(cache.cache_dir).stats()["total"]["hits"], 3)
+
+        # an entry with a header that doesn't parse is a miss
+        with open(cache.entry_path(keys[0]), "w") as f:
+            f.write("not json\n")
+        self.assertIsNone(cache.open(keys[0]))
+
+    def test_sweep(self):
+        """
+        Tests that a sweep shares one parse across its grid and scores each point like a run of align.py
+        """
+        from sweep import grid_points, point_output_name, sweep
+
+        input_file = os.path.join(EXAMPLES_DIR, "alignment_example2.input")
+        params = AlignmentParameters()
+        params.load_params_from_file(input_file)
+        points = grid_points(params, modes=["global", "local"], dx=[0.7, 2.7])
+        self.assertEqual(points, [("global", 0.7, 0.5, 0.7, 0.4), ("global", 2.7, 0.5, 0.7, 0.4),
+                                  ("local", 0.7, 0.5, 0.7, 0.4), ("local", 2.7, 0.5, 0.7, 0.4)])
+        self.assertEqual(grid_points(params, dx=[1.0], ex=[2.0], symmetric=True), [("global", 1.0, 2.0, 1.0, 2.0)])
+
+        # grid points that only differ past six significant digits still get their own output files
+        self.assertNotEqual(point_output_name(("local", 0.1234567, 1.0, 1.0, 1.0)),
+                            point_output_name(("local", 0.1234568, 1.0, 1.0, 1.0)))
+
+        results = sweep(params, points, workers=1, engine="wavefront")
+        self.assertEqual((params.global_alignment, params.dx), (True, 0.7))
+
+        # the point with the file's own settings scores the same as aligning the file
+        align = Align(input_file, io.StringIO())
+        align.align()
+        self.assertEqual(results[0]["score"], align.max_score)
+        # a higher open penalty never scores higher
+        self.assertLessEqual(results[1]["score"], results[0]["score"])
+        self.assertLessEqual(results[3]["score"], results[2]["score"])
+
+    def test_alignment_stats(self):
+        """
+        Tests that the statistics sidecar agrees with the alignments written, and that count_gaps handles
+        gapless alignments
+        """
+        import json
+        import re
+        from align_quiz_functions import count_gaps, average_alignment_stats
+
+        work_dir = tempfile.mkdtemp()
+        output_file, stats_file = os.path.join(work_dir, "out"), os.path.join(work_dir, "out.jsonl")
+        for input_file in sorted(glob.glob(os.path.join(EXAMPLES_DIR, "*.input"))):
+            align = Align(input_file, output_file, engine="wavefront", alignment_stats_file=stats_file)
+            align.align()
+            seq_a, seq_b = align.align_params.seq_a, align.align_params.seq_b
+            with open(output_file) as f:
+                blocks = [block.split("\n") for block in f.read().split("\n\n")[1:] if block.strip()]
+            with open(stats_file) as f:
+                entries = [json.loads(line) for line in f]
+            self.assertEqual(len(entries), len(blocks))
+            for (a, b), entry in zip(blocks, entries):
+                pairs = [(x, y) for x, y in zip(a, b) if "_" not in (x, y)]
+                self.assertEqual(entry["mismatches"], sum(x != y for x, y in pairs))
+                self.assertEqual(entry["matches"], sum(x == y for x, y in pairs))
+                self.assertEqual(entry["length"], len(a))
+                self.assertEqual(seq_a[entry["a_start"] - 1:entry["a_end"]], a.replace("_", ""))
+                self.assertEqual(seq_b[entry["b_start"] - 1:entry["b_end"]], b.replace("_", ""))
+                # gap runs in each line, in the order they appear
+                runs = sorted([(m.start(), len(m.group())) for line in (a, b) for m in re.finditer("_+", line)])
+                self.assertEqual(entry["gap_lengths"], [length for _, length in runs])
+
+        gapless = os.path.join(work_dir, "gapless")
+        with open(gapless, "w") as f:
+            f.write("1.0\n\nACGT\nACTT\n\n")
+        self.assertEqual(count_gaps(gapless), (0.0, 0.0))
+
+        empty = os.path.join(work_dir, "empty.jsonl")
+        open(empty, "w").close()
+        with self.assertRaises(ValueError):
+            average_alignment_stats(empty)
+
+    def test_streaming_check(self):
+        """
+        Tests that the streaming check ignores the order of the alignments but reports the exact ones that differ
+        """
+        from check_output import compare_outputs_streaming, check_cases
+
+        with open(os.path.join(EXAMPLES_DIR, "alignment_example4.output")) as f:
+            blocks = [block for block in f.read().split("\n\n") if block.strip()]
+        work_dir = tempfile.mkdtemp()
+        def write(name, blocks):
+            path = os.path.join(work_dir, name)
+            with open(path, "w") as f:
+                f.write("\n\n".join(blocks) + "\n\n")
+            return path
+        expected = write("expected", blocks)
+        shuffled = write("shuffled", blocks[:1] + blocks[:0:-1])
+        changed_block = blocks[1].replace("A", "C", 1)
+        changed = write("changed", blocks[:1] + [changed_block] + blocks[2:])
+
+        self.assertTrue(compare_outputs_streaming(shuffled, expected, report=self.fail))
+        report = []
+        self.assertFalse(compare_outputs_streaming(changed, expected, report=report.append))
+        a, b = changed_block.split("\n")
+        self.assertIn(f"  x1: {a}\n      {b}", report)
+
+        results = check_cases([("shuffled", shuffled, expected), ("changed", changed, expected)], workers=1)
+        self.assertEqual([(tag, ok) for tag, ok, _ in results], [("shuffled", True), ("changed", False)])
+
 
 if __name__=='__main__':
     unittest.main(verbosity=3)
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""
+All-vs-all pairwise alignment of a set of sequences, with a score matrix and a distance matrix as output.
+
+Comparing a set of sequences (eg. the human / chimp / mouse / turtle inputs of quiz 2) one input file at a
+time repeats the scoring block in every file, starts a process per pair, and aligns each pair twice if both
+orders are listed. Here the sequences come from one FASTA file and the scoring from one align.py style file (with
+or without sequence lines, see AlignmentParameters.load_scoring_from_file), and only the unique unordered pairs
+are aligned, plus every sequence against itself for the normalization; that needs scoring that doesn't depend on
+which sequence is A and which is B (see is_symmetric). The pairs go to a pool of worker processes that receive
+the scoring and the sequences once, when they start, largest pairs first so the pool stays busy until the end.
+
+The result is one compressed NumPy archive (see load_matrices) with the sequence names, the symmetric score
+matrix with the self scores on its diagonal, and the normalized distance matrix
+
+    distance(a, b) = 1 - score(a, b) / sqrt(score(a, a) * score(b, b))
+
+which is 0 for identical sequences and NaN where a self score isn't positive. Alignments are only written if an
+alignments directory is given, one align.py output file per pair.
+
+To run:
+  python all_vs_all.py scoring.input sequences.fa distances.npz -j 4 --alignments-dir pair_alignments
+"""
+import os
+import copy
+import argparse
+
+import numpy as np
+
+from align import Align, AlignmentParameters, ENGINES
+from batch_align import run_tasks, worker_state
+from fasta_align import read_fasta, output_name, safe_name, check_distinct
+
+# pairs handed to a worker at a time, amortizes the task overhead over many small alignments
+CHUNK_SIZE = 8
+
+
+def unique_pairs(n):
+    """
+    Returns the (i, j) pairs with i <= j of n sequences: every unordered pair once, and each sequence with itself
+    """
+    return [(i, j) for i in range(n) for j in range(i, n)]
+
+
+def is_symmetric(scoring):
+    """
+    Returns whether swapping the two sequences leaves every score the same: the same gap penalties in A and B,
+    the same alphabets and a symmetric match matrix. Only then is one alignment per unordered pair enough.
+    """
+    match_matrix = scoring.match_matrix
+    if (scoring.dx, scoring.ex) != (scoring.dy, scoring.ey) or set(match_matrix.index_a) != set(match_matrix.index_b):
+        return False
+    order_b = [match_matrix.index_b[a] for a in match_matrix.index_a]
+    scores = match_matrix.scores[:, order_b]
+    return bool(np.array_equal(scores, scores.T, equal_nan=True))
+
+
+def align_pair(pair):
+    """
+    Aligns one pair of sequences in a worker, which holds the scoring, the records, the alignments directory
+    and the Align options in worker_state
+
+    Inputs:
+       pair = (i, j) indices into the records
+    Returns:
+       (i, j, score)
+    """
+    i, j = pair
+    (name_a, seq_a), (name_b, seq_b) = worker_state["records"][i], worker_state["records"][j]
+    params = copy.copy(worker_state["scoring"])
+    params.set_sequences(seq_a, seq_b)
+
+    # the self alignments are only there for the normalization, so never written
+    alignments_dir = worker_state["alignments_dir"]
+    if alignments_dir is not None and i != j:
+        output_file = os.path.join(alignments_dir, output_name(name_a, name_b))
+        align = Align.from_params(params, output_file, **worker_state["align_options"])
+        align.align()
+    else:
+        align = Align.from_params(params, "", **worker_state["align_options"])
+        align.populate_score_matrices()
+        align.max_score, align.max_loc = align.find_traceback_start()
+    return i, j, align.max_score
+
+
+def distance_matrix(scores):
+    """
+    Returns the normalized distances 1 - score(a, b) / sqrt(score(a, a) * score(b, b)) of a score matrix with
+    the self scores on its diagonal, NaN where a self score isn't positive
+    """
+    self_scores = np.diag(scores)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        norm = np.sqrt(np.outer(self_scores, self_scores))
+        distances = 1.0 - scores / norm
+    positive = self_scores > 0
+    distances[~(positive[:, None] & positive[None, :])] = np.nan
+    return distances
+
+
+def all_vs_all(scoring, records, workers=None, alignments_dir=None, **align_options):
+    """
+    Aligns every unordered pair of sequences and each sequence with itself.
+
+    Inputs:
+       scoring = AlignmentParameters with the mode, gap penalties and match matrix, its sequences are ignored
+       records = list of (name, sequence)
+       workers = worker processes, see batch_align.run_tasks
+       alignments_dir = directory to write an align.py output file per pair to, None for scores only
+       align_options = keyword arguments passed on to Align
+    Returns:
+       (scores, distances) as symmetric n x n arrays
+    Raises:
+       ValueError if the scoring isn't symmetric, or before aligning anything if two records would share an
+       alignment output file (see fasta_align.check_distinct)
+    """
+    if not is_symmetric(scoring):
+        raise ValueError("All-vs-all needs symmetric scoring (dx = dy, ex = ey and a symmetric match matrix), "
+                         "otherwise the score of a pair depends on its order")
+    n = len(records)
+    if alignments_dir is not None:
+        # names that only differ in characters safe_name replaces would write the same output file
+        check_distinct(((safe_name(name), name) for name, _ in records), "the sequences")
+        os.makedirs(alignments_dir, exist_ok=True)
+
+    # largest alignments first, so no big one is left running on its own at the end
+    pairs = sorted(unique_pairs(n), key=lambda pair: -len(records[pair[0]][1]) * len(records[pair[1]][1]))
+    state = dict(scoring=scoring, records=records, alignments_dir=alignments_dir, align_options=align_options)
+    scores = collect_scores(n, run_tasks(align_pair, pairs, workers, state, chunksize=CHUNK_SIZE))
+    return scores, distance_matrix(scores)
+
+
+def collect_scores(n, results):
+    """
+    Fills a symmetric n x n score matrix from (i, j, score) results
+    """
+    scores = np.zeros((n, n), dtype=np.float64)
+    for i, j, score in results:
+        scores[i, j] = scores[j, i] = score
+    return scores
+
+
+def save_matrices(output_file, names, scores, distances):
+    """
+    Writes the names, scores and distances to one compressed NumPy archive
+    """
+    np.savez_compressed(output_file, names=np.array(names, dtype=str), scores=scores, distances=distances)
+
+
+def load_matrices(output_file):
+    """
+    Loads an archive written by save_matrices
+
+    Returns:
+       (names, scores, distances)
+    """
+    with np.load(output_file) as data:
+        return data["names"].tolist(), data["scores"], data["distances"]
+
+
+def print_matrix(names, matrix, digits=3):
+    """
+    Prints a matrix as a tab separated table with the names as row and column headers
+    """
+    print("\t" + "\t".join(names))
+    for name, row in zip(names, matrix):
+        print(name + "\t" + "\t".join(f"{value:.{digits}f}" for value in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align every pair of a set of sequences with one scoring file.")
+    parser.add_argument("scoring_file", help="align.py input file with the scoring, the sequence lines are optional")
+    parser.add_argument("fasta_file", help="FASTA file of the sequences to compare")
+    parser.add_argument("output_file", help="NumPy archive (.npz) for the names, scores and distances")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--engine", choices=ENGINES, default="wavefront",
+                        help="fill engine for the score matrices (default: wavefront)")
+    parser.add_argument("--alignments-dir", default=None,
+                        help="also write the alignments of every pair to this directory")
+    parser.add_argument("--max-alignments", type=int, default=None,
+                        help="stop after writing this many distinct alignments per pair")
+    parser.add_argument("--print", dest="print_matrices", action="store_true",
+                        help="print the score and distance matrices")
+    args = parser.parse_args()
+
+    scoring = AlignmentParameters()
+    scoring.load_scoring_from_file(args.scoring_file)
+    records = list(read_fasta(args.fasta_file))
+    names = [name for name, _ in records]
+    if len(set(names)) != len(names):
+        parser.error(f"{args.fasta_file} has repeated sequence names")
+
+    scores, distances = all_vs_all(scoring, records, workers=args.workers, alignments_dir=args.alignments_dir,
+                                   engine=args.engine, max_alignments=args.max_alignments)
+    save_matrices(args.output_file, names, scores, distances)
+
+    if args.print_matrices:
+        print("scores")
+        print_matrix(names, scores, digits=1)
+        print("\ndistances")
+        print_matrix(names, distances)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Batch runner for align.py.
+
+Runs many alignments from a directory of .input files or a manifest of input/output pairs inside one
+process tree: jobs are handed to a pool of worker processes that import align.py once, instead of starting a
+new interpreter per pair. A failing job is recorded and the rest of the batch carries on.
+
+Manifest format: one job per line, the input file and the output file separated by whitespace.
+Blank lines and lines starting with # are ignored, relative paths are relative to the manifest.
+
+To run:
+  python batch_align.py --dir ../quiz_input --out-dir ../quiz_output -j 4
+  python batch_align.py --manifest jobs.txt --engine wavefront
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from align import Align, ENGINES
+
+# per worker process: what every task of a run_tasks pool shares, set up by init_worker
+worker_state = {}
+
+
+def read_manifest(manifest_file):
+    """
+    Reads the (input, output) pairs from a manifest file
+
+    Inputs:
+       manifest_file = file with an input and an output path per line
+    Returns:
+       a list of (input_file, output_file) tuples
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    jobs = []
+    with open(manifest_file, "r") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split()
+            if len(fields) != 2:
+                raise ValueError(f"{manifest_file}:{line_no}: expected an input and an output file, got '{line}'")
+            jobs.append(tuple(os.path.join(base_dir, path) for path in fields))
+    return jobs
+
+
+def jobs_from_dir(input_dir, output_dir):
+    """
+    Pairs every .input file in a directory with a .output file of the same name in output_dir
+
+    Returns:
+       a list of (input_file, output_file) tuples, sorted by input name
+    """
+    jobs = []
+    for name in sorted(os.listdir(input_dir)):
+        if name.endswith(".input"):
+            output_name = name[:-len(".input")] + ".output"
+            jobs.append((os.path.join(input_dir, name), os.path.join(output_dir, output_name)))
+    return jobs
+
+
+def run_job(input_file, output_file, align_options):
+    """
+    Runs a single alignment, catching any error so one bad input doesn't take down the batch
+
+    Returns:
+       a dict with the input, output, whether it succeeded, the wall time and the error message if any
+    """
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        align = Align(input_file, output_file, **align_options)
+        align.align()
+        error = None
+    except Exception as err:
+        error = f"{type(err).__name__}: {err}"
+    return {"input": input_file, "output": output_file, "ok": error is None,
+            "seconds": time.perf_counter() - start, "error": error}
+
+
+def init_worker(state):
+    """
+    Pool initializer: keeps what every task needs in the worker so tasks only carry what differs between them
+    """
+    worker_state.clear()
+    worker_state.update(state)
+
+
+def run_chunk(func, tasks):
+    """
+    Runs func on a chunk of tasks in a worker
+    """
+    return [func(task) for task in tasks]
+
+
+def future_result(future, task, on_error=None):
+    """
+    Returns the result of a finished pool future
+
+    Inputs:
+       future = a done concurrent.futures future
+       task = what the future ran, passed to on_error
+       on_error = function(task, error message) giving the result when the worker itself died (eg. killed for
+                  memory), None to raise
+    """
+    try:
+        return future.result()
+    except Exception as err:
+        if on_error is None:
+            raise
+        return on_error(task, f"{type(err).__name__}: {err}")
+
+
+def run_tasks(func, tasks, workers=None, state=None, chunksize=1, on_error=None):
+    """
+    Runs func on every task, in this process or across a pool of worker processes.
+
+    Inputs:
+       func = module level function of one task, it can read worker_state
+       tasks = list of tasks
+       workers = number of worker processes, None for one per CPU, 1 to run in this process
+       state = dict of what every task needs, set up as worker_state once per worker (see init_worker)
+       chunksize = tasks handed to a worker at a time, amortizes the task overhead over many small tasks
+       on_error = function(task, error message) giving the result of a task whose worker died, None to raise
+    Returns:
+       a list of the results in the order of tasks
+    """
+    state = state or {}
+
+    # a single worker runs in process, which keeps tracebacks and debuggers simple
+    if workers == 1:
+        init_worker(state)
+        return [func(task) for task in tasks]
+
+    results = [None] * len(tasks)
+    chunks = [range(k, min(k + chunksize, len(tasks))) for k in range(0, len(tasks), chunksize)]
+    on_chunk_error = None
+    if on_error is not None:
+        on_chunk_error = lambda chunk_tasks, error: [on_error(task, error) for task in chunk_tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(state,)) as pool:
+        futures = {pool.submit(run_chunk, func, [tasks[k] for k in chunk]): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            chunk_results = future_result(future, [tasks[k] for k in chunk], on_chunk_error)
+            for k, result in zip(chunk, chunk_results):
+                results[k] = result
+    return results
+
+
+def align_job(job):
+    """
+    Runs one (input_file, output_file) job of run_batch in a worker
+    """
+    input_file, output_file = job
+    return run_job(input_file, output_file, worker_state["align_options"])
+
+
+def failed_job(job, error):
+    """
+    Returns the run_job result of a job whose worker died
+    """
+    input_file, output_file = job
+    return {"input": input_file, "output": output_file, "ok": False, "seconds": 0.0, "error": error}
+
+
+def run_batch(jobs, workers=None, **align_options):
+    """
+    Runs a batch of alignments across a pool of worker processes.
+
+    Inputs:
+       jobs = list of (input_file, output_file) tuples
+       workers = number of worker processes, None for one per CPU, 1 to run in this process
+       align_options = keyword arguments passed on to Align (engine, band, max_alignments, ...)
+    Returns:
+       a list of run_job results in the order of jobs
+    """
+    return run_tasks(align_job, list(jobs), workers, {"align_options": align_options}, on_error=failed_job)
+
+
+def print_summary(results, wall_seconds):
+    """
+    Prints a line per job and a summary of the timings
+    """
+    for result in results:
+        name = os.path.basename(result["input"])
+        if result["ok"]:
+            print(f"[ok]   {name}: {result['seconds']:.2f}s -> {result['output']}")
+        else:
+            print(f"[fail] {name}: {result['seconds']:.2f}s {result['error']}")
+
+    times = [result["seconds"] for result in results]
+    failed = sum(not result["ok"] for result in results)
+    print(f"\n{len(results) - failed}/{len(results)} jobs succeeded, {failed} failed")
+    if times:
+        print(f"wall time {wall_seconds:.2f}s, job time total {sum(times):.2f}s, "
+              f"mean {sum(times) / len(times):.2f}s, max {max(times):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many alignments in a pool of worker processes.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="directory of .input files")
+    source.add_argument("--manifest", help="file listing an input and an output file per line")
+    parser.add_argument("--out-dir", help="directory for the .output files, required with --dir")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--engine", choices=ENGINES, default="cell",
+                        help="fill engine for the score matrices (default: cell)")
+    parser.add_argument("--band", default=None,
+                        help="banded alignment width, or 'auto'")
+    parser.add_argument("--max-alignments", type=int, default=None,
+                        help="stop after writing this many distinct alignments per job")
+    parser.add_argument("--param-cache", default=None,
+                        help="directory to cache parsed input files in, shared by the workers")
+    args = parser.parse_args()
+
+    if args.dir:
+        if not args.out_dir:
+            parser.error("--out-dir is required with --dir")
+        jobs = jobs_from_dir(args.dir, args.out_dir)
+    else:
+        jobs = read_manifest(args.manifest)
+
+    band = args.band if args.band in (None, "auto") else int(args.band)
+    start = time.perf_counter()
+    results = run_batch(jobs, workers=args.workers, engine=args.engine, band=band,
+                        max_alignments=args.max_alignments, param_cache_dir=args.param_cache)
+    print_summary(results, time.perf_counter() - start)
+
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Benchmark suite for align.py on synthetic workloads.
+
+The example inputs are a few dozen letters long, which says nothing about how the engines scale. This suite
+generates sequence pairs over a DNA and a protein alphabet at a range of lengths and runs them through Align:
+
+  random  = two unrelated random sequences
+  mutated = a random sequence and a copy with substitutions, insertions and deletions
+  ties    = blocks of random letters each followed by a tandem repeat, against a copy with one motif fewer in
+            every repeat; each gap can slide along its repeat, so the number of co-optimal paths grows
+            exponentially with the length (the worst case for the traceback)
+
+each in local and global mode. Sequences come from a seeded random generator per case, so every run of the
+suite aligns exactly the same pairs. For each case it reports the fill throughput (cells per second of
+populate_score_matrices), the overall throughput (matrix cells per second of the whole align()), the peak
+memory of a separate traced run, and the number of co-optimal traceback paths.
+
+Results can be saved as JSON and compared against an earlier run, eg. one from the previous commit: a case whose
+throughput dropped or whose peak memory grew by more than the threshold is flagged as a regression, and a
+case whose score or path count changed is flagged as a change in the results.
+
+To run:
+  python benchmark.py --sizes 100 300 --save bench_new.json --baseline bench_old.json --threshold 0.1
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import numpy as np
+
+from align import Align, AlignmentParameters, MatchMatrix, ENGINES
+
+# letters the sequences are drawn from, the protein scoring also has the ambiguity codes B, Z and X
+LETTERS = {"dna": "ACGT", "protein": "ACDEFGHIKLMNPQRSTVWY"}
+
+KINDS = ("random", "mutated", "ties")
+MODES = ("local", "global")
+ALPHABETS = tuple(LETTERS)
+DEFAULT_SIZES = (100, 300, 600)
+
+# substitution and indel rates of the mutated copy
+MUTATION_RATE = 0.1
+INDEL_RATE = 0.03
+
+# a tie-heavy sequence is made of blocks of random anchor letters followed by a tandem repeat of a short motif
+TIE_ANCHOR_LENGTH = 10
+TIE_MOTIF_LENGTH = 2
+TIE_REPEAT_COPIES = 10
+
+# flag throughput drops or peak memory growth bigger than this fraction
+DEFAULT_THRESHOLD = 0.1
+
+
+def make_scoring(alphabet, mode):
+    """
+    Returns AlignmentParameters with the scoring of an alphabet and no sequences yet
+
+    Inputs:
+       alphabet = "dna" for +1 / -1 match scores and gaps opening at 2 and extending at 1,
+                  "protein" for BLOSUM62 with gaps opening at 11 and extending at 1
+       mode = "local" or "global"
+    """
+    params = AlignmentParameters()
+    params.global_alignment = mode == "global"
+    params.local_alignment = not params.global_alignment
+    if alphabet == "dna":
+        letters = LETTERS["dna"]
+        params.match_matrix = MatchMatrix(letters, letters)
+        for a in letters:
+            for b in letters:
+                params.match_matrix.set_score(a, b, 1.0 if a == b else -1.0)
+        params.dx = params.dy = 2.0
+        params.ex = params.ey = 1.0
+    elif alphabet == "protein":
+        from matrices import load_matrix
+        letters, params.match_matrix = load_matrix("BLOSUM62")
+        params.dx = params.dy = 11.0
+        params.ex = params.ey = 1.0
+    else:
+        raise ValueError(f"Unknown alphabet '{alphabet}', expected one of {ALPHABETS}")
+    params.alphabet_a = params.alphabet_b = letters
+    params.len_alphabet_a = params.len_alphabet_b = len(letters)
+    return params
+
+
+def mutate(seq, letters, rng, substitution_rate=MUTATION_RATE, indel_rate=INDEL_RATE):
+    """
+    Returns a copy of seq with random substitutions, single letter insertions and single letter deletions
+    """
+    out = []
+    for letter in seq:
+        r = rng.random()
+        if r < indel_rate / 2:
+            continue
+        if r < indel_rate:
+            out.append(rng.choice(letters))
+        out.append(rng.choice(letters) if rng.random() < substitution_rate else letter)
+    return "".join(out) or seq[:1]
+
+
+def make_sequences(kind, letters, size, rng):
+    """
+    Returns the (seq_a, seq_b) pair of a workload, both around size letters long
+
+    Inputs:
+       kind = one of KINDS
+       letters = the letters to draw from
+       size = length of sequence A
+       rng = random.Random to draw from
+    """
+    if kind == "random":
+        seq_a = "".join(rng.choice(letters) for _ in range(size))
+        seq_b = "".join(rng.choice(letters) for _ in range(size))
+    elif kind == "mutated":
+        seq_a = "".join(rng.choice(letters) for _ in range(size))
+        seq_b = mutate(seq_a, letters, rng)
+    elif kind == "ties":
+        blocks_a, blocks_b = [], []
+        for _ in range(max(1, size // (TIE_ANCHOR_LENGTH + TIE_MOTIF_LENGTH * TIE_REPEAT_COPIES))):
+            anchor = "".join(rng.choice(letters) for _ in range(TIE_ANCHOR_LENGTH))
+            motif = "".join(rng.sample(letters, TIE_MOTIF_LENGTH))
+            blocks_a.append(anchor + motif * TIE_REPEAT_COPIES)
+            blocks_b.append(anchor + motif * (TIE_REPEAT_COPIES - 1))
+        seq_a, seq_b = "".join(blocks_a), "".join(blocks_b)
+    else:
+        raise ValueError(f"Unknown workload '{kind}', expected one of {KINDS}")
+    return seq_a, seq_b
+
+
+def build_cases(sizes=DEFAULT_SIZES, alphabets=ALPHABETS, kinds=KINDS, modes=MODES):
+    """
+    Returns the list of cases to run, each a dict with its name, alphabet, kind, mode and size
+    """
+    return [{"name": f"{alphabet}-{kind}-{mode}-{size}", "alphabet": alphabet, "kind": kind, "mode": mode,
+             "size": size}
+            for alphabet in alphabets for kind in kinds for mode in modes for size in sizes]
+
+
+def case_params(case, seed):
+    """
+    Returns the AlignmentParameters of a case, the sequences depend only on the seed and the case name
+    """
+    params = make_scoring(case["alphabet"], case["mode"])
+    rng = random.Random(f"{seed}-{case['name']}")
+    params.set_sequences(*make_sequences(case["kind"], LETTERS[case["alphabet"]], case["size"], rng))
+    return params
+
+
+def run_case(case, seed=0, engine="wavefront", repeat=3, max_alignments=1000, work_dir=None):
+    """
+    Runs one case and measures it.
+
+    Inputs:
+       case = one of the dicts from build_cases
+       seed = seed of the sequence generator
+       engine = fill engine for Align
+       repeat = number of timed runs, the fastest counts
+       max_alignments = alignments written per run, bounds the output of the tie-heavy cases
+       work_dir = directory for the output files, a temporary one removed afterwards if None
+    Returns:
+       dict with the case, the matrix cells, the score, the path count, the fill and overall cells per
+       second, the seconds of each phase and the peak memory in bytes
+    """
+    if work_dir is None:
+        with tempfile.TemporaryDirectory(prefix="align_benchmark_") as work_dir:
+            return run_case(case, seed, engine, repeat, max_alignments, work_dir)
+
+    params = case_params(case, seed)
+    output_file = os.path.join(work_dir, case["name"] + ".output")
+
+    def run(track_memory):
+        align = Align.from_params(params, output_file, engine=engine, max_alignments=max_alignments,
+                                  track_memory=track_memory)
+        align.align()
+        return align
+
+    # the fastest of the untraced runs for the timings, tracing allocations would slow them down
+    runs = [run(False) for _ in range(max(1, repeat))]
+    best = min(runs, key=lambda align: align.stats.summary()["total_seconds"])
+    summary = best.stats.summary()
+    populate = summary["phases"]["populate"]
+    cells = len(params.seq_a) * len(params.seq_b)
+    traced = run(True).stats.summary()
+
+    return dict(case, engine=engine, len_a=len(params.seq_a), len_b=len(params.seq_b), cells=cells,
+                score=best.max_score, paths=best.count_paths(),
+                fill_cells_per_second=populate["cells_per_second"],
+                cells_per_second=cells / summary["total_seconds"] if summary["total_seconds"] > 0 else None,
+                seconds={name: entry["seconds"] for name, entry in summary["phases"].items()},
+                total_seconds=summary["total_seconds"], peak_memory=traced["peak_memory"])
+
+
+def run_suite(cases, seed=0, engine="wavefront", repeat=3, max_alignments=1000, progress=None):
+    """
+    Runs every case, returning the results keyed by case name along with what they were run on
+
+    Inputs:
+       progress = function called with each result as it finishes, eg. to print it
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="align_benchmark_") as work_dir:
+        for case in cases:
+            result = run_case(case, seed, engine, repeat, max_alignments, work_dir)
+            results[case["name"]] = result
+            if progress is not None:
+                progress(result)
+    return {"meta": run_metadata(seed, engine, repeat), "cases": results}
+
+
+def run_metadata(seed, engine, repeat):
+    """
+    Returns a dict describing the run: settings, Python and NumPy versions, machine and git commit if known
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"seed": seed, "engine": engine, "repeat": repeat, "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.machine(), "processor": platform.processor()}
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares a run against a baseline run over the cases both have
+
+    Inputs:
+       results, baseline = what run_suite returns (or the saved JSON of it)
+       threshold = fraction a throughput may drop, or the peak memory grow, before it counts as a regression
+    Returns:
+       list of (case name, message) for every regression or changed result
+    """
+    flagged = []
+    for name, new in results["cases"].items():
+        old = baseline["cases"].get(name)
+        if old is None:
+            continue
+        if new["score"] != old["score"] or new["paths"] != old["paths"]:
+            flagged.append((name, f"result changed: score {old['score']} -> {new['score']}, "
+                                  f"paths {old['paths']} -> {new['paths']}"))
+        for key in ("fill_cells_per_second", "cells_per_second"):
+            if old[key] and new[key] and new[key] < old[key] * (1 - threshold):
+                flagged.append((name, f"{key} dropped {1 - new[key] / old[key]:.0%}: "
+                                      f"{old[key]:,.0f} -> {new[key]:,.0f}"))
+        if old["peak_memory"] and new["peak_memory"] and new["peak_memory"] > old["peak_memory"] * (1 + threshold):
+            flagged.append((name, f"peak memory grew {new['peak_memory'] / old['peak_memory'] - 1:.0%}: "
+                                  f"{old['peak_memory']:,} -> {new['peak_memory']:,} bytes"))
+    return flagged
+
+
+def print_result(result):
+    """
+    Prints one line per case
+    """
+    memory = f"{result['peak_memory'] / 2**20:8.2f}" if result["peak_memory"] is not None else "       -"
+    # path counts of the tie-heavy cases can be too big for a float
+    paths = str(result["paths"]) if result["paths"] < 10**12 else f"~1e{len(str(result['paths'])) - 1}"
+    print(f"{result['name']:<28} {result['cells']:>10,} {result['fill_cells_per_second'] or 0:>14,.0f} "
+          f"{result['cells_per_second'] or 0:>14,.0f} {memory} {paths:>12} {result['score']:>8}")
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark align.py on synthetic DNA and protein workloads.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help=f"lengths of sequence A (default: {' '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument("--alphabets", nargs="+", choices=ALPHABETS, default=list(ALPHABETS))
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--engine", choices=ENGINES, default="wavefront",
+                        help="fill engine for the score matrices (default: wavefront)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the sequence generator (default: 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, the fastest counts (default: 3)")
+    parser.add_argument("--max-alignments", type=int, default=1000,
+                        help="alignments written per run (default: 1000)")
+    parser.add_argument("--save", default=None, help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"fraction of slowdown or memory growth flagged as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    cases = build_cases(args.sizes, args.alphabets, args.kinds, args.modes)
+    print(f"{'case':<28} {'cells':>10} {'fill cells/s':>14} {'cells/s':>14} {'peak MiB':>8} {'paths':>12} {'score':>8}")
+    results = run_suite(cases, seed=args.seed, engine=args.engine, repeat=args.repeat,
+                        max_alignments=args.max_alignments, progress=print_result)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        flagged = compare(results, baseline, args.threshold)
+        print(f"\ncompared against {args.baseline} (commit {baseline['meta'].get('commit')}): "
+              f"{len(flagged)} flagged")
+        for name, message in flagged:
+            print(f"  {name}: {message}")
+        if flagged:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,28 @@
+"""
+Checks alignment output files against the expected ones: same score and the same multiset of alignments.
+
+By default the nine example cases are compared by loading both files. With --stream, each file is read one line
+at a time and reduced to a 16 byte digest per alignment: the digests are summed into one order independent
+checksum per file, so matching files are confirmed in constant memory. Only when the checksums differ are the
+digests counted to find the alignments in one file and not the other, and a last pass picks out the strings of
+just those to report. Cases are checked in parallel by a pool of worker processes.
+
+To run:
+  python check_output.py
+  python check_output.py --stream -j 4
+  python check_output.py --stream --pair big_run.expected big_run.output
+"""
 import os
+import hashlib
+import argparse
 from collections import Counter
 
+from batch_align import run_tasks
+
+# size of the digest of one alignment, and the modulus of the sum of the digests of a file
+DIGEST_SIZE = 16
+DIGEST_MODULUS = 1 << (8 * DIGEST_SIZE)
+
 
 def _fuzzy_equal(a: float, b: float, eps: float = 1e-6) -> bool:
     return abs(a - b) < eps
@@ -53,6 +75,159 @@ def parse_alignment_output(path: str):
     return score, Counter(pairs)
 
 
+def iter_alignment_output(path: str):
+    """
+    Generator over an alignment output file that reads one line at a time, accepting the same layout as
+    parse_alignment_output.
+
+    Yields:
+      the score as a float first, then each alignment as a (str, str) pair
+    """
+    with open(path, "r") as f:
+        lines = (ln.strip() for ln in f)
+        nonblank = (ln for ln in lines if ln != "")
+        first = next(nonblank, None)
+        if first is None:
+            raise ValueError(f"No score line found in {path}")
+        try:
+            yield float(first)
+        except ValueError:
+            raise ValueError(f"Score line is not a float in {path}: '{first}'")
+
+        # the alignment lines come in pairs, blank lines only separate them
+        for a in nonblank:
+            b = next(nonblank, None)
+            if b is None:
+                raise ValueError(f"Unpaired alignment line at end of file {path}")
+            yield a, b
+
+
+def pair_digest(pair) -> int:
+    """
+    Returns the digest of one alignment as an integer below DIGEST_MODULUS
+    """
+    a, b = pair
+    return int.from_bytes(hashlib.blake2b(f"{a}\n{b}".encode(), digest_size=DIGEST_SIZE).digest(), "big")
+
+
+def output_checksum(path: str):
+    """
+    Streams an output file into its score, its number of alignments and the sum of their digests, which
+    doesn't depend on the order of the alignments
+
+    Returns:
+      (score, count, checksum)
+    """
+    items = iter_alignment_output(path)
+    score = next(items)
+    count = checksum = 0
+    for pair in items:
+        count += 1
+        checksum = (checksum + pair_digest(pair)) % DIGEST_MODULUS
+    return score, count, checksum
+
+
+def digest_counts(path: str) -> Counter:
+    """
+    Streams an output file into a Counter of the digests of its alignments
+    """
+    items = iter_alignment_output(path)
+    next(items)
+    return Counter(pair_digest(pair) for pair in items)
+
+
+def find_pairs(path: str, digests) -> dict:
+    """
+    Streams an output file for the alignments with the given digests, stopping once all are found
+
+    Returns:
+      dict of digest to (a, b)
+    """
+    wanted = set(digests)
+    found = {}
+    items = iter_alignment_output(path)
+    next(items)
+    for pair in items:
+        if not wanted:
+            break
+        digest = pair_digest(pair)
+        if digest in wanted:
+            found[digest] = pair
+            wanted.discard(digest)
+    return found
+
+
+def compare_outputs_streaming(answer_path: str, example_path: str, report=print) -> bool:
+    """
+    Same check and report as compare_outputs, streaming both files instead of loading them (see the module
+    docstring)
+
+    Inputs:
+      answer_path, example_path = the output files to compare
+      report = function called with each line of the report
+    """
+    ans_score, ans_count, ans_checksum = output_checksum(answer_path)
+    ex_score, ex_count, ex_checksum = output_checksum(example_path)
+
+    ok = True
+    if not _fuzzy_equal(ans_score, ex_score):
+        report(f"Score mismatch: answer={ans_score} example={ex_score}")
+        ok = False
+    if (ans_count, ans_checksum) == (ex_count, ex_checksum):
+        return ok
+
+    ans_digests = digest_counts(answer_path)
+    ex_digests = digest_counts(example_path)
+    missing = ex_digests - ans_digests  # in example but not in answer
+    extra = ans_digests - ex_digests    # in answer but not in example
+    for title, counts, path in [("Missing pairs (expected but not found):", missing, example_path),
+                                ("Extra pairs (found but not expected):", extra, answer_path)]:
+        if counts:
+            report(title)
+            pairs = find_pairs(path, counts)
+            for digest, cnt in counts.items():
+                a, b = pairs[digest]
+                report(f"  x{cnt}: {a}\n      {b}")
+    return False
+
+
+def check_case(case):
+    """
+    Compares one (tag, answer, example) case with compare_outputs_streaming, in a worker
+
+    Returns:
+      (tag, ok, report lines)
+    """
+    tag, ans, ex = case
+    lines = []
+    try:
+        ok = compare_outputs_streaming(ans, ex, report=lines.append)
+    except (OSError, ValueError) as err:
+        lines.append(f"{type(err).__name__}: {err}")
+        ok = False
+    return tag, ok, lines
+
+
+def failed_case(case, error):
+    """
+    Returns the check_case result of a case whose worker died
+    """
+    return case[0], False, [error]
+
+
+def check_cases(cases, workers=None):
+    """
+    Checks many (tag, answer, example) cases in a pool of worker processes
+
+    Inputs:
+      cases = list of (tag, answer_path, example_path)
+      workers = worker processes, see batch_align.run_tasks
+    Returns:
+      a list of check_case results in the order of cases
+    """
+    return run_tasks(check_case, list(cases), workers, on_error=failed_case)
+
+
 def compare_outputs(answer_path: str, example_path: str) -> bool:
     ans_score, ans_pairs = parse_alignment_output(answer_path)
     ex_score, ex_pairs = parse_alignment_output(example_path)
@@ -78,7 +253,16 @@ def compare_outputs(answer_path: str, example_path: str) -> bool:
     return ok
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check alignment outputs against the expected ones.")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream the files and compare digests, checking the cases in parallel")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes for --stream (default: one per CPU)")
+    parser.add_argument("--pair", nargs=2, action="append", metavar=("ANSWER", "EXPECTED"),
+                        help="check this output against this expected output instead of the examples, repeatable")
+    args = parser.parse_args(argv)
+
     here = os.path.dirname(__file__)
     examples_dir = os.path.normpath(os.path.join(here, "..", "examples"))
 
@@ -86,17 +270,30 @@ def main():
     suffixes = [""] + [str(i) for i in range(1, 8 + 1)]
 
     all_ok = True
-    for sfx in suffixes:
+    cases = [(str(k), ans, ex) for k, (ans, ex) in enumerate(args.pair or [])]
+    for sfx in ([] if args.pair else suffixes):
         ans = os.path.join(examples_dir, f"alignment_answer{sfx}.output" if sfx else "alignment_answer.output")
         ex = os.path.join(examples_dir, f"alignment_example{sfx}.output" if sfx else "alignment_example.output")
         if not (os.path.exists(ans) and os.path.exists(ex)):
             print(f"Skipping case '{sfx or '0'}' (files not found)")
             all_ok = False
             continue
-        print(f"Checking case '{sfx or '0'}':")
-        ok = compare_outputs(ans, ex)
-        print("Match" if ok else "Mismatch", "\n")
-        all_ok = all_ok and ok
+        cases.append((sfx or "0", ans, ex))
+
+    if args.stream:
+        # the workers collect their reports, printed here in case order
+        for tag, ok, lines in check_cases(cases, workers=args.workers):
+            print(f"Checking case '{tag}':")
+            for line in lines:
+                print(line)
+            print("Match" if ok else "Mismatch", "\n")
+            all_ok = all_ok and ok
+    else:
+        for tag, ans, ex in cases:
+            print(f"Checking case '{tag}':")
+            ok = compare_outputs(ans, ex)
+            print("Match" if ok else "Mismatch", "\n")
+            all_ok = all_ok and ok
 
     if not all_ok:
         raise SystemExit(1)
@@ -0,0 +1,141 @@
+"""
+Checkpoints for the score matrix fill in align.py, so a preempted alignment can pick up where it left off.
+
+A checkpoint file starts with a header holding a hash of everything that determines the matrices (see
+AlignmentParameters.digest) and their storage shape. After that it is append only: every save adds one block
+with the rows completed since the last save, scores and pointer bits for M, Ix and Iy. Nothing already written
+is rewritten, so a save costs the size of the new rows, and a block cut short by the process being killed is
+simply ignored when resuming.
+"""
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"ALNCKPT1"
+
+# header: magic, parameter hash (sha256 digest), rows and columns of the stored arrays
+HEADER = struct.Struct("<8s32sqq")
+
+# block header: first and one-past-last row in the block
+BLOCK = struct.Struct("<qq")
+
+
+class FillCheckpoint(object):
+    """
+    Object to save and restore the completed rows of the M, Ix and Iy matrices of one alignment
+    """
+
+    def __init__(self, checkpoint_file, digest, matrices):
+        """
+        Input:
+            checkpoint_file = file to keep the checkpoint in
+            digest = hex sha256 digest of the alignment parameters the matrices are filled from
+            matrices = the M, Ix and Iy score matrices being filled
+        """
+        self.checkpoint_file = checkpoint_file
+        self.digest = bytes.fromhex(digest)
+        self.matrices = matrices
+        self.shape = matrices[0].scores.shape
+
+        # the first row not saved yet
+        self.saved_rows = 1
+
+    def block_size(self, nrows):
+        """
+        Returns the number of bytes of a block of nrows rows
+        """
+        row_bytes = sum(m.scores[0].nbytes + m.pointer_bits[0].nbytes for m in self.matrices)
+        return BLOCK.size + nrows * row_bytes
+
+    def restore(self):
+        """
+        Loads the saved rows into the matrices, or starts a new checkpoint file if there is none.
+
+        Returns:
+           the number of the last completed row, 0 if there was nothing to restore
+        """
+        if not os.path.exists(self.checkpoint_file):
+            self.start()
+            return 0
+
+        with open(self.checkpoint_file, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                # killed while writing the header, nothing to restore
+                self.start()
+                return 0
+            magic, digest, nrow, ncol = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError(f"{self.checkpoint_file} is not an alignment checkpoint")
+            if digest != self.digest or (nrow, ncol) != self.shape:
+                raise ValueError(f"{self.checkpoint_file} was written for different alignment parameters, "
+                                 "remove it to start over")
+
+            valid_end = f.tell()
+            while True:
+                block_header = f.read(BLOCK.size)
+                if len(block_header) < BLOCK.size:
+                    break
+                row_lo, row_hi = BLOCK.unpack(block_header)
+                if row_lo != self.saved_rows or not row_lo < row_hi <= nrow:
+                    break
+                data = f.read(self.block_size(row_hi - row_lo) - BLOCK.size)
+                if len(data) < self.block_size(row_hi - row_lo) - BLOCK.size:
+                    break
+                self.read_block(data, row_lo, row_hi)
+                self.saved_rows = row_hi
+                valid_end = f.tell()
+
+        # drop a block cut short by the previous run so new blocks follow the last complete one
+        with open(self.checkpoint_file, "r+b") as f:
+            f.truncate(valid_end)
+        return self.saved_rows - 1
+
+    def start(self):
+        """
+        Writes a new checkpoint file with just the header
+        """
+        with open(self.checkpoint_file, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.digest, *self.shape))
+            f.flush()
+            os.fsync(f.fileno())
+        self.saved_rows = 1
+
+    def read_block(self, data, row_lo, row_hi):
+        """
+        Copies the rows of a block into the matrices
+        """
+        offset = 0
+        for matrix in self.matrices:
+            for array in (matrix.scores, matrix.pointer_bits):
+                size = array[row_lo:row_hi].nbytes
+                array[row_lo:row_hi] = np.frombuffer(data, dtype=array.dtype, count=size // array.itemsize,
+                                                     offset=offset).reshape(array[row_lo:row_hi].shape)
+                offset += size
+
+    def save(self, rows_done):
+        """
+        Appends the rows completed since the last save.
+
+        Inputs:
+           rows_done = the last row whose cells are all filled in
+        """
+        row_lo, row_hi = self.saved_rows, rows_done + 1
+        if row_hi <= row_lo:
+            return
+        with open(self.checkpoint_file, "ab") as f:
+            f.write(BLOCK.pack(row_lo, row_hi))
+            for matrix in self.matrices:
+                f.write(np.ascontiguousarray(matrix.scores[row_lo:row_hi]).tobytes())
+                f.write(np.ascontiguousarray(matrix.pointer_bits[row_lo:row_hi]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.saved_rows = row_hi
+
+    def remove(self):
+        """
+        Deletes the checkpoint file once the alignment is finished
+        """
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
@@ -1,17 +1,21 @@
-import sys
-from align_quiz_functions import count_mismatches, count_gaps
+import argparse
+from align_quiz_functions import count_mismatches, count_gaps, average_alignment_stats
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python count_gaps_n_mismatches.py <alignment_output_file>")
+    parser = argparse.ArgumentParser(description="Average the mismatches and gaps of the alignments in an output file.")
+    parser.add_argument("output_file", help="alignment output file, or the statistics file with --alignment-stats")
+    parser.add_argument("--alignment-stats", action="store_true",
+                        help="the file is the statistics written by align.py --alignment-stats, averaged without "
+                             "re-parsing the alignments")
+    args = parser.parse_args()
+
+    if args.alignment_stats:
+        average_alignment_stats(args.output_file)
         return
-    output_file = sys.argv[1]
 
-    count_mismatches(output_file)
-    count_gaps(output_file)
+    count_mismatches(args.output_file)
+    count_gaps(args.output_file)
     
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,181 @@
+"""
+Align sequences streamed from FASTA files with one shared scoring file.
+
+An align.py input file holds exactly two sequences plus the whole scoring block, so aligning N pairs meant N
+files each repeating the match matrix. Here the scoring (mode, gap penalties, alphabets, match matrix) is read
+once from a file in the input format, with or without the two sequence lines, and the sequences come from FASTA
+files read one record at a time, so memory stays at one query and one target however large the files get.
+
+Pairing:
+  cross = every query against every target (the target file is streamed again for each query)
+  zip   = the first query with the first target, the second with the second, ...
+
+To run:
+  python fasta_align.py scoring.input queries.fa targets.fa out_dir --pairing cross
+which writes one output file per pair, named <query>+<target>.output, in the align.py output format.
+"""
+import os
+import re
+import sys
+import copy
+import argparse
+
+from align import Align, AlignmentParameters, ENGINES
+
+PAIRINGS = ("cross", "zip")
+
+
+def read_fasta(fasta_file):
+    """
+    Generator over the records of a FASTA file, reading one line at a time
+
+    Inputs:
+       fasta_file = FASTA file, sequence lines of a record may be wrapped
+    Yields:
+       (name, sequence) for each record, the name is the first word of the header
+    """
+    name, chunks = None, []
+    with open(fasta_file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith(";"):
+                continue
+            if line.startswith(">"):
+                if name is not None:
+                    yield name, "".join(chunks)
+                header = line[1:].split()
+                name, chunks = (header[0] if header else ""), []
+            elif name is None:
+                raise ValueError(f"{fasta_file}: sequence before the first '>' header")
+            else:
+                chunks.append(line)
+    if name is not None:
+        yield name, "".join(chunks)
+
+
+def pair_records(query_file, target_file, pairing="cross"):
+    """
+    Generator over the (query, target) pairs to align, each a (name, sequence) record
+
+    Inputs:
+       query_file, target_file = FASTA files
+       pairing = "cross" for every query against every target, "zip" to pair them up in order
+    """
+    if pairing not in PAIRINGS:
+        raise ValueError(f"Unknown pairing '{pairing}', expected one of {PAIRINGS}")
+    if pairing == "zip":
+        queries, targets = read_fasta(query_file), read_fasta(target_file)
+        for query in queries:
+            target = next(targets, None)
+            if target is None:
+                raise ValueError(f"{target_file} has fewer records than {query_file}")
+            yield query, target
+        if next(targets, None) is not None:
+            raise ValueError(f"{target_file} has more records than {query_file}")
+    else:
+        for query in read_fasta(query_file):
+            for target in read_fasta(target_file):
+                yield query, target
+
+
+def safe_name(name):
+    """
+    Returns a record name with anything that isn't safe in a file name replaced by "_"
+    """
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name) or "unnamed"
+
+
+def output_name(query_name, target_name):
+    """
+    Returns the output file name for a pair. The "+" between the names is never part of a safe_name, so
+    pairs of different safe names never share an output file.
+    """
+    return f"{safe_name(query_name)}+{safe_name(target_name)}.output"
+
+
+def check_distinct(keyed_names, source):
+    """
+    Raises a ValueError if two names share a key
+
+    Inputs:
+       keyed_names = iterable of (key, name)
+       source = the files the names come from, for the message
+    """
+    seen = {}
+    for key, name in keyed_names:
+        if key in seen:
+            raise ValueError(f"Records {seen[key]!r} and {name!r} of {source} would be written to the same output "
+                             "file, give them distinct names")
+        seen[key] = name
+
+
+def check_output_names(query_file, target_file, pairing="cross"):
+    """
+    Raises a ValueError if two pairs would write the same output file, so nothing gets overwritten. With
+    "cross" that happens when two queries or two targets have the same safe_name, with "zip" when two pairs have
+    the same safe names. Only the names of one file are kept at a time, never the pairs of a cross.
+    """
+    record_names = lambda path: (name for name, _ in read_fasta(path))
+    if pairing == "zip":
+        pairs = zip(record_names(query_file), record_names(target_file))
+        check_distinct((((safe_name(q), safe_name(t)), (q, t)) for q, t in pairs), f"{query_file} and {target_file}")
+    else:
+        for path in (query_file, target_file):
+            check_distinct(((safe_name(name), name) for name in record_names(path)), path)
+
+
+def align_records(scoring_file, query_file, target_file, out_dir, pairing="cross", **align_options):
+    """
+    Generator that aligns every pair and writes its output file
+
+    Inputs:
+       scoring_file = align.py input file to take the scoring from, its sequences (if any) are ignored
+       query_file, target_file = FASTA files, queries are sequence A (rows) and targets sequence B (columns)
+       out_dir = directory to write the output files to
+       pairing = one of PAIRINGS
+       align_options = keyword arguments passed on to Align (engine, band, max_alignments, ...)
+    Yields:
+       (query_name, target_name, max_score, output_file) for each pair as it finishes
+    Raises:
+       ValueError before aligning anything if two pairs would share an output file (see check_output_names)
+    """
+    check_output_names(query_file, target_file, pairing)
+    scoring = AlignmentParameters()
+    scoring.load_scoring_from_file(scoring_file)
+    os.makedirs(out_dir, exist_ok=True)
+
+    for (query_name, query), (target_name, target) in pair_records(query_file, target_file, pairing):
+        output_file = os.path.join(out_dir, output_name(query_name, target_name))
+
+        # the pairs share the parsed match matrix, only the sequences change
+        params = copy.copy(scoring)
+        params.set_sequences(query, target)
+        align = Align.from_params(params, output_file, **align_options)
+        align.align()
+        yield query_name, target_name, align.max_score, output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align the records of two FASTA files with one scoring file.")
+    parser.add_argument("scoring_file", help="align.py input file with the scoring, the sequence lines are optional")
+    parser.add_argument("query_file", help="FASTA file of queries (sequence A)")
+    parser.add_argument("target_file", help="FASTA file of targets (sequence B)")
+    parser.add_argument("out_dir", help="directory for the output files")
+    parser.add_argument("--pairing", choices=PAIRINGS, default="cross",
+                        help="every query against every target, or pair them up in order (default: cross)")
+    parser.add_argument("--engine", choices=ENGINES, default="wavefront",
+                        help="fill engine for the score matrices (default: wavefront)")
+    parser.add_argument("--max-alignments", type=int, default=None,
+                        help="stop after writing this many distinct alignments per pair")
+    args = parser.parse_args()
+
+    pairs = align_records(args.scoring_file, args.query_file, args.target_file, args.out_dir,
+                          pairing=args.pairing, engine=args.engine, max_alignments=args.max_alignments)
+    print("query\ttarget\tscore\toutput")
+    for query_name, target_name, max_score, output_file in pairs:
+        print(f"{query_name}\t{target_name}\t{max_score}\t{output_file}")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Linear-space global alignment for align.py (Myers-Miller divide and conquer with affine gaps).
+
+The full M, Ix, Iy matrices cost O(nm) memory, which rules out globally aligning anything longer than a few
+thousand residues. This aligner only ever keeps a handful of rows: a forward pass finds the best score and the
+end cell, then the alignment is recovered by splitting the problem at a middle row, locating the cell and matrix
+the optimal path crosses that row in (forward scores from the top + backward scores from the bottom), and
+recursing on the two halves.
+
+It uses the same model as Align: the same four gap penalties (dx, ex, dy, ey), no end gap penalties (row 0 and
+column 0 are free starting points in any matrix), and an alignment ends in M anywhere on the last row or column.
+The score it reports is the one find_traceback_start would report for the full matrices. Like Align.iter_paths,
+the alignment it recovers starts in M on row 0 or column 0, and when no optimal path does there is no alignment.
+Only one optimal alignment is produced, not every co-optimal one.
+"""
+import numpy as np
+
+from align import fuzzy_equals, pointer
+
+NEG_INF = float("-inf")
+
+# states of a cell, in the same order the full matrices break ties
+M, IX, IY = 0, 1, 2
+STATE_NAMES = ("M", "Ix", "Iy")
+
+
+class LinearSpaceAligner(object):
+    """
+    Object to run a linear-space global alignment on a loaded AlignmentParameters object
+    """
+
+    def __init__(self, align_params):
+        if not align_params.global_alignment:
+            raise ValueError("Linear-space alignment only supports global alignment")
+        self.align_params = align_params
+        self.dx = align_params.dx
+        self.ex = align_params.ex
+        self.dy = align_params.dy
+        self.ey = align_params.ey
+
+        # the encoded sequences let us gather a whole row of match scores at once
+        self.codes_a = align_params.seq_a_codes
+        self.codes_b = align_params.seq_b_codes
+        self.match_scores = align_params.match_matrix.scores
+
+    def align(self):
+        """
+        Runs the alignment.
+
+        Returns:
+            (max_score, max_loc, path) where max_score and max_loc are what find_traceback_start returns for the
+            full matrices, and path is one optimal traceback path in the format of Align.traceback()
+            (pointers from the end M cell back to the starting boundary cell), or None when every optimal
+            path starts in Ix or Iy and Align.traceback() would be empty
+        """
+        max_score, max_loc = self.score()
+
+        # the score lets a path start in any matrix, the traceback only keeps the ones starting in M
+        m_scores = dict(self.end_scores(gap_starts=False))
+        ends = [loc for loc in sorted(max_loc) if fuzzy_equals(m_scores[loc], max_score)]
+        if not ends:
+            return max_score, max_loc, None
+
+        # recover one optimal path ending in M at the first tied end cell one can start in M for
+        nodes = self.solve(None, ends[0] + (M,))
+        path = [pointer(i, j, STATE_NAMES[state]) for i, j, state in reversed(nodes)]
+        return max_score, max_loc, path
+
+    def score(self):
+        """
+        Runs the forward pass only.
+
+        Returns:
+            (max_score, max_loc) as find_traceback_start returns them for the full matrices
+        """
+        candidates = self.end_scores(gap_starts=True)
+        max_score = max(score for _, score in candidates)
+        max_loc = set(loc for loc, score in candidates if fuzzy_equals(score, max_score))
+        return round(float(max_score), 1), max_loc
+
+    def end_scores(self, gap_starts):
+        """
+        Forward pass over the whole matrix, only keeping the M scores on the last row and column.
+
+        Inputs:
+           gap_starts = let paths start in Ix / Iy on row 0 / column 0 as well as in M
+        Returns:
+           a list of ((i, j), score) for the end cells
+        """
+        n, m = len(self.codes_a), len(self.codes_b)
+        candidates = []
+        for i, (row_m, _, _) in self.forward_rows(None, n, m, gap_starts):
+            if i == n:
+                candidates.extend(((n, j), float(row_m[j])) for j in range(1, m + 1))
+            elif i >= 1:
+                candidates.append(((i, m), float(row_m[m])))
+        return candidates
+
+    def forward_rows(self, start, i1, j1, gap_starts=False):
+        """
+        Generator over the forward (prefix) scores of a subproblem, one row at a time.
+
+        Inputs:
+           start = None for a free start on row 0 / column 0, or (i0, j0, state) for a fixed start cell
+           i1 = the last row to compute
+           j1 = the last column of the subproblem
+           gap_starts = with a free start, let paths start in Ix / Iy as well as in M (how the full matrices
+                        score), rather than only in M (the paths their traceback keeps)
+        Yields:
+           (i, (M, Ix, Iy)) where each is an array over columns j0..j1 of the best score of a path from the
+           start that ends in that cell and matrix
+        """
+        i0, j0 = (0, 0) if start is None else start[:2]
+        width = j1 - j0 + 1
+
+        # first row: free starts are zero everywhere on row 0 (in M only unless gap_starts), a fixed start can
+        # only extend along its row with Iy
+        gap_fill = 0.0 if gap_starts else NEG_INF
+        if start is None:
+            row = [np.zeros(width), np.full(width, gap_fill), np.full(width, gap_fill)]
+        else:
+            row = [np.full(width, NEG_INF), np.full(width, NEG_INF), np.full(width, NEG_INF)]
+            row[start[2]][0] = 0.0
+            self.scan_iy_forward(row[M], row[IY])
+        yield i0, row
+
+        for i in range(i0 + 1, i1 + 1):
+            prev_m, prev_ix, prev_iy = row
+            cur_m = np.full(width, NEG_INF)
+            if width > 1:
+                s_row = self.match_scores[self.codes_a[i - 1], self.codes_b[j0:j1]]
+                cur_m[1:] = s_row + np.maximum(np.maximum(prev_m[:-1], prev_ix[:-1]), prev_iy[:-1])
+            cur_ix = np.maximum(prev_m - self.dy, prev_ix - self.ey)
+            cur_iy = np.full(width, NEG_INF)
+
+            # column 0 is a boundary: a free start may begin there like on row 0, otherwise it can't be entered
+            if j0 == 0:
+                if start is None:
+                    cur_m[0], cur_ix[0], cur_iy[0] = 0.0, gap_fill, gap_fill
+                else:
+                    cur_m[0] = cur_ix[0] = cur_iy[0] = NEG_INF
+            self.scan_iy_forward(cur_m, cur_iy)
+            row = [cur_m, cur_ix, cur_iy]
+            yield i, row
+
+    def scan_iy_forward(self, row_m, row_iy):
+        """
+        Fills Iy along a row left to right, the only part of a row that depends on the row itself
+        """
+        dx, ex = self.dx, self.ex
+        m_vals = row_m.tolist()
+        iy_vals = row_iy.tolist()
+        for k in range(1, len(iy_vals)):
+            iy_vals[k] = max(m_vals[k - 1] - dx, iy_vals[k - 1] - ex)
+        row_iy[:] = iy_vals
+
+    def backward_rows(self, j0, end, i_stop):
+        """
+        Generator over the backward (suffix) scores of a subproblem, one row at a time from the end row up.
+
+        Inputs:
+           j0 = the first column of the subproblem
+           end = (i1, j1, state) the cell and matrix the path has to end in
+           i_stop = the last (smallest) row to compute
+        Yields:
+           (i, (M, Ix, Iy)) where each is an array over columns j0..j1 of the best score collected after leaving
+           that cell in that matrix on the way to the end
+        """
+        i1, j1, end_state = end
+        width = j1 - j0 + 1
+        row = None
+
+        for i in range(i1, i_stop - 1, -1):
+            # steps into the next row: diagonal into M, vertical into Ix (column 0 can't be entered)
+            diag = np.full(width, NEG_INF)
+            down = np.full(width, NEG_INF)
+            if row is not None:
+                next_m, next_ix, _ = row
+                if width > 1:
+                    diag[:-1] = self.match_scores[self.codes_a[i], self.codes_b[j0:j1]] + next_m[1:]
+                down = next_ix.copy()
+                if j0 == 0:
+                    down[0] = NEG_INF
+
+            # horizontal steps into Iy along this row, scanned right to left (row 0 can't be entered)
+            diag_vals = diag.tolist()
+            iy_vals = [NEG_INF] * width
+            right = [NEG_INF] * width
+            if i == i1:
+                iy_vals[-1] = 0.0 if end_state == IY else NEG_INF
+            else:
+                iy_vals[-1] = diag_vals[-1]
+            ex = self.ex
+            for k in range(width - 2, -1, -1):
+                if i >= 1:
+                    right[k] = iy_vals[k + 1]
+                iy_vals[k] = max(diag_vals[k], right[k] - ex)
+            right = np.array(right)
+
+            cur_m = np.maximum(np.maximum(diag, down - self.dy), right - self.dx)
+            cur_ix = np.maximum(diag, down - self.ey)
+            cur_iy = np.array(iy_vals)
+            if i == i1:
+                cur_m[-1] = 0.0 if end_state == M else NEG_INF
+                cur_ix[-1] = 0.0 if end_state == IX else NEG_INF
+            row = [cur_m, cur_ix, cur_iy]
+            yield i, row
+
+    def solve(self, start, end):
+        """
+        Recovers an optimal path between a start and an end in linear space.
+
+        Inputs:
+           start = None for a free start on row 0 / column 0, or (i0, j0, state)
+           end = (i1, j1, state)
+        Returns:
+           the path as a list of (row, col, state) nodes from the start to the end
+        """
+        i0, j0 = (0, 0) if start is None else start[:2]
+        i1, j1, _ = end
+        if i1 - i0 <= 1:
+            return self.solve_small(start, end)
+
+        # forward scores down to the middle row
+        mid = (i0 + i1) // 2
+        for _, forward in self.forward_rows(start, mid, j1):
+            pass
+
+        # backward scores up to the middle row; with a free start the path may also begin in M on column 0 below it
+        best = (NEG_INF, None)
+        for i, backward in self.backward_rows(j0, end, mid):
+            if i > mid and start is None and backward[M][0] > best[0]:
+                best = (backward[M][0], (i, 0, M))
+
+        # the path crosses the middle row in some cell and matrix, forward scores rule out Ix / Iy on column 0
+        crossing = (NEG_INF, None)
+        for state in (M, IX, IY):
+            totals = forward[state] + backward[state]
+            k = int(np.argmax(totals))
+            if totals[k] > crossing[0]:
+                crossing = (totals[k], (mid, j0 + k, state))
+
+        if crossing[0] >= best[0]:
+            split = crossing[1]
+            # a crossing on column 0 of a free problem is itself the starting boundary cell
+            if start is None and split[1] == 0:
+                upper = [split]
+            else:
+                upper = self.solve(start, split)
+            return upper + self.solve(split, end)[1:]
+        return self.solve(best[1], end)
+
+    def solve_small(self, start, end):
+        """
+        Base case of solve() for at most two rows: keeps the rows and traces back through them directly
+        """
+        i0, j0 = (0, 0) if start is None else start[:2]
+        i1, j1, end_state = end
+        rows = [row for _, row in self.forward_rows(start, i1, j1)]
+
+        def score(node):
+            i, j, state = node
+            if i < i0 or j < j0:
+                return NEG_INF
+            return rows[i - i0][state][j - j0]
+
+        path = [end]
+        i, j, state = end
+        while True:
+            if start is None and (i == 0 or j == 0):
+                break
+            if start is not None and (i, j, state) == tuple(start):
+                break
+            value = score((i, j, state))
+
+            # find a predecessor that explains the value, preferring M, Ix, Iy like the traceback does
+            if state == M:
+                s_ij = self.match_scores[self.codes_a[i - 1], self.codes_b[j - 1]]
+                options = [((i - 1, j - 1, prev), s_ij) for prev in (M, IX, IY)]
+            elif state == IX:
+                options = [((i - 1, j, M), -self.dy), ((i - 1, j, IX), -self.ey)]
+            else:
+                options = [((i, j - 1, M), -self.dx), ((i, j - 1, IY), -self.ex)]
+            i, j, state = next(node for node, step in options if score(node) + step == value)
+            path.append((i, j, state))
+
+        return list(reversed(path))
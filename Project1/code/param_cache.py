@@ -0,0 +1,126 @@
+"""
+Binary cache of parsed alignment parameters.
+
+Parsing an input file means a split() and float() for every letter pair of the match matrix, over 500 lines for
+a protein alphabet, on every run. This cache stores what load_params_from_file produces in a compact binary file
+keyed by a sha256 of the input file's bytes, and of the substitution matrix file it names if any (see
+matrices.py), so a repeated run, or a batch worker seeing an input again, loads the arrays directly and skips the
+text parsing. Editing the input file or its matrix file changes the key, so stale entries are never used; they
+can be deleted at any time.
+
+A cache file is one line of JSON with the sequences, mode, gap penalties and alphabets, followed by the match
+scores as raw float64 values.
+"""
+import os
+import json
+import hashlib
+import tempfile
+from itertools import islice
+
+import numpy as np
+
+from align import AlignmentParameters, MatchMatrix, is_gap_penalty_line
+from matrices import NAMED_MATRICES
+
+# bump when the file layout changes so old entries are ignored
+CACHE_VERSION = 1
+
+
+def file_digest(input_file):
+    """
+    Returns the hex sha256 digest of a file's contents
+    """
+    h = hashlib.sha256()
+    with open(input_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def matrix_file(input_file):
+    """
+    Returns the substitution matrix file an input file names in place of its alphabets and match scores,
+    None if it lists them or names a built-in matrix (see load_scoring_from_string)
+    """
+    with open(input_file, "r") as f:
+        lines = list(islice((ln.strip() for ln in f if ln.strip()), 5))
+
+    # the matrix line follows the mode and the gap penalties, which a scoring-only file has first
+    index = 2 if len(lines) > 1 and is_gap_penalty_line(lines[1]) else 4
+    if index >= len(lines) or lines[index].isdigit() or lines[index].upper() in NAMED_MATRICES:
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(input_file)), lines[index])
+
+
+def cache_path(cache_dir, input_file):
+    """
+    Returns the cache file for an input file, keyed by its contents and those of its matrix file
+    """
+    digest = file_digest(input_file)
+    matrix_path = matrix_file(input_file)
+    if matrix_path is not None and os.path.exists(matrix_path):
+        digest = hashlib.sha256(f"{digest}:{file_digest(matrix_path)}".encode()).hexdigest()
+    return os.path.join(cache_dir, f"params-v{CACHE_VERSION}-{digest}.bin")
+
+
+def save_params(params, path):
+    """
+    Writes parsed parameters to a cache file, through a temporary file so readers never see a partial one
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        header = {"seq_a": params.seq_a, "seq_b": params.seq_b, "global_alignment": params.global_alignment,
+                  "gaps": [params.dx, params.ex, params.dy, params.ey],
+                  "alphabet_a": params.alphabet_a, "alphabet_b": params.alphabet_b,
+                  "letters_a": "".join(params.match_matrix.index_a), "letters_b": "".join(params.match_matrix.index_b)}
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(np.ascontiguousarray(params.match_matrix.scores, dtype=np.float64).tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_params(path):
+    """
+    Builds an AlignmentParameters object from a cache file
+    """
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        scores = np.frombuffer(f.read(), dtype=np.float64)
+
+    params = AlignmentParameters()
+    params.global_alignment = header["global_alignment"]
+    params.local_alignment = not params.global_alignment
+    params.dx, params.ex, params.dy, params.ey = header["gaps"]
+    params.alphabet_a, params.alphabet_b = header["alphabet_a"], header["alphabet_b"]
+    params.len_alphabet_a, params.len_alphabet_b = len(params.alphabet_a), len(params.alphabet_b)
+
+    # letter codes follow the order letters were added to the match matrix
+    match_matrix = MatchMatrix(header["letters_a"], header["letters_b"])
+    match_matrix.scores = scores.reshape(len(header["letters_a"]), len(header["letters_b"])).copy()
+    params.match_matrix = match_matrix
+    params.set_sequences(header["seq_a"], header["seq_b"])
+    return params
+
+
+def load_params_cached(input_file, cache_dir):
+    """
+    Loads the parameters of an input file, from the cache if it has been parsed before
+
+    Inputs:
+       input_file = specially formatted alignment input file
+       cache_dir = directory of the cache, created if needed
+    Returns:
+       (params, hit) the AlignmentParameters and whether they came from the cache
+    """
+    path = cache_path(cache_dir, input_file)
+    if os.path.exists(path):
+        return read_params(path), True
+
+    params = AlignmentParameters()
+    params.load_params_from_file(input_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    save_params(params, path)
+    return params, False
@@ -0,0 +1,264 @@
+"""
+Persistent cache of alignment results, in front of Align.align().
+
+Pipelines keep re-aligning the same pairs with the same parameters. An entry of this cache holds the score, the
+complete output of one alignment and what else the run reported (whether the optimum touched the band edge),
+keyed by a hash of everything the output depends on: both sequences, the mode, the gap penalties and the match
+matrix (AlignmentParameters.digest), plus the options that change what is written (band, linear space,
+max_alignments, output format, top-K). The fill engine is not part of the key since every engine gives the same
+result. A hit copies the stored output to the output file without filling any matrices.
+
+Entries are files under the cache directory, named by their key. Reading an entry touches its modification time,
+so evicting the files modified longest ago is least recently used eviction, and it works across processes
+sharing the directory. Once the entries outgrow the size budget, the oldest are removed until they fit in
+EVICT_TO of it. Hits, misses, stores and evictions are counted per ResultCache object and also added up in
+counters.json in the cache directory, across every run that used it; a lookup only counts in memory, the counts
+go to counters.json on the next store, eviction or close.
+
+To see how a cache is doing:
+  python result_cache.py cache_dir
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+# bump when the entry layout changes so old entries are ignored
+CACHE_VERSION = 2
+
+# default size budget, and the fraction of it an eviction brings the cache down to
+DEFAULT_MAX_BYTES = 1 << 30
+EVICT_TO = 0.9
+
+COUNTERS = ("hits", "misses", "stores", "evictions")
+
+
+def result_key(params, options):
+    """
+    Returns the hex key of an alignment
+
+    Inputs:
+       params = AlignmentParameters with the sequences set
+       options = dict of the Align options that change the output
+    """
+    return params.digest(f"result-v{CACHE_VERSION}:" + json.dumps(options, sort_keys=True))
+
+
+class ResultCache(object):
+    """
+    Object to read and write alignment results in a cache directory with a size budget
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Input:
+            cache_dir = directory of the cache, created if needed
+            max_bytes = size budget of the entries
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+
+        # counts not yet added to counters.json, flushed by put, evict and close rather than on every lookup
+        self.pending = dict.fromkeys(COUNTERS, 0)
+
+        # running estimate of the size of the entries, rescanned before evicting since other processes may write
+        self.estimated_bytes = sum(size for _, size, _ in self.entries())
+
+    def entry_path(self, key):
+        """
+        Returns the file of an entry, spread over subdirectories by the first two characters of the key
+        """
+        return os.path.join(self.cache_dir, key[:2], key + ".result")
+
+    def entries(self):
+        """
+        Generator over the entries as (path, size, last use time)
+        """
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".result"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        # evicted by another process meanwhile
+                        continue
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def open(self, key):
+        """
+        Looks up an entry, counting the hit or miss
+
+        Returns:
+           (header, f) with header the dict of the score and the info stored with it, and f an open text file
+           positioned at the stored output, or None on a miss
+        """
+        path = self.entry_path(key)
+        try:
+            f = open(path, "r")
+        except FileNotFoundError:
+            self.count("misses")
+            return None
+
+        # an entry that can't be read back is as good as missing
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or "score" not in header:
+            f.close()
+            self.count("misses")
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process since the open, the open file still holds the whole entry
+            pass
+        self.count("hits")
+        return header, f
+
+    def put(self, key, score, source, info=None):
+        """
+        Stores the output of an alignment, evicting old entries if the cache grows past its budget
+
+        Inputs:
+           key = from result_key
+           score = the alignment score
+           source = text file object to read the output from
+           info = dict of anything else to give back with the score on a hit, JSON serializable
+        """
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # through a temporary file so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(json.dumps(dict(info or {}, score=float(score))) + "\n")
+                shutil.copyfileobj(source, f)
+            size = os.path.getsize(tmp_path)
+            if size > self.max_bytes:
+                # would push everything else out and still not fit
+                os.remove(tmp_path)
+                return
+
+            # storing a key again replaces its entry, whose size no longer counts
+            try:
+                old_size = os.path.getsize(path)
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.count("stores")
+        self.estimated_bytes += size - old_size
+        if self.estimated_bytes > self.max_bytes:
+            self.evict()
+        self.flush()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is within EVICT_TO of its budget
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.estimated_bytes = total
+        if evicted:
+            self.count("evictions", evicted)
+        self.flush()
+
+    def count(self, counter, n=1):
+        """
+        Adds to a counter of this object, and to the counts the next flush adds to counters.json
+        """
+        self.counts[counter] += n
+        self.pending[counter] += n
+
+    def flush(self):
+        """
+        Adds the pending counts to the running totals in counters.json
+        """
+        if not any(self.pending.values()):
+            return
+        path = os.path.join(self.cache_dir, "counters.json")
+        with open(path, "a+") as f:
+            # serialize the read-modify-write between processes where file locks are available
+            try:
+                import fcntl
+                fcntl.flock(f, fcntl.LOCK_EX)
+            except ImportError:
+                pass
+            f.seek(0)
+            text = f.read()
+            totals = json.loads(text) if text.strip() else {}
+            for counter, n in self.pending.items():
+                totals[counter] = totals.get(counter, 0) + n
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(totals))
+        self.pending = dict.fromkeys(COUNTERS, 0)
+
+    def close(self):
+        """
+        Flushes the pending counts, the object can still be used afterwards
+        """
+        self.flush()
+
+    def stats(self):
+        """
+        Returns the counters of this object, the totals over every run, and the size of the cache
+        """
+        self.flush()
+        path = os.path.join(self.cache_dir, "counters.json")
+        totals = dict.fromkeys(COUNTERS, 0)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                text = f.read()
+            totals.update(json.loads(text) if text.strip() else {})
+        entries = list(self.entries())
+        lookups = totals["hits"] + totals["misses"]
+        return {"session": dict(self.counts), "total": totals,
+                "hit_rate": totals["hits"] / lookups if lookups else None,
+                "entries": len(entries), "bytes": sum(size for _, size, _ in entries), "max_bytes": self.max_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the counters and size of an alignment result cache.")
+    parser.add_argument("cache_dir")
+    parser.add_argument("--clear", action="store_true", help="remove every entry and reset the counters")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.cache_dir):
+        sys.exit(f"{args.cache_dir} is not a directory")
+    cache = ResultCache(args.cache_dir)
+    if args.clear:
+        for path, _, _ in list(cache.entries()):
+            os.remove(path)
+        counters = os.path.join(args.cache_dir, "counters.json")
+        if os.path.exists(counters):
+            os.remove(counters)
+    stats = cache.stats()
+    del stats["session"], stats["max_bytes"]
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Seed and extend search: a k-mer index over a set of targets, so the full alignment only runs where it can matter.
+
+Building the index lists every k-mer of every target with where it occurs; it is built once and saved to disk.
+A search looks up the k-mers of the query, which gives the diagonals (target position - query position) that
+share seeds with it. Each seed is extended along its diagonal without gaps until the running score drops more
+than xdrop below the best seen (X-drop), and only the extended segments go on to a banded local alignment with
+Align, in a window of the query and target around the segment with the band centred on the seed diagonal.
+
+To run:
+  python seed_index.py build targets.txt targets.npz -k 8
+  python seed_index.py search targets.npz query.input --xdrop 20 --band 16
+where targets.txt has one sequence per line and the query and scoring come from an align.py input file.
+"""
+import copy
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+from align import Align, AlignmentParameters
+
+# defaults for the search: k-mer length, X-drop cutoff, band either side of the seed diagonal,
+# and the extra sequence kept around an extended segment for the gapped alignment
+DEFAULT_K = 8
+DEFAULT_XDROP = 20.0
+DEFAULT_BAND = 16
+DEFAULT_MARGIN = 32
+
+
+class SeedHit(object):
+    """
+    Object to hold one gapped alignment found around a seed diagonal, coordinates are 1-based and inclusive
+    like the matrix rows (query) and columns (target)
+    """
+
+    def __init__(self, target, diagonal, seeds, score, query_range, target_range, align):
+        self.target = target
+        self.diagonal = diagonal
+        self.seeds = seeds
+        self.score = score
+        self.query_range = query_range
+        self.target_range = target_range
+        self.align = align
+
+    def __repr__(self):
+        return (f"SeedHit(target={self.target}, score={self.score}, query={self.query_range}, "
+                f"target_range={self.target_range}, diagonal={self.diagonal}, seeds={self.seeds})")
+
+
+class SeedIndex(object):
+    """
+    Object to hold the k-mer index of a set of target sequences
+    """
+
+    def __init__(self, targets, k=DEFAULT_K):
+        """
+        Input:
+            targets = list of target sequences
+            k = seed length
+        """
+        if k < 1:
+            raise ValueError(f"Seed length has to be at least 1, got {k}")
+        self.k = k
+        self.targets = list(targets)
+
+        # k-mer -> array of (target, position) occurrences
+        occurrences = defaultdict(list)
+        for t, target in enumerate(self.targets):
+            for pos in range(len(target) - k + 1):
+                occurrences[target[pos:pos + k]].append((t, pos))
+        self.kmers = {kmer: np.array(hits, dtype=np.int64) for kmer, hits in occurrences.items()}
+
+    def save(self, index_file):
+        """
+        Saves the index as a NumPy archive: the sorted k-mers, offsets into one flat occurrence table, and the targets
+        laid out the same way, as offsets into their concatenated UTF-8 bytes (a string array would pad every
+        target to the longest one)
+        """
+        kmers = sorted(self.kmers)
+        counts = [len(self.kmers[kmer]) for kmer in kmers]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        table = np.concatenate([self.kmers[kmer] for kmer in kmers]) if kmers else np.zeros((0, 2), dtype=np.int64)
+        encoded = [target.encode() for target in self.targets]
+        target_offsets = np.concatenate([[0], np.cumsum([len(target) for target in encoded])]).astype(np.int64)
+        np.savez_compressed(index_file, k=self.k, kmers=np.array(kmers, dtype=str), offsets=offsets,
+                            occurrences=table, target_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                            target_offsets=target_offsets)
+
+    def seed_diagonals(self, query):
+        """
+        Finds the diagonals shared seeds lie on.
+
+        Inputs:
+           query = the query sequence
+        Returns:
+           dict of (target, diagonal) -> sorted list of query positions of the seeds on it, where the diagonal is
+           target position - query position
+        """
+        diagonals = defaultdict(list)
+        for qpos in range(len(query) - self.k + 1):
+            hits = self.kmers.get(query[qpos:qpos + self.k])
+            if hits is None:
+                continue
+            for t, tpos in hits.tolist():
+                diagonals[(t, tpos - qpos)].append(qpos)
+        return diagonals
+
+    def search(self, align_params, query, xdrop=DEFAULT_XDROP, band=DEFAULT_BAND, margin=DEFAULT_MARGIN,
+               min_seeds=1, min_extension_score=None, engine="wavefront"):
+        """
+        Seeds, extends and aligns the query against the indexed targets.
+
+        Inputs:
+           align_params = AlignmentParameters with the gap penalties and match matrix to score with
+           query = the query sequence (rows, alphabet A), the targets are the columns (alphabet B)
+           xdrop = stop an ungapped extension once it falls this far below its best score
+           band = band of the gapped alignment either side of the seed diagonal
+           margin = sequence kept either side of an extended segment for the gapped alignment
+           min_seeds = only extend diagonals with at least this many seeds
+           min_extension_score = only align around ungapped segments scoring at least this, None for all
+           engine = fill engine for Align
+        Returns:
+           list of SeedHit, best score first
+        """
+        match_matrix = align_params.match_matrix
+        query_codes = match_matrix.encode_a(query)
+        hits = []
+
+        # extend every seed on each diagonal, skipping seeds already inside an extended segment
+        segments = defaultdict(list)
+        for (t, diagonal), qpositions in self.seed_diagonals(query).items():
+            if len(qpositions) < min_seeds:
+                continue
+            target_codes = match_matrix.encode_b(self.targets[t])
+            covered_to = -1
+            for qpos in qpositions:
+                if qpos < covered_to:
+                    continue
+                score, q_start, q_end = self.extend(match_matrix.scores, query_codes, target_codes, qpos, diagonal, xdrop)
+                covered_to = q_end
+                if min_extension_score is not None and score < min_extension_score:
+                    continue
+                segments[t].append((score, q_start, q_end, diagonal, len(qpositions)))
+
+        for t, target_segments in segments.items():
+            # best segment first, a segment next to an already aligned one would give the same alignment
+            aligned = []
+            for score, q_start, q_end, diagonal, seeds in sorted(target_segments, key=lambda s: (-s[0], s[1])):
+                if any(abs(diagonal - d) <= band and q_start < e and s < q_end for s, e, d in aligned):
+                    continue
+                aligned.append((q_start, q_end, diagonal))
+                hit = self.align_window(align_params, query, t, diagonal, q_start, q_end, band, margin, engine)
+                hit.seeds = seeds
+                hits.append(hit)
+
+        hits.sort(key=lambda hit: (-hit.score, hit.target, hit.query_range))
+        return hits
+
+    def extend(self, match_scores, query_codes, target_codes, qpos, diagonal, xdrop):
+        """
+        Ungapped X-drop extension of a seed in both directions along its diagonal.
+
+        Returns:
+           (score, q_start, q_end) the best scoring ungapped segment, as a half-open range of query positions
+        """
+        # scores of every position on the diagonal that lies in both sequences
+        lo = max(0, -diagonal)
+        hi = min(len(query_codes), len(target_codes) - diagonal)
+        scores = match_scores[query_codes[lo:hi], target_codes[lo + diagonal:hi + diagonal]].tolist()
+        seed_lo = qpos - lo
+        seed_hi = min(qpos + self.k, hi) - lo
+
+        def run(steps):
+            # best cumulative score along steps and the number of steps to reach it, stopping at the X-drop
+            total, best, best_len = 0.0, 0.0, 0
+            for n, s in enumerate(steps, start=1):
+                total += s
+                if total > best:
+                    best, best_len = total, n
+                elif total < best - xdrop:
+                    break
+            return best, best_len
+
+        seed_score = sum(scores[seed_lo:seed_hi])
+        right, right_len = run(scores[seed_hi:])
+        left, left_len = run(reversed(scores[:seed_lo]))
+        return seed_score + left + right, lo + seed_lo - left_len, lo + seed_hi + right_len
+
+    def align_window(self, align_params, query, t, diagonal, q_start, q_end, band, margin, engine):
+        """
+        Runs a banded local alignment in a window around an extended segment, with the window placed so the
+        seed diagonal is the main diagonal of the window's matrix
+
+        Returns:
+           a SeedHit with the coordinates mapped back to the full query and target
+        """
+        target = self.targets[t]
+        win_q = max(0, -diagonal, q_start - margin)
+        win_t = win_q + diagonal
+        q_stop = min(len(query), q_end + margin)
+        t_stop = min(len(target), q_end + diagonal + margin)
+
+        params = copy.copy(align_params)
+        params.local_alignment, params.global_alignment = True, False
+        params.set_sequences(query[win_q:q_stop], target[win_t:t_stop])
+
+        align = Align.from_params(params, "", engine=engine, band=band)
+        align.populate_score_matrices()
+        align.max_score, align.max_loc = align.find_traceback_start()
+
+        # both ends come from one optimal path, the pointers run from the end back to the start; with a tied
+        # maximum the path may end at any of the max locations
+        path = next(align.iter_paths(), None)
+        if path:
+            start, end = (path[-1].row, path[-1].col), (path[0].row, path[0].col)
+        else:
+            start = end = min(align.max_loc)
+        return SeedHit(t, diagonal, 0, align.max_score,
+                       (start[0] + win_q, end[0] + win_q), (start[1] + win_t, end[1] + win_t), align)
+
+
+def load_index(index_file):
+    """
+    Loads an index saved with SeedIndex.save
+    """
+    with np.load(index_file) as data:
+        index = SeedIndex([], k=int(data["k"]))
+        target_bytes = data["target_bytes"].tobytes()
+        target_offsets = data["target_offsets"].tolist()
+        index.targets = [target_bytes[start:end].decode() for start, end in zip(target_offsets, target_offsets[1:])]
+        offsets = data["offsets"]
+        occurrences = data["occurrences"]
+        index.kmers = {kmer: occurrences[offsets[n]:offsets[n + 1]] for n, kmer in enumerate(data["kmers"].tolist())}
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed and extend search with a k-mer index over a set of targets.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="build an index from a file of targets, one sequence per line")
+    build.add_argument("targets_file")
+    build.add_argument("index_file")
+    build.add_argument("-k", type=int, default=DEFAULT_K, help=f"seed length (default: {DEFAULT_K})")
+
+    search = commands.add_parser("search", help="search a saved index with the query of an align.py input file")
+    search.add_argument("index_file")
+    search.add_argument("input_file", help="align.py input file, sequence A is the query and the scoring is reused")
+    search.add_argument("--xdrop", type=float, default=DEFAULT_XDROP,
+                        help=f"X-drop cutoff for the ungapped extension (default: {DEFAULT_XDROP})")
+    search.add_argument("--band", type=int, default=DEFAULT_BAND,
+                        help=f"band either side of the seed diagonal (default: {DEFAULT_BAND})")
+    search.add_argument("--margin", type=int, default=DEFAULT_MARGIN,
+                        help=f"sequence kept around an extended segment (default: {DEFAULT_MARGIN})")
+    search.add_argument("--min-seeds", type=int, default=1, help="seeds needed on a diagonal (default: 1)")
+    search.add_argument("--min-extension-score", type=float, default=None,
+                        help="only align around ungapped segments scoring at least this")
+    search.add_argument("--top", type=int, default=10, help="number of hits to report (default: 10)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        with open(args.targets_file, "r") as f:
+            targets = [line.strip() for line in f if line.strip()]
+        SeedIndex(targets, k=args.k).save(args.index_file)
+        return
+
+    align_params = AlignmentParameters()
+    align_params.load_params_from_file(args.input_file)
+    index = load_index(args.index_file)
+    hits = index.search(align_params, align_params.seq_a, xdrop=args.xdrop, band=args.band,
+                        margin=args.margin, min_seeds=args.min_seeds,
+                        min_extension_score=args.min_extension_score)
+    print("target\tscore\tquery_start\tquery_end\ttarget_start\ttarget_end\tseeds")
+    for hit in hits[:args.top]:
+        print(f"{hit.target}\t{hit.score}\t{hit.query_range[0]}\t{hit.query_range[1]}\t"
+              f"{hit.target_range[0]}\t{hit.target_range[1]}\t{hit.seeds}")
+
+
+if __name__ == "__main__":
+    main()
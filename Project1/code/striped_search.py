@@ -0,0 +1,203 @@
+"""
+One query against many targets: score-only local alignment for screening.
+
+For a database style search we align the same query against thousands of targets with the same scoring, and
+only need the best local score and where it ends for most of them. This scorer builds a query profile from the
+MatchMatrix once (the score of every query position against every target letter), then runs the affine gap
+Smith-Waterman recursion for a whole batch of targets at a time: each query row is one set of NumPy operations
+over a (targets x columns) block. Only the previous row of M, Ix and Iy is kept, so memory is linear in the
+batch size times the longest target.
+
+The horizontal gap matrix Iy is the only part of a row that depends on the row itself. Striped implementations
+fix it up with a "lazy F" loop; here it is computed directly as a running maximum along the row, since with a
+linear extension penalty Iy[j] = max over k < j of M[k] - dx - ex * (j - 1 - k).
+
+Scores use the same model as Align in local mode (zero floor on M, Ix and Iy, no end gap penalties) and are
+rounded the same way, so they match what align.py reports. Full co-optimal tracebacks are only computed for
+the hits asked for, through align_hit().
+
+To run:
+  python striped_search.py query.input targets.txt --top 10
+where the query and scoring come from an align.py input file and targets.txt has one sequence per line.
+"""
+import os
+import copy
+import argparse
+
+import numpy as np
+
+from align import Align, AlignmentParameters
+
+# number of targets scored together, bounds memory to a few (batch x longest target) blocks
+DEFAULT_BATCH_SIZE = 256
+
+
+class StripedSearch(object):
+    """
+    Object to score one query against many targets with score-only local alignment
+    """
+
+    def __init__(self, align_params, query, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Input:
+            align_params = AlignmentParameters with the gap penalties and the match matrix
+            query = the query sequence, letters from alphabet A (the rows)
+            batch_size = number of targets scored together
+        """
+        if min(align_params.ex, align_params.ey) < 0:
+            raise ValueError("Gap extension penalties have to be non-negative")
+        self.align_params = align_params
+        self.query = query
+        self.batch_size = batch_size
+        self.dx, self.ex = align_params.dx, align_params.ex
+        self.dy, self.ey = align_params.dy, align_params.ey
+
+        # query profile: row i holds the score of query letter i against every target letter code,
+        # plus a padding code at the end that can never match
+        match_scores = align_params.match_matrix.scores
+        query_codes = align_params.match_matrix.encode_a(query)
+        self.pad_code = match_scores.shape[1]
+        self.profile = np.full((len(query), self.pad_code + 1), -np.inf)
+        self.profile[:, :-1] = match_scores[query_codes]
+
+    def score_targets(self, targets):
+        """
+        Scores every target against the query.
+
+        Inputs:
+           targets = list of target sequences, letters from alphabet B (the columns)
+        Returns:
+           (scores, ends) where scores[k] is the best local score for targets[k] rounded like Align, and
+           ends[k] is the (row, col) M cell it ends in (the first in row major order if tied, (0, 0) when
+           nothing scores above zero)
+        """
+        scores = np.zeros(len(targets))
+        ends = [(0, 0)] * len(targets)
+
+        # similar lengths together keep the padding down
+        order = sorted(range(len(targets)), key=lambda k: len(targets[k]))
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            batch_scores, batch_ends = self.score_batch([targets[k] for k in batch])
+            for k, score, end in zip(batch, batch_scores, batch_ends):
+                scores[k] = round(float(score), 1)
+                ends[k] = end
+        return scores, ends
+
+    def score_batch(self, targets):
+        """
+        Runs the score-only recursion for one batch of targets, padded to the longest
+
+        Returns:
+           (scores, ends) with the unrounded best score and end cell of each target
+        """
+        match_matrix = self.align_params.match_matrix
+        width = max((len(target) for target in targets), default=0)
+        codes = np.full((len(targets), width), self.pad_code, dtype=np.intp)
+        for k, target in enumerate(targets):
+            codes[k, :len(target)] = match_matrix.encode_b(target)
+
+        # previous row of each matrix over columns 0..width, row 0 and column 0 are zero
+        prev_m = np.zeros((len(targets), width + 1))
+        prev_ix = np.zeros_like(prev_m)
+        prev_iy = np.zeros_like(prev_m)
+        steps = self.ex * np.arange(width)
+
+        best = np.zeros(len(targets))
+        end_row = np.zeros(len(targets), dtype=np.intp)
+        end_col = np.zeros(len(targets), dtype=np.intp)
+        epsilon = 10**(-6)
+
+        for row in range(1, len(self.query) + 1):
+            # M: diagonal step from the best of the three matrices, padding columns score -inf and floor to 0
+            cur_m = np.zeros_like(prev_m)
+            diag = np.maximum(np.maximum(prev_m[:, :-1], prev_ix[:, :-1]), prev_iy[:, :-1])
+            cur_m[:, 1:] = np.maximum(0.0, self.profile[row - 1][codes] + diag)
+
+            # Ix: vertical step, gap in B
+            cur_ix = np.maximum(0.0, np.maximum(prev_m - self.dy, prev_ix - self.ey))
+            cur_ix[:, 0] = 0.0
+
+            # Iy: horizontal step, gap in A, as a running max of M shifted by the extension penalty
+            cur_iy = np.zeros_like(prev_m)
+            if width:
+                opened = np.maximum.accumulate(cur_m[:, :-1] + steps, axis=1)
+                cur_iy[:, 1:] = np.maximum(0.0, opened - self.dx - steps)
+
+            # keep the first row that improves on the best, and the first column in it
+            row_best = cur_m.max(axis=1)
+            better = row_best > best + epsilon
+            best[better] = row_best[better]
+            end_row[better] = row
+            end_col[better] = np.argmax(cur_m[better], axis=1)
+
+            prev_m, prev_ix, prev_iy = cur_m, cur_ix, cur_iy
+
+        return best, list(zip(end_row.tolist(), end_col.tolist()))
+
+    def align_hit(self, target, output_file="", engine="wavefront", max_alignments=None):
+        """
+        Runs the full local alignment of the query against one selected target.
+
+        Inputs:
+           target = the target sequence
+           output_file = if given, the score and alignments are written there in the align.py format
+           engine, max_alignments = passed on to Align
+        Returns:
+           the Align object with its matrices filled and max_score / max_loc set
+        """
+        # the scoring is shared with the search, only the mode and the sequences change
+        params = copy.copy(self.align_params)
+        params.local_alignment, params.global_alignment = True, False
+        params.set_sequences(self.query, target)
+
+        align = Align.from_params(params, output_file, engine=engine, max_alignments=max_alignments)
+        align.populate_score_matrices()
+        align.max_score, align.max_loc = align.find_traceback_start()
+        if output_file:
+            align.paths = align.iter_paths()
+            align.write_output()
+        return align
+
+
+def read_targets(targets_file):
+    """
+    Reads one target sequence per line, skipping blank lines
+    """
+    with open(targets_file, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score one query against many targets with local alignment.")
+    parser.add_argument("input_file", help="align.py input file, sequence A is the query and the scoring is reused")
+    parser.add_argument("targets_file", help="file with one target sequence per line")
+    parser.add_argument("--top", type=int, default=10, help="number of best hits to report (default: 10)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"targets scored together (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--align-top", type=int, default=0,
+                        help="write full alignments for this many of the best hits")
+    parser.add_argument("--out-dir", default=".", help="directory for the --align-top alignments")
+    args = parser.parse_args()
+
+    align_params = AlignmentParameters()
+    align_params.load_params_from_file(args.input_file)
+    targets = read_targets(args.targets_file)
+
+    search = StripedSearch(align_params, align_params.seq_a, batch_size=args.batch_size)
+    scores, ends = search.score_targets(targets)
+
+    # best first, ties in target order
+    ranked = sorted(range(len(targets)), key=lambda k: (-scores[k], k))[:args.top]
+    print("target\tscore\tend_row\tend_col")
+    for k in ranked:
+        print(f"{k}\t{scores[k]}\t{ends[k][0]}\t{ends[k][1]}")
+
+    if args.align_top:
+        os.makedirs(args.out_dir, exist_ok=True)
+        for k in ranked[:args.align_top]:
+            search.align_hit(targets[k], os.path.join(args.out_dir, f"hit_{k}.output"))
+
+
+if __name__ == "__main__":
+    main()
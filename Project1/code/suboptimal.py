@@ -0,0 +1,133 @@
+"""
+Top-K non-overlapping local alignments (Waterman-Eggert) for align.py.
+
+find_traceback_start only reports the cells tied for the single best score, so a second copy of a domain or a
+repeat never shows up. Waterman and Eggert's declumping gives the next best alignments instead: after reporting
+an alignment, every pair of letters it aligns (its M cells) is forbidden, ie. set to 0 like a local alignment
+restart, and the matrices are recomputed. Any later alignment then has to avoid those pairs, so no two reported
+alignments align the same pair of letters.
+
+Forbidding cells only changes the matrices below and to the right of them, and usually only close by: a cell
+has to be recomputed only if one of its three predecessors changed. The recomputation goes row by row from the
+first forbidden cell and stops as soon as a row has no changes, so K alignments cost about one fill plus the
+area around each reported alignment, rather than K fills.
+"""
+
+
+class WatermanEggert(object):
+    """
+    Object to pull successive non-overlapping local alignments out of filled local alignment matrices
+    """
+
+    def __init__(self, align):
+        """
+        Input:
+            align = an Align object whose full (not banded) local alignment matrices are filled in
+        """
+        if not align.align_params.local_alignment:
+            raise ValueError("Top-K alignments are only defined for local alignment")
+        if hasattr(align.m_matrix, "band"):
+            raise ValueError("Top-K alignments need the full matrices, not a band")
+        self.align = align
+        self.forbidden = set()
+
+        # the recursion for M is replaced by 0 at forbidden cells, Ix and Iy are unchanged
+        self.matrices = (align.m_matrix, align.ix_matrix, align.iy_matrix)
+
+    def alignments(self, k):
+        """
+        Generator over up to k alignments, best first, each avoiding every letter pair aligned before it
+
+        Yields:
+           (score, path) with path in the format of Align.iter_paths(), from the end back to the start
+        """
+        for _ in range(k):
+            score, loc = self.best_cell()
+            if score <= 0:
+                return
+            path = self.traceback(loc)
+            yield score, path
+            self.forbid(path)
+
+    def best_cell(self):
+        """
+        Returns (score, (row, col)) of the best M cell left, the first in row major order if tied
+        """
+        score, locs = self.align.find_traceback_start()
+        return score, min(locs)
+
+    def traceback(self, loc):
+        """
+        Returns one optimal path ending in M at loc
+        """
+        max_loc = self.align.max_loc
+        self.align.max_loc = {loc}
+        try:
+            return next(self.align.iter_paths())
+        finally:
+            self.align.max_loc = max_loc
+
+    def forbid(self, path):
+        """
+        Forbids the letter pairs aligned along a path and recomputes the cells that depend on them
+        """
+        cells = set((ptr.row, ptr.col) for ptr in path if ptr.name == "M" and ptr.row > 0 and ptr.col > 0)
+        self.forbidden |= cells
+        self.recompute(cells)
+
+    def cell_state(self, row, col):
+        """
+        Returns the scores and pointer bits of M, Ix and Iy at a cell, to tell whether recomputing changed it
+        """
+        return tuple((m.get_score(row, col), m.get_pointer_bits(row, col)) for m in self.matrices)
+
+    def update(self, row, col):
+        """
+        Recomputes one cell, with M pinned to 0 and no pointers at a forbidden cell
+        """
+        align = self.align
+        if (row, col) in self.forbidden:
+            align.m_matrix.set_score(row, col, 0.0)
+            align.m_matrix.set_pointers(row, col, [])
+        else:
+            align.update_m(row, col)
+        align.update_ix(row, col)
+        align.update_iy(row, col)
+
+    def recompute(self, cells):
+        """
+        Recomputes the cells affected by newly forbidden cells, row by row, stopping once a row has no changes
+
+        Inputs:
+           cells = the newly forbidden (row, col) cells
+        """
+        nrow, ncol = self.align.m_matrix.nrow, self.align.m_matrix.ncol
+        forced_by_row = {}
+        for row, col in cells:
+            forced_by_row.setdefault(row, set()).add(col)
+        last_forced_row = max(forced_by_row)
+
+        changed_above = set()
+        row = min(forced_by_row)
+        while row < nrow and (changed_above or row <= last_forced_row):
+            forced = forced_by_row.get(row, set())
+            sources = changed_above | forced
+            if not sources:
+                row += 1
+                continue
+
+            # a cell depends on the cells up, up-left and left of it, so past the last change above (plus one
+            # column for the diagonal) nothing can change unless the cell to the left just did
+            reach = max(sources) + 1
+            changed = set()
+            for col in range(min(sources), ncol):
+                if not (col in sources or col - 1 in changed_above or col - 1 in changed):
+                    if col > reach:
+                        break
+                    continue
+                before = self.cell_state(row, col)
+                self.update(row, col)
+                if self.cell_state(row, col) != before:
+                    changed.add(col)
+            changed_above = changed
+            row += 1
@@ -0,0 +1,172 @@
+"""
+Gap penalty sweep: aligns the pair of one input file under a grid of gap penalties and modes.
+
+Re-running a pair under other gap settings (eg. quiz2_human_chimp.output vs quiz2_human_chimp_penalty5.output)
+used to take an input file, a parse and a process per setting. Here the input file is parsed once: the sequences
+are encoded and the match matrix built a single time, and every grid point is a shallow copy of those parameters
+with its own mode and gap penalties, so the sequences, their codes and the match matrix are shared. The grid
+points go to a pool of worker processes that receive the parsed parameters once, when they start.
+
+The grid is every combination of the given modes and dx, ex, dy, ey values; any of them not given keeps its value
+from the input file, and --symmetric ties dy to dx and ey to ex instead. The result is one tab separated table of
+the score of each grid point, with the alignments of each point written to a directory if one is given.
+
+To run:
+  python sweep.py ../quiz_input/quiz2_human_chimp.input --dx 1 5 --ex 0 1 --symmetric -j 4
+  python sweep.py pair.input --modes local global --dx 3 --ex 1 --alignments-dir sweep_out --summary sweep.tsv
+"""
+import os
+import sys
+import copy
+import time
+import argparse
+import itertools
+
+from align import Align, AlignmentParameters, ENGINES
+from batch_align import run_tasks, worker_state
+from fasta_align import output_name
+
+MODES = ("local", "global")
+
+# columns of a grid point, followed in the summary by the results
+POINT_FIELDS = ("mode", "dx", "ex", "dy", "ey")
+SUMMARY_FIELDS = POINT_FIELDS + ("score", "seconds", "output")
+
+
+def grid_points(params, modes=None, dx=None, ex=None, dy=None, ey=None, symmetric=False):
+    """
+    Returns the grid points of a sweep
+
+    Inputs:
+       params = AlignmentParameters of the input file, giving the mode and penalties that aren't swept
+       modes = list of modes from MODES, dx, ex, dy, ey = lists of penalties, None keeps the one in params
+       symmetric = use the dx and ex values for dy and ey
+    Returns:
+       a list of (mode, dx, ex, dy, ey) tuples
+    """
+    modes = modes or ["global" if params.global_alignment else "local"]
+    opens = dx or [params.dx]
+    extends = ex or [params.ex]
+    if symmetric:
+        return [(mode, d, e, d, e) for mode, d, e in itertools.product(modes, opens, extends)]
+    return list(itertools.product(modes, opens, extends, dy or [params.dy], ey or [params.ey]))
+
+
+def point_params(params, point):
+    """
+    Returns a copy of params with the mode and gap penalties of a grid point, sharing the sequences, their codes
+    and the match matrix with params
+    """
+    mode, dx, ex, dy, ey = point
+    point_params = copy.copy(params)
+    point_params.global_alignment = mode == "global"
+    point_params.local_alignment = not point_params.global_alignment
+    point_params.dx, point_params.ex, point_params.dy, point_params.ey = dx, ex, dy, ey
+    return point_params
+
+
+def point_output_name(point):
+    """
+    Returns the name of the alignment output file of a grid point, named like a fasta_align pair with the mode
+    and the penalties as the two names, eg. local+dx3.0_ex1.0_dy3.0_ey1.0.output. The penalties are written in
+    full precision, so distinct grid points never share a file.
+    """
+    mode, dx, ex, dy, ey = point
+    return output_name(mode, "_".join(f"{name}{float(value)!r}" for name, value in zip(POINT_FIELDS[1:], point[1:])))
+
+
+def run_point(point):
+    """
+    Aligns the pair under one grid point in a worker, which holds the parsed parameters, the alignments
+    directory and the Align options in worker_state
+
+    Returns:
+       a dict with the grid point fields, the score, the wall time and the output file (None for scores only)
+    """
+    start = time.perf_counter()
+    alignments_dir = worker_state["alignments_dir"]
+    output_file = None if alignments_dir is None else os.path.join(alignments_dir, point_output_name(point))
+    params = point_params(worker_state["params"], point)
+    align = Align.from_params(params, output_file or "", **worker_state["align_options"])
+    if output_file is not None:
+        align.align()
+    else:
+        # the score only needs the fill and the traceback start
+        align.populate_score_matrices()
+        align.max_score, align.max_loc = align.find_traceback_start()
+    result = dict(zip(POINT_FIELDS, point))
+    result.update(score=float(align.max_score), seconds=time.perf_counter() - start, output=output_file)
+    return result
+
+
+def sweep(params, points, workers=None, alignments_dir=None, **align_options):
+    """
+    Aligns one pair under every grid point.
+
+    Inputs:
+       params = AlignmentParameters with the sequences set, parsed once for the whole sweep
+       points = list of (mode, dx, ex, dy, ey) grid points, see grid_points
+       workers = worker processes, see batch_align.run_tasks
+       alignments_dir = directory to write an align.py output file per grid point to, None for scores only
+       align_options = keyword arguments passed on to Align
+    Returns:
+       a list of run_point results in the order of points
+    """
+    if alignments_dir is not None:
+        os.makedirs(alignments_dir, exist_ok=True)
+    state = dict(params=params, alignments_dir=alignments_dir, align_options=align_options)
+    return run_tasks(run_point, list(points), workers, state)
+
+
+def write_summary(results, f):
+    """
+    Writes the results of a sweep to an open file as a tab separated table with a header line
+    """
+    f.write("\t".join(SUMMARY_FIELDS) + "\n")
+    for result in results:
+        row = [result["mode"]] + [f"{result[field]:g}" for field in ("dx", "ex", "dy", "ey", "score")]
+        row += [f"{result['seconds']:.3f}", result["output"] or "-"]
+        f.write("\t".join(row) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align the pair of one input file under a grid of gap penalties.")
+    parser.add_argument("input_file", help="align.py input file, its mode and penalties are the defaults")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=None,
+                        help="modes to sweep (default: the one in the input file)")
+    for name, what in [("dx", "open gap penalties in A"), ("ex", "extend gap penalties in A"),
+                       ("dy", "open gap penalties in B"), ("ey", "extend gap penalties in B")]:
+        parser.add_argument(f"--{name}", nargs="+", type=float, default=None,
+                            help=f"{what} to sweep (default: the one in the input file)")
+    parser.add_argument("--symmetric", action="store_true",
+                        help="use the --dx and --ex values for dy and ey too")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--engine", choices=ENGINES, default="wavefront",
+                        help="fill engine for the score matrices (default: wavefront)")
+    parser.add_argument("--alignments-dir", default=None,
+                        help="also write the alignments of every grid point to this directory")
+    parser.add_argument("--max-alignments", type=int, default=None,
+                        help="stop after writing this many distinct alignments per grid point")
+    parser.add_argument("--summary", default=None,
+                        help="write the table to this file instead of stdout")
+    args = parser.parse_args()
+    if args.symmetric and (args.dy or args.ey):
+        parser.error("--symmetric takes dy and ey from --dx and --ex, drop --dy and --ey")
+
+    # parse and encode once for the whole grid
+    params = AlignmentParameters()
+    params.load_params_from_file(args.input_file)
+    points = grid_points(params, args.modes, args.dx, args.ex, args.dy, args.ey, args.symmetric)
+
+    results = sweep(params, points, workers=args.workers, alignments_dir=args.alignments_dir,
+                    engine=args.engine, max_alignments=args.max_alignments)
+    if args.summary is None:
+        write_summary(results, sys.stdout)
+    else:
+        with open(args.summary, "w") as f:
+            write_summary(results, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Multi-core tiled fill of the score matrices for align.py (the "tiled" engine).
+
+The wavefront engine vectorizes a fill but still runs on one core. Here the matrix is cut into square tiles. A tile
+only depends on the tiles above, to the left and above-left of it, so all tiles on one anti-diagonal of tiles can
+be computed at the same time: the tile diagonals are handed to a pool of worker processes one after the other.
+Inside a tile the cells are filled one anti-diagonal at a time with fill_cells, the same code as the wavefront
+engine, so scores and pointer bits come out identical to the serial engines.
+
+M, Ix and Iy (scores and pointer bits) live in multiprocessing.shared_memory blocks for the length of the fill.
+Workers attach to them once when they start and read the boundary rows and columns of neighbouring tiles
+straight out of them, so only tile coordinates are pickled. The filled arrays are copied back into the Align
+object's matrices at the end, which needs memory for a second copy of the matrices during the fill.
+
+The shared memory and the pool are pure overhead on one core: the tiled engine only pays off for large matrices
+with several cores to spread the tiles over (compare with python benchmark.py --engine tiled). With one worker,
+or fewer tiles on every tile diagonal than workers, it falls back to the wavefront fill in this process.
+"""
+import os
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from align import fill_cells
+
+# smallest tile side the tile size is chosen from: each diagonal of a tile costs a fixed NumPy overhead, so small
+# tiles fill far fewer cells per second on each core than the wavefront engine
+MIN_TILE_SIZE = 256
+
+# by default the longer side of the matrix is cut into this many tiles per worker, enough tile diagonals to keep
+# the workers busy while keeping the tiles large
+TILES_PER_WORKER = 2
+
+# per worker process: the shared matrices and the parameters, set up by attach_shared
+worker_state = {}
+
+
+def tile_grid(start_row, nrow, ncol, band, tile_size):
+    """
+    Cuts the cells to fill into tiles.
+
+    Inputs:
+       start_row = first row to fill, rows above it are already filled
+       nrow, ncol = size of the matrices
+       band = only cells with |col - row| <= band are filled
+       tile_size = cells along each side of a tile
+    Returns:
+       list of tile diagonals, each a list of (row_lo, row_hi, col_lo, col_hi) half-open tiles that can be
+       filled at the same time once the diagonals before it are done
+    """
+    row_starts = list(range(start_row, nrow, tile_size))
+    col_starts = list(range(1, ncol, tile_size))
+    diagonals = [[] for _ in range(len(row_starts) + len(col_starts) - 1)]
+    for i, row_lo in enumerate(row_starts):
+        row_hi = min(nrow, row_lo + tile_size)
+        for j, col_lo in enumerate(col_starts):
+            col_hi = min(ncol, col_lo + tile_size)
+            # skip tiles that lie entirely outside the band
+            if col_hi - 1 < row_lo - band or col_lo > row_hi - 1 + band:
+                continue
+            diagonals[i + j].append((row_lo, row_hi, col_lo, col_hi))
+    return [tiles for tiles in diagonals if tiles]
+
+
+def fill_tile(params, m, ix, iy, tile, band):
+    """
+    Fills one tile an anti-diagonal at a time, keeping to the band
+    """
+    row_lo, row_hi, col_lo, col_hi = tile
+    for d in range(row_lo + col_lo, row_hi + col_hi - 1):
+        # rows of the tile on this diagonal with their column in the tile and the band |d - 2 * row| <= band
+        lo = max(row_lo, d - (col_hi - 1), (d - band + 1) // 2)
+        hi = min(row_hi - 1, d - col_lo, (d + band) // 2)
+        if lo > hi:
+            continue
+        rows = np.arange(lo, hi + 1)
+        fill_cells(params, m, ix, iy, rows, d - rows)
+
+
+def shared_matrix(cls, attrs, scores, pointer_bits):
+    """
+    Returns a matrix of class cls (ScoreMatrix or BandedScoreMatrix) with attributes attrs working on the
+    given arrays, without allocating its own
+    """
+    matrix = object.__new__(cls)
+    matrix.__dict__.update(attrs)
+    matrix.scores = scores
+    matrix.pointer_bits = pointer_bits
+    matrix.extra_pointers = {}
+    return matrix
+
+
+def attach_block(name):
+    """
+    Attaches to an existing shared memory block of the parent, which stays the only one to unlink it
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python before 3.13 always registers the block. The pool's workers share the parent's tracker, which
+        # keeps one registration per name, so this adds nothing to the parent's own registration and the tracker
+        # only cleans it up if the parent dies. Unregistering it here would drop the parent's registration
+        # instead, and every further unregister, the parent's unlink included, would fail in the tracker.
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach_shared(params, layouts, band):
+    """
+    Pool initializer: attaches the worker to the shared matrices
+
+    Inputs:
+       params = the AlignmentParameters being aligned
+       layouts = for M, Ix and Iy, (class, attributes, (block name, shape, dtype) of the scores and pointer bits)
+       band = the band, as in tile_grid
+    """
+    blocks, matrices = [], []
+    for cls, attrs, arrays in layouts:
+        views = []
+        for name, shape, dtype in arrays:
+            block = attach_block(name)
+            blocks.append(block)
+            views.append(np.ndarray(shape, dtype=dtype, buffer=block.buf))
+        matrices.append(shared_matrix(cls, attrs, *views))
+    worker_state.update(params=params, matrices=matrices, band=band, blocks=blocks)
+
+
+def fill_shared_tile(tile):
+    """
+    Fills one tile of the shared matrices in a worker
+    """
+    fill_tile(worker_state["params"], *worker_state["matrices"], tile, worker_state["band"])
+    return tile
+
+
+def completed_rows(diagonals, done, nrow):
+    """
+    Returns the last row whose tiles are all filled once the first done tile diagonals are
+    """
+    pending = [tile[0] for tiles in diagonals[done:] for tile in tiles]
+    return min(pending) - 1 if pending else nrow - 1
+
+
+def populate_tiled(align, start_row=1, workers=None, tile_size=None):
+    """
+    Fills the already initialized score matrices of an Align object tile by tile, from start_row down
+
+    Inputs:
+       align = Align object whose matrices have been created by populate_score_matrices
+       start_row = first row to fill, rows above it are already filled (eg. restored from a checkpoint)
+       workers = number of worker processes, None for one per CPU, 1 fills in this process
+       tile_size = cells along each side of a tile, None to pick it from the matrix size and the workers
+    """
+    matrices = [align.m_matrix, align.ix_matrix, align.iy_matrix]
+    nrow, ncol = align.m_matrix.nrow, align.m_matrix.ncol
+    band = getattr(align.m_matrix, "band", max(nrow, ncol))
+    workers = workers or os.cpu_count() or 1
+    if tile_size is None:
+        tile_size = max(MIN_TILE_SIZE, -(-max(nrow, ncol) // (TILES_PER_WORKER * workers)))
+    elif tile_size < 1:
+        raise ValueError(f"Tile size has to be at least 1, got {tile_size}")
+    diagonals = tile_grid(start_row, nrow, ncol, band, tile_size)
+
+    # without enough tiles to keep every worker busy the pool can't win, fill the whole diagonals in process
+    if workers == 1 or max((len(tiles) for tiles in diagonals), default=0) < workers:
+        align.populate_wavefront(start_row)
+        return
+
+    # move the matrices into shared memory for the fill, checkpoints read them from there meanwhile
+    originals = [(matrix.scores, matrix.pointer_bits) for matrix in matrices]
+    blocks, layouts, view = [], [], None
+    try:
+        for matrix in matrices:
+            arrays = []
+            for attr in ("scores", "pointer_bits"):
+                array = getattr(matrix, attr)
+                block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                blocks.append(block)
+                view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+                view[...] = array
+                setattr(matrix, attr, view)
+                arrays.append((block.name, array.shape, array.dtype.str))
+            attrs = {key: value for key, value in vars(matrix).items()
+                     if key not in ("scores", "pointer_bits", "extra_pointers")}
+            layouts.append((type(matrix), attrs, arrays))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_shared,
+                                 initargs=(align.align_params, layouts, band)) as pool:
+            for done, tiles in enumerate(diagonals, start=1):
+                # every tile of a diagonal only depends on the diagonals before it
+                for future in [pool.submit(fill_shared_tile, tile) for tile in tiles]:
+                    future.result()
+                align.save_checkpoint(completed_rows(diagonals, done, nrow))
+
+        for matrix, (scores, pointer_bits) in zip(matrices, originals):
+            scores[...] = matrix.scores
+            pointer_bits[...] = matrix.pointer_bits
+    finally:
+        # drop every view of the blocks before closing them
+        for matrix, (scores, pointer_bits) in zip(matrices, originals):
+            matrix.scores, matrix.pointer_bits = scores, pointer_bits
+        del view
+        for block in blocks:
+            block.close()
+            block.unlink()